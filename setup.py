@@ -30,6 +30,7 @@ setup(
     url='http://www.codeatcpp.com',
     license='BSD-3-Clause',
     packages=find_packages(exclude=('test', 'docs')),
+    python_requires='>=3.4',
     tests_require=['mock'],
     extras_require={
         'test': dev_requires,
@@ -42,10 +43,10 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: BSD License',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
         'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: Implementation :: CPython',
         'Topic :: Software Development',
         'Topic :: Utilities',
@@ -54,6 +55,7 @@ setup(
         'console_scripts': [
             'zeus2txt = zxtools.zeus2txt:main',
             'hobeta = zxtools.hobeta:main',
+            'zxtools = zxtools.cli:main',
         ],
     },
 )
@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" archive.py tests """
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import warnings
+import zipfile
+
+from zxtools import archive
+from zxtools import zeus2txt
+
+from test.test_detect import HOBETA_DATA, ZEUS_DATA
+
+MEMBERS = (("side_a/f.load.$C", HOBETA_DATA), ("source.zeus", ZEUS_DATA),
+           ("readme.txt", b"hello"), ("side_b/f.load.$C", HOBETA_DATA),
+           ("../f.load.$C", HOBETA_DATA), ("side_a/f.load.$C", ZEUS_DATA))
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.temp_dir, "out")
+        os.makedirs(self.output_dir)
+        self.zip_path = os.path.join(self.temp_dir, "files.zip")
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # Repeated name
+            with zipfile.ZipFile(self.zip_path, 'w',
+                                 zipfile.ZIP_DEFLATED) as zip_file:
+                for name, data in MEMBERS:
+                    zip_file.writestr(name, data)
+        self.tar_path = os.path.join(self.temp_dir, "files.tar.bz2")
+        with tarfile.open(self.tar_path, 'w:bz2') as tar_file:
+            for name, data in MEMBERS:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar_file.addfile(info, io.BytesIO(data))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def check_outputs(self, results):
+        self.assertEqual([name for name, _ in results],
+                         [name for name, _ in MEMBERS])
+        self.assertEqual(
+            [output and os.path.relpath(output, self.output_dir)
+             for _, output in results],
+            [os.path.join("side_a", "f.load.$C.bin"), "source.zeus.asm", None,
+             os.path.join("side_b", "f.load.$C.bin"), None, None])
+        with open(results[0][1], 'rb') as output_file:
+            self.assertEqual(output_file.read(), HOBETA_DATA[17:])
+        with open(results[1][1], 'r', encoding='utf-8') as output_file:
+            self.assertEqual(output_file.read(),
+                             zeus2txt.convert_to_text(ZEUS_DATA))
+
+    def test_iter_members(self):
+        for path in (self.zip_path, self.tar_path):
+            self.assertEqual(
+                [(name, size, member_file.read()) for name, size, member_file
+                 in archive.iter_members(path)],
+                [(name, len(data), data) for name, data in MEMBERS])
+        with self.assertRaises(ValueError):
+            list(archive.iter_members(__file__))
+
+    def test_member_path(self):
+        self.assertEqual(archive.member_path("a/./b//c.$C"),
+                         os.path.join("a", "b", "c.$C"))
+        for name in ("/etc/passwd", "a/../../b", "C:\\x", "\\x", "./"):
+            with self.assertRaises(ValueError):
+                archive.member_path(name)
+
+    def test_convert(self):
+        for path in (self.zip_path, self.tar_path):
+            self.check_outputs(archive.convert_archive(path, self.output_dir))
+
+    def test_convert_zip_member(self):
+        with zipfile.ZipFile(self.zip_path) as zip_file:
+            infos = zip_file.infolist()
+        try:
+            # The repeated name is opened by its own ZipInfo
+            output_path = archive.convert_zip_member(
+                self.zip_path, infos[-1], self.output_dir)
+            self.assertEqual(os.path.relpath(output_path, self.output_dir),
+                             os.path.join("side_a", "f.load.$C.asm"))
+            archive.convert_zip_member(self.zip_path, infos[0],
+                                       self.output_dir)
+            self.assertEqual(list(archive._ZIP_ARCHIVES), [self.zip_path])
+        finally:
+            archive._ZIP_ARCHIVES.pop(self.zip_path).close()
+
+    def test_convert_parallel(self):
+        for path in (self.zip_path, self.tar_path):
+            self.check_outputs(archive.convert_archive(
+                path, self.output_dir, jobs=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" basic2txt.py tests """
+
+import io
+import os
+import struct
+import shutil
+import tempfile
+import unittest
+from mock import patch
+
+from zxtools import basic2txt
+from zxtools import batch
+from zxtools import charset
+from zxtools.golden import make_hobeta_file
+
+
+def make_number(value):
+    """ Hidden 5-byte small integer """
+    return b"\x0E\x00" + (b"\xFF" if value < 0 else b"\x00") + \
+        struct.pack('<H', value & 0xFFFF) + b"\x00"
+
+
+def make_line(strnum, body):
+    """ Program line with the header and the end of line """
+    body += b"\x0D"
+    return struct.pack('>H', strnum) + struct.pack('<H', len(body)) + body
+
+
+PROGRAM = make_line(10, b"\xFD23999" + make_number(23999)) + \
+    make_line(20, b"\xF5\"Hi \x10\x02\x90\";\xC265" + make_number(65) +
+              b":\xEA 0\x0E") + \
+    make_line(30, b"\xF9\xC00" + make_number(23760)) + \
+    make_line(40, b"\xFAa\xC71" + make_number(1) + b"\xC5b\xCB\xEC10" +
+              make_number(10))
+VARIABLES = b"a\x81\x00\x00\x00\x00" + b"\x42\x03\x00xyz" + \
+    b"\xA1b\xE3\x00\x00\x05\x00\x00" + \
+    b"\xE9" + make_number(1)[1:] + make_number(10)[1:] + \
+    make_number(1)[1:] + b"\x14\x00\x02" + \
+    b"\x81\x0D\x00\x01\x02\x00" + make_number(7)[1:] + \
+    b"\x82\x40\x00\x00\x00" + \
+    b"\xC3\x09\x00\x02\x02\x00\x02\x00abcd" + b"\x80"
+
+
+class TestBasic2Txt(unittest.TestCase):
+    def test_keywords(self):
+        self.assertEqual(len(charset.KEYWORDS), 0x100 - charset.FIRST_KEYWORD)
+        texts = basic2txt.TOKEN_TABLE.texts
+        self.assertEqual(texts[0xA5], "RND")
+        self.assertEqual(texts[0xAF], "CODE ")
+        self.assertEqual(texts[0xC7], "<=")
+        self.assertEqual(texts[0xEE], "INPUT ")
+        self.assertEqual(texts[0xFF], "COPY ")
+        self.assertEqual(texts[0xA3], "Ⓣ")
+        self.assertEqual(basic2txt.TOKEN_TABLE_128.texts[0xA3], "SPECTRUM ")
+
+    def test_parse_number(self):
+        self.assertEqual(basic2txt.parse_number(b"\x00\x00\x39\x30\x00"),
+                         12345)
+        self.assertEqual(basic2txt.parse_number(b"\x00\xFF\xFF\xFF\x00"), -1)
+        self.assertEqual(basic2txt.parse_number(b"\x81\x00\x00\x00\x00"), 1.0)
+        self.assertEqual(basic2txt.parse_number(b"\x80\x80\x00\x00\x00"),
+                         -0.5)
+        self.assertAlmostEqual(
+            basic2txt.parse_number(b"\x82\x49\x0F\xDA\xA2"), 3.14159265, 7)
+        self.assertEqual(basic2txt.format_number(0.5), "0.5")
+        self.assertEqual(basic2txt.format_number(2.0), "2")
+
+    def test_decode_line(self):
+        self.assertEqual(basic2txt.decode_line(b"\xFAa\xC71\xC5b\xCB\xEC10"),
+                         "IF a<=1 OR b THEN GO TO 10")
+        self.assertEqual(basic2txt.decode_line(b"\xEA\x0D\xF5"), "REM ")
+        body = b"\xF9\xC00" + make_number(23760)
+        self.assertEqual(basic2txt.decode_line(body), "RANDOMIZE USR 0")
+        self.assertEqual(
+            basic2txt.decode_line(body, numbers=basic2txt.NUMBERS_DIFFERENT),
+            "RANDOMIZE USR 0{=23760}")
+        body = b"\xF51.5" + b"\x0E\x81\x40\x00\x00\x00" + b",\xC4101" + \
+            make_number(5)
+        self.assertEqual(
+            basic2txt.decode_line(body, numbers=basic2txt.NUMBERS_DIFFERENT),
+            "PRINT 1.5,BIN 101")
+        self.assertEqual(
+            basic2txt.decode_line(body, numbers=basic2txt.NUMBERS_ALL),
+            "PRINT 1.5{=1.5},BIN 101{=5}")
+
+    def test_convert(self):
+        output = io.StringIO()
+        self.assertEqual(
+            basic2txt.convert(PROGRAM + VARIABLES, output,
+                              basic2txt.NUMBERS_DIFFERENT, variables=True), 4)
+        self.assertEqual(output.getvalue().splitlines(), [
+            "  10 CLEAR 23999",
+            "  20 PRINT \"Hi {INK 2}Ⓐ\";CHR$65: REM  0{#0E}",
+            "  30 RANDOMIZE USR 0{=23760}",
+            "  40 IF a<=1 OR b THEN GO TO 10",
+            "a = 1",
+            "b$ = \"xyz\"",
+            "abc = 5",
+            "i = 1 TO 10 STEP 1 LINE 20:2",
+            "a(2) = 7, 3",
+            "c$(2,2) = \"ab\", \"cd\""])
+
+        # Program length from Hobeta header, the rest are the variables
+        hobeta_file = bytearray(make_hobeta_file("prog", PROGRAM + VARIABLES))
+        hobeta_file[8] = ord('B')
+        hobeta_file[9:11] = struct.pack('<H', len(PROGRAM))
+        hobeta_file[15:17] = struct.pack(
+            '<H', basic2txt.hobeta.calc_checksum(hobeta_file[0:15]))
+        text = basic2txt.convert_to_text(bytes(hobeta_file), variables=True)
+        self.assertEqual(len(text.splitlines()), 10)
+        self.assertEqual(basic2txt.convert_to_text(PROGRAM[0:-3]).splitlines(
+            )[-1], "  40 IF a<=1 OR b THEN GO TO 10")
+
+    def test_convert_file(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            input_path = os.path.join(temp_dir, "prog.$B")
+            output_path = os.path.join(temp_dir, "prog.bas")
+            with open(input_path, "wb") as input_file:
+                input_file.write(PROGRAM + VARIABLES)
+            with patch('sys.argv', ["basic2txt.py", "convert", input_path,
+                                    output_path, "--program-length",
+                                    str(len(PROGRAM)), "--variables"]):
+                basic2txt.main()
+            with open(output_path, "r", encoding="utf-8") as output_file:
+                self.assertEqual(len(output_file.read().splitlines()), 10)
+
+            hobeta_file = bytearray(make_hobeta_file("prog", PROGRAM))
+            hobeta_file[8] = ord('B')
+            hobeta_file[15:17] = struct.pack(
+                '<H', basic2txt.hobeta.calc_checksum(hobeta_file[0:15]))
+            with open(input_path, "wb") as input_file:
+                input_file.write(hobeta_file)
+            parser = batch.create_parser()
+            batch.convert_files(parser.parse_args(
+                ["convert", os.path.join(temp_dir, "out"), input_path,
+                 "--basic"]))
+            with open(os.path.join(temp_dir, "out", "prog.$B.bas"), "r",
+                      encoding="utf-8") as output_file:
+                self.assertEqual(output_file.readline(), "  10 CLEAR 23999\n")
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
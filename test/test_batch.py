@@ -0,0 +1,142 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" batch.py tests """
+
+import os
+import shutil
+import tempfile
+import unittest
+from mock import patch
+
+from zxtools import batch
+
+from test.test_detect import HOBETA_DATA, ZEUS_DATA
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.temp_dir, "out")
+        self.files = []
+        for name, data in (("f.load.$C", HOBETA_DATA),
+                           ("source.zeus", ZEUS_DATA),
+                           ("unknown.bin", b"\x01")):
+            path = os.path.join(self.temp_dir, name)
+            with open(path, 'wb') as test_file:
+                test_file.write(data)
+            self.files.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def convert(self, *options):
+        parser = batch.create_parser()
+        args = parser.parse_args(["convert", self.output_dir] + self.files +
+                                 list(options))
+        return batch.convert_files(args)
+
+    def test_convert(self):
+        self.assertEqual(self.convert("--ignore-header"), (2, 0, 0))
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         [batch.JOURNAL_NAME, "f.load.$C.bin",
+                          "source.zeus.asm"])
+        with open(os.path.join(self.output_dir, "f.load.$C.bin"),
+                  'rb') as res:
+            self.assertEqual(res.read(), HOBETA_DATA[17:])
+        with open(os.path.join(self.output_dir, batch.JOURNAL_NAME),
+                  encoding='utf-8') as res:
+            self.assertEqual(len(res.read().splitlines()), 2)
+
+    def test_resume(self):
+        self.assertEqual(self.convert(), (2, 0, 0))
+        self.assertEqual(self.convert("--resume"), (0, 2, 0))
+        with open(self.files[1], 'ab') as test_file:
+            test_file.write(b"\x00")
+        self.assertEqual(self.convert("--resume"), (1, 1, 0))
+        self.assertEqual(self.convert(), (2, 0, 0))
+
+        # Changed output is converted again
+        output_path = os.path.join(self.output_dir, "source.zeus.asm")
+        with open(output_path, 'a') as output_file:
+            output_file.write("changed")
+        self.assertEqual(self.convert("--resume"), (1, 1, 0))
+
+        # Same size and time are trusted unless verified
+        stat = os.stat(output_path)
+        with open(output_path, 'r+b') as output_file:
+            output_file.write(b"#")
+        os.utime(output_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.convert("--resume"), (0, 2, 0))
+        self.assertEqual(self.convert("--resume", "--verify"), (1, 1, 0))
+        self.assertEqual(self.convert("--resume", "--verify"), (0, 2, 0))
+
+    def test_journal_partial_record(self):
+        journal_path = os.path.join(self.temp_dir, "journal")
+        with open(journal_path, 'w') as journal_file:
+            journal_file.write("/a\t1\t2\t/c\t3\t4\tabc\n/b\t1\t2")
+        with batch.Journal(journal_path, resume=True) as journal:
+            self.assertEqual(journal.done, {"/a": (1, 2, "/c", 3, 4, "abc")})
+
+    def test_digest(self):
+        os.makedirs(self.output_dir)
+        output_path, digest = batch.convert_one(self.files[1],
+                                                self.output_dir)
+        self.assertEqual(digest, batch.file_digest(output_path))
+        output_path, digest = batch.convert_one(self.files[0],
+                                                self.output_dir)
+        self.assertEqual(digest, batch.file_digest(output_path))
+
+    def test_failed_files(self):
+        self.files.insert(0, os.path.join(self.temp_dir, "missing"))
+        with patch('zxtools.zeus2txt.convert', side_effect=ValueError):
+            self.assertEqual(self.convert(), (1, 0, 2))
+        self.assertEqual(sorted(os.listdir(self.output_dir)),
+                         [batch.JOURNAL_NAME, "f.load.$C.bin"])
+
+    def test_atomic_output(self):
+        os.makedirs(self.output_dir)
+        with patch('zxtools.zeus2txt.convert', side_effect=IOError):
+            with self.assertRaises(IOError):
+                batch.convert_one(self.files[1], self.output_dir)
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+    def test_same_names(self):
+        self.files = []
+        for folder in ("a", "b"):
+            os.makedirs(os.path.join(self.temp_dir, "in", folder))
+            for name in ("LOADER.$C", "LOADER.$B"):
+                path = os.path.join(self.temp_dir, "in", folder, name)
+                with open(path, 'wb') as test_file:
+                    test_file.write(HOBETA_DATA)
+                self.files.append(path)
+        self.assertEqual(self.convert(), (4, 0, 0))
+        for folder in ("a", "b"):
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(self.output_dir, folder))),
+                ["LOADER.$B.bin", "LOADER.$C.bin"])
+
+    def test_output_files(self):
+        os.makedirs(self.output_dir)
+        stale_path = os.path.join(self.output_dir,
+                                  batch.TEMP_PREFIX + "x" + batch.TEMP_SUFFIX)
+        open(stale_path, 'w').close()
+        umask = os.umask(0o022)
+        try:
+            self.convert()
+        finally:
+            os.umask(umask)
+        self.assertFalse(os.path.exists(stale_path))
+        self.assertEqual(os.stat(os.path.join(
+            self.output_dir, "source.zeus.asm")).st_mode & 0o777, 0o644)
+
+
+if __name__ == '__main__':
+    unittest.main()
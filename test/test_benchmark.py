@@ -0,0 +1,41 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" benchmark.py tests """
+
+import shutil
+import tempfile
+import unittest
+
+from zxtools import benchmark
+from zxtools import hobeta
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_make_hobeta_files(self):
+        folder = tempfile.mkdtemp()
+        try:
+            paths = benchmark.make_hobeta_files(folder, 2, 1000)
+            header, crc = hobeta.read_info(paths[1])
+            self.assertEqual(header.filename, b"file0001")
+            self.assertEqual(header.length, 1000)
+            self.assertEqual(header.check_sum, crc)
+        finally:
+            shutil.rmtree(folder)
+
+    def test_strip_benchmark(self):
+        args = benchmark.create_parser().parse_args(
+            ["strip", "--files", "4", "--size", "1000", "--threads", "1", "2"])
+        results = benchmark.strip_benchmark(args)
+        self.assertEqual([threads for threads, _ in results], [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" cli.py tests """
+
+import os
+import tempfile
+import unittest
+from mock import patch
+
+from zxtools import cli
+from zxtools import detect
+
+from test.test_detect import HOBETA_DATA, ZEUS_DATA
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.temp_files = []
+
+    def tearDown(self):
+        for path in self.temp_files:
+            os.remove(path)
+
+    def make_file(self, data):
+        handle, path = tempfile.mkstemp()
+        os.write(handle, data)
+        os.close(handle)
+        self.temp_files.append(path)
+        return path
+
+    def test_args_parser(self):
+        with self.assertRaises(SystemExit):
+            with patch('sys.argv', ["zxtools", "-h"]):
+                cli.main()
+
+        with self.assertRaises(SystemExit):
+            cli.run([])
+
+        with patch('sys.argv', ["zxtools", "hobeta", "hobeta-help"]):
+            self.assertIsNone(cli.main())
+
+    def test_detect(self):
+        args = cli.run(["detect", self.make_file(HOBETA_DATA),
+                         self.make_file(ZEUS_DATA)])
+        self.assertEqual(args.func(args),
+                         [detect.FORMAT_HOBETA, detect.FORMAT_ZEUS])
+
+    def test_convert_hobeta(self):
+        output_path = self.make_file(b"")
+        cli.run(["convert", self.make_file(HOBETA_DATA), output_path,
+                  "--ignore-header"])
+        with open(output_path, 'rb') as output_file:
+            self.assertEqual(output_file.read(), HOBETA_DATA[17:])
+
+    def test_convert_zeus(self):
+        output_path = self.make_file(b"")
+        cli.run(["convert", self.make_file(ZEUS_DATA), output_path])
+        with open(output_path, 'r') as output_file:
+            self.assertEqual(output_file.read().splitlines(),
+                             ["00010       ADD BC,42", ""])
+
+    def test_convert_unknown(self):
+        output_path = self.make_file(b"")
+        with patch('sys.argv', ["zxtools", "convert", self.make_file(b"\x01"),
+                                output_path]):
+            with patch('sys.stderr'):
+                with self.assertRaises(SystemExit) as context:
+                    cli.main()
+        self.assertEqual(context.exception.code, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" common.py tests """
+
+import io
+import os
+import argparse
+import tempfile
+import unittest
+from mock import patch
+
+from zxtools import CHUNK_SIZE
+from zxtools import common
+
+
+class TestCommon(unittest.TestCase):
+    def test_parse_size(self):
+        self.assertEqual(common.parse_size("4096"), 4096)
+        self.assertEqual(common.parse_size("64k"), 65536)
+        self.assertEqual(common.parse_size("2MB"), 2097152)
+        self.assertEqual(common.parse_size(100), 100)
+        for text in ("0", "-1", "1T", "auto"):
+            with self.assertRaises(ValueError):
+                common.parse_size(text)
+
+    def test_chunk_size_arg(self):
+        self.assertEqual(common.chunk_size_arg("AUTO"), common.CHUNK_SIZE_AUTO)
+        self.assertEqual(common.chunk_size_arg("1K"), 1024)
+        with self.assertRaises(argparse.ArgumentTypeError):
+            common.chunk_size_arg("big")
+
+    def test_get_chunk_size(self):
+        with patch.dict('os.environ', clear=True):
+            self.assertEqual(common.get_chunk_size(), CHUNK_SIZE)
+            self.assertEqual(common.get_chunk_size("8K"), 8192)
+        with patch.dict('os.environ', {common.CHUNK_SIZE_ENV: "16K"}):
+            self.assertEqual(common.get_chunk_size(), 16384)
+            self.assertEqual(common.get_chunk_size(4096), 4096)
+        with patch.dict('os.environ', {common.CHUNK_SIZE_ENV: "auto"}):
+            self.assertEqual(common.get_chunk_size(None, io.BytesIO()),
+                             CHUNK_SIZE)
+
+    def test_auto_chunk_size(self):
+        handle, path = tempfile.mkstemp()
+        os.write(handle, b"\x00" * 10000)
+        os.close(handle)
+        try:
+            with open(path, 'rb') as src_file:
+                block_size = os.fstat(src_file.fileno()).st_blksize
+                size = common.get_chunk_size("auto", src_file)
+                self.assertEqual(size % block_size, 0)
+                self.assertGreaterEqual(size, 10000)
+                self.assertLessEqual(size, max(10000, block_size) + block_size)
+        finally:
+            os.remove(path)
+
+    def test_max_memory(self):
+        with patch.dict('os.environ', clear=True):
+            self.assertIsNone(common.get_max_memory())
+            self.assertIsNone(common.get_buffer_limit())
+            self.assertEqual(common.get_max_line_size(),
+                             common.MAX_LINE_SIZE)
+            self.assertEqual(common.get_max_memory("1M"), 1024 * 1024)
+        with patch.dict('os.environ', {common.MAX_MEMORY_ENV: "256K"}):
+            self.assertEqual(common.get_buffer_limit(), 16 * 1024)
+            self.assertEqual(common.get_chunk_size(), 16 * 1024)
+            self.assertEqual(common.get_chunk_size("4K"), 4096)
+            self.assertEqual(common.get_max_line_size(), 16 * 1024)
+            self.assertEqual(common.read_limited(io.BytesIO(b"x" * 100)),
+                             b"x" * 100)
+            with self.assertRaises(ValueError):
+                common.read_limited(io.BytesIO(b"x" * (16 * 1024 + 1)))
+
+    def test_set_max_memory(self):
+        with patch.dict('os.environ', clear=True), \
+                patch('resource.getrlimit', return_value=(-1, -1)), \
+                patch('resource.setrlimit') as setrlimit:
+            common.default_main(self.memory_parser(), ["--max-memory", "1M"])
+            self.assertEqual(os.environ[common.MAX_MEMORY_ENV], "1048576")
+            self.assertEqual(setrlimit.call_args[0][1], (1048576, -1))
+
+    @staticmethod
+    def memory_parser():
+        parser = argparse.ArgumentParser()
+        parser.add_argument('-v', '--verbose', action='store_true')
+        common.add_max_memory_argument(parser)
+        return parser
+
+    def test_thread_buffer(self):
+        buffer = common.thread_buffer(100)
+        self.assertEqual(len(buffer), 100)
+        self.assertEqual(len(common.thread_buffer(10)), 10)
+        buffer[0] = 0x55
+        self.assertEqual(common.thread_buffer(10)[0], 0x55)
+
+    def test_open_source(self):
+        with common.open_source(b"data") as src_file:
+            self.assertEqual(src_file.read(), b"data")
+        caller_file = io.BytesIO(b"data")
+        with common.open_source(caller_file) as src_file:
+            self.assertIs(src_file, caller_file)
+        self.assertFalse(caller_file.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" detect.py tests """
+
+import io
+import unittest
+
+from zxtools import detect
+from zxtools import trdos
+
+HOBETA_DATA = (b"\x46\x2E\x6C\x6F\x61\x64\x2E\x41"
+               b"\x43\x00\x80\xF9\x06\x00\x07\xB5"
+               b"\x50\x00\x00\x3B\x20\x4C\x4F\x41")
+ZEUS_DATA = b"\x0A\x00\x0A\x06\x82\x87\x2C\x34\x32\x00\xFF\xFF"
+
+
+class TestDetect(unittest.TestCase):
+    def test_hobeta(self):
+        self.assertEqual(detect.detect_format(HOBETA_DATA),
+                         detect.FORMAT_HOBETA)
+        broken = HOBETA_DATA[:16] + b"\x51" + HOBETA_DATA[17:]
+        self.assertNotEqual(detect.detect_format(broken),
+                            detect.FORMAT_HOBETA)
+
+    def test_zeus(self):
+        self.assertEqual(detect.detect_format(ZEUS_DATA), detect.FORMAT_ZEUS)
+        self.assertEqual(detect.detect_format(ZEUS_DATA[:-2]),
+                         detect.FORMAT_ZEUS)
+        self.assertEqual(detect.detect_format(b"\x0A\x00\x01\x02\x00"),
+                         detect.FORMAT_UNKNOWN)
+
+    def test_trd(self):
+        data = bytearray(trdos.SECTOR_SIZE * 16)
+        data[trdos.DISK_INFO_OFFSET+2] = 0x16
+        data[trdos.DISK_INFO_OFFSET+6] = trdos.TRDOS_ID
+        self.assertEqual(detect.detect_format(bytes(data), 655360),
+                         detect.FORMAT_TRD)
+        self.assertEqual(detect.detect_format(bytes(data), 655361),
+                         detect.FORMAT_UNKNOWN)
+
+    def test_scl(self):
+        self.assertEqual(detect.detect_format(b"SINCLAIR\x00\x00\x00\x00"),
+                         detect.FORMAT_SCL)
+
+    def test_tap(self):
+        block = b"\x00\x03" + b"loader    " + b"\x00\x01\x0A\x00\x00\x01"
+        check_sum = 0
+        for value in block:
+            check_sum ^= value
+        data = b"\x13\x00" + block + bytes((check_sum,))
+        self.assertEqual(detect.detect_format(data), detect.FORMAT_TAP)
+        self.assertEqual(detect.detect_format(data[:-1] + b"\x00"),
+                         detect.FORMAT_UNKNOWN)
+
+    def test_sniff(self):
+        src_file = io.BytesIO(b"\x00" + ZEUS_DATA)
+        src_file.seek(1)
+        self.assertEqual(detect.sniff(src_file), detect.FORMAT_ZEUS)
+        self.assertEqual(src_file.tell(), 1)
+
+    def test_peek(self):
+        file_format, src_file = detect.peek(io.BytesIO(HOBETA_DATA))
+        self.assertEqual(file_format, detect.FORMAT_HOBETA)
+        self.assertEqual(src_file.read(5), HOBETA_DATA[:5])
+        buffer = bytearray(len(HOBETA_DATA))
+        self.assertEqual(src_file.readinto(buffer), len(HOBETA_DATA) - 5)
+        self.assertEqual(bytes(buffer[:-5]), HOBETA_DATA[5:])
+        self.assertEqual(src_file.read(), b"")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" fanout.py tests """
+
+import io
+import os
+import json
+import hashlib
+import shutil
+import tempfile
+import unittest
+
+from zxtools import fanout
+from zxtools import hobeta
+from zxtools import zeus2txt
+
+from test.test_detect import ZEUS_DATA
+
+
+def make_hobeta(data, length=None):
+    length = len(data) if length is None else length
+    header = b"source  C" + bytes((0, 0x80, length, 0, 1, 0))
+    check_sum = hobeta.calc_checksum(header)
+    return header + bytes((check_sum & 0xFF, check_sum >> 8)) + data
+
+
+class TestFanOut(unittest.TestCase):
+    def test_fan_out(self):
+        outputs = [io.StringIO(), io.BytesIO(), io.StringIO(), io.StringIO(),
+                   io.StringIO()]
+        sinks = [fanout.HeaderSink(outputs[0]),
+                 fanout.PayloadSink(outputs[1]),
+                 fanout.ListingSink(outputs[2]),
+                 fanout.HashSink(outputs[3], name="source.$C"),
+                 fanout.StatsSink(outputs[4])]
+        result = fanout.fan_out(
+            make_hobeta(ZEUS_DATA + b"\x00\x00", len(ZEUS_DATA)),
+            sinks, chunk_size=3)
+        self.assertEqual(result.size, len(ZEUS_DATA))
+        self.assertEqual(result.header.check_sum, result.check_sum)
+        self.assertEqual(result.results[1:3], [len(ZEUS_DATA), 1])
+        header = json.loads(outputs[0].getvalue())
+        self.assertEqual(header['filename'], "source  ")
+        self.assertEqual(header['filetype'], "C")
+        self.assertEqual(header['length'], len(ZEUS_DATA))
+        self.assertEqual(outputs[1].getvalue(), ZEUS_DATA)
+        self.assertEqual(outputs[2].getvalue(),
+                         zeus2txt.convert_to_text(ZEUS_DATA))
+        self.assertEqual(outputs[3].getvalue(), "%s  source.$C\n" %
+                         hashlib.sha1(ZEUS_DATA).hexdigest())
+        stats = json.loads(outputs[4].getvalue())
+        self.assertEqual((stats['size'], stats['reads']),
+                         (len(ZEUS_DATA), 4))
+        self.assertTrue(stats['check_sum_ok'])
+
+    def test_not_hobeta(self):
+        payload = io.BytesIO()
+        listing = io.StringIO()
+        result = fanout.fan_out(
+            ZEUS_DATA, [fanout.PayloadSink(payload),
+                        fanout.ListingSink(listing)])
+        self.assertIsNone(result.header)
+        self.assertEqual(payload.getvalue(), ZEUS_DATA)
+        self.assertEqual(listing.getvalue(), "00010       ADD BC,42\n\n")
+
+    def test_run(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            input_path = os.path.join(temp_dir, "source.$C")
+            with open(input_path, 'wb') as input_file:
+                input_file.write(make_hobeta(ZEUS_DATA))
+            outputs = [os.path.join(temp_dir, name)
+                       for name in ("listing.asm", "source.sha1")]
+            args = fanout.create_parser().parse_args([
+                input_path, "--listing", outputs[0], "--hash", outputs[1],
+                "--layout", "plain"])
+            result = fanout.run(args)
+            self.assertEqual(result.results[0], 1)
+            with open(outputs[0]) as listing:
+                self.assertEqual(listing.read(), "         add    BC,42\n\n")
+            self.assertTrue(os.path.exists(outputs[1]))
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
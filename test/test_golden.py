@@ -0,0 +1,71 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" golden.py tests """
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from zxtools import detect
+from zxtools import golden
+
+
+class TestGolden(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = golden.generate_corpus(self.temp_dir, 4, 50, seed=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_generate(self):
+        formats = []
+        for path in self.paths:
+            with open(path, 'rb') as corpus_file:
+                formats.append(detect.sniff(corpus_file))
+        self.assertEqual(formats, [detect.FORMAT_ZEUS, detect.FORMAT_HOBETA]*2)
+        other_dir = os.path.join(self.temp_dir, "other")
+        for path, other in zip(self.paths, golden.generate_corpus(
+                other_dir, 4, 50, seed=1)):
+            with open(path, 'rb') as left, open(other, 'rb') as right:
+                self.assertEqual(left.read(), right.read())
+
+    def test_compare(self):
+        results = golden.compare(self.paths, jobs=2)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result.identical for result in results))
+        results = golden.compare(self.paths, 'zxtools.hobeta:strip', jobs=1)
+        self.assertEqual([result.identical for result in results],
+                         [False, True]*2)
+        self.assertEqual(results[0].diff_offset, 0)
+
+        # Same names in the subfolders
+        paths = golden.generate_corpus(os.path.join(self.temp_dir, "a"), 4,
+                                       50, seed=2) + self.paths
+        results = golden.compare(golden.corpus_files(self.temp_dir), jobs=4)
+        self.assertEqual(len(results), len(paths))
+        self.assertTrue(all(result.identical for result in results))
+
+    def test_baseline(self):
+        self.assertEqual(golden.check_baseline({'throughput': 100}, 95, 0.1),
+                         0.95)
+        with self.assertRaises(ValueError):
+            golden.check_baseline({'throughput': 100}, 85, 0.1)
+
+    def test_first_difference(self):
+        self.assertIsNone(golden.first_difference(b"abc", b"abc"))
+        self.assertEqual(golden.first_difference(b"abc", b"abd"), 2)
+        self.assertEqual(golden.first_difference(b"abc", b"ab"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,10 +12,12 @@
 
 import os
 import io
+import errno
 import struct
 import unittest
 import tempfile
 from collections import namedtuple
+from contextlib import ExitStack
 
 from zxtools import hobeta
 from zxtools.common import safe_parse_args
@@ -173,6 +175,109 @@ class TestHobeta(unittest.TestCase):
             temp_output_file.close()
             os.remove(temp_output_path)
 
+    def test_strip(self):
+        data = (b"\x46\x2E\x6C\x6F\x61\x64\x2E\x41"
+                b"\x43\x00\x80\x0A\x00\x00\x07\xB5"
+                b"\x50\x00\x00\x3B\x20\x4C\x4F\x41"
+                b"\x44\x45\x52\x20\x66\x6F\x72\x20")
+        output = io.BytesIO()
+        result = hobeta.strip(memoryview(data), output)
+        self.assertEqual(result.copied, 10)
+        self.assertNotEqual(result.header.check_sum, result.check_sum)
+        self.assertEqual(output.getvalue(), data[17:27])
+        self.assertFalse(output.closed)
+
+        source = io.BytesIO(data)
+        result = hobeta.strip(source, output, ignore_header=True)
+        self.assertEqual(result.copied, 15)
+        self.assertFalse(source.closed)
+
+    def test_copy_data(self):
+        data = os.urandom(100000)
+        src_path = tempfile.mkstemp()[1]
+        dst_path = tempfile.mkstemp()[1]
+        with open(src_path, "wb") as src_file:
+            src_file.write(data)
+        try:
+            error = OSError(errno.EXDEV, "Invalid cross-device link")
+            for unsupported in ([], ['os.copy_file_range'],
+                                ['os.copy_file_range', 'os.sendfile']):
+                with ExitStack() as stack:
+                    for name in unsupported:
+                        stack.enter_context(patch(name, side_effect=error))
+                    src_file = stack.enter_context(open(src_path, "rb"))
+                    dst_file = stack.enter_context(open(dst_path, "wb"))
+                    src_file.read(17)
+                    self.assertEqual(
+                        hobeta.copy_data(src_file, dst_file, 70000), 70000)
+                    self.assertEqual(src_file.tell(), 70017)
+                    dst_file.write(b"END")
+                    self.assertEqual(
+                        hobeta.copy_data(src_file, dst_file), 29983)
+                with open(dst_path, "rb") as dst_file:
+                    self.assertEqual(dst_file.read(),
+                                     data[17:70017] + b"END" + data[70017:])
+        finally:
+            os.remove(src_path)
+            os.remove(dst_path)
+
+    def test_read_info(self):
+        temp_path = tempfile.mkstemp()[1]
+        try:
+            with open(temp_path, "wb") as temp_file:
+                temp_file.write(b"\x46\x2E\x6C\x6F\x61\x64\x2E\x41"
+                                b"\x43\x00\x80\xF9\x06\x00\x07\xB5\x50")
+            header, crc = hobeta.read_info(temp_path)
+            self.assertEqual(header.check_sum, crc)
+            self.assertEqual(hobeta.format_info(header, crc).splitlines()[0],
+                             "File name:          F.load.A")
+        finally:
+            os.remove(temp_path)
+
+    def test_dump(self):
+        data = b"\x00\x3B\x5E\x60\x7F\x80\x8F\x90" + \
+            bytes(range(0x41, 0x53))
+        header = struct.pack('<8sBHHBB', b"dump    ", ord('C'), 0xFFF8,
+                             len(data), 0, 1)
+        hobeta_file = header + \
+            struct.pack('<H', hobeta.calc_checksum(header)) + data
+        expected = [
+            "FFF8  00 3B 5E 60 7F 80 8F 90 41 42 43 44 45 46 47 48  "
+            ".;\u2191\u00a3\u00a9 \u2588\u24b6ABCDEFGH",
+            "0008  49 4A 4B 4C 4D 4E 4F 50 51 52                    "
+            "IJKLMNOPQR"]
+        for chunk_size in (None, 1, 5, 16, 17):
+            output = io.StringIO()
+            self.assertEqual(hobeta.dump(io.BytesIO(hobeta_file + b"pad"),
+                                         output, chunk_size=chunk_size),
+                             len(data))
+            self.assertEqual(output.getvalue().splitlines(), expected)
+
+        output = io.StringIO()
+        hobeta.dump(io.BytesIO(data), output, raw=True, width=8,
+                    charset='ascii')
+        self.assertEqual(output.getvalue().splitlines()[0],
+                         "0000  00 3B 5E 60 7F 80 8F 90  .;^`....")
+        output = io.StringIO()
+        hobeta.dump(io.BytesIO(hobeta_file), output, start=0x4000)
+        self.assertTrue(output.getvalue().startswith("4000  00 3B"))
+
+    def test_dump_file(self):
+        data = bytes(range(0x20, 0x40))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_path = os.path.join(temp_dir, "dump.bin")
+            output_path = os.path.join(temp_dir, "dump.txt")
+            with open(input_path, "wb") as input_file:
+                input_file.write(data)
+            with patch('sys.argv', ["hobeta.py", "dump", input_path,
+                                    output_path, "--raw", "--start",
+                                    "0x6000"]):
+                hobeta.main()
+            with open(output_path, "r", encoding="utf-8") as output_file:
+                lines = output_file.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("6010  30 31"))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" screen.py tests """
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import zlib
+
+from zxtools import screen
+
+
+def make_screen():
+    data = bytearray(screen.SCREEN_SIZE)
+    data[0] = 0x81                 # The first pixel line, left cell
+    data[256] = 0xFF               # The second pixel line, left cell
+    data[screen.BITMAP_SIZE] = 0xCE  # Flash, bright, blue paper, yellow ink
+    return bytes(data)
+
+
+class TestScreen(unittest.TestCase):
+    def test_row_offsets(self):
+        self.assertEqual(screen.ROW_OFFSETS[0], 0)
+        self.assertEqual(screen.ROW_OFFSETS[1], 256)
+        self.assertEqual(screen.ROW_OFFSETS[8], 32)
+        self.assertEqual(screen.ROW_OFFSETS[64], 2048)
+        self.assertEqual(screen.ROW_OFFSETS[191], 6144 - 32)
+
+    def test_render(self):
+        rows = screen.render(make_screen())
+        self.assertEqual(len(rows), screen.HEIGHT)
+        self.assertEqual(rows[0][0:9], b"\x0E\x09\x09\x09\x09\x09\x09\x0E\x00")
+        self.assertEqual(rows[1][0:8], b"\x0E" * 8)
+        self.assertEqual(rows[2][0:8], b"\x09" * 8)
+        self.assertEqual(rows[191], b"\x00" * screen.WIDTH)
+
+        rows = screen.render(make_screen(), flash=True)
+        self.assertEqual(rows[0][0:9], b"\x09\x0E\x0E\x0E\x0E\x0E\x0E\x09\x00")
+
+        with self.assertRaises(ValueError):
+            screen.render(b"\x00" * 6144)
+
+    def test_png(self):
+        data = make_screen()
+        png = screen.screen_to_png(data)
+        self.assertEqual(png[0:8], b'\x89PNG\r\n\x1a\n')
+        self.assertEqual(struct.unpack('>I4sII', png[8:24]),
+                         (13, b'IHDR', screen.WIDTH, screen.HEIGHT))
+        pos = png.find(b'IDAT')
+        length = struct.unpack('>I', png[pos-4:pos])[0]
+        raw = zlib.decompress(png[pos+4:pos+4+length])
+        self.assertEqual(raw, b''.join(b'\x00' + row
+                                       for row in screen.render(data)))
+        self.assertTrue(png.endswith(b'IEND\xaeB`\x82'))
+
+    def test_render_files(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "screen.$C")
+            with open(path, 'wb') as screen_file:
+                screen_file.write(b"screen  C\x00\x40\x00\x1B\x00\x1B\xE2\x7C")
+                screen_file.write(make_screen())
+            os.makedirs(os.path.join(temp_dir, "b"))
+            other_path = os.path.join(temp_dir, "b", "screen.$C")
+            shutil.copy(path, other_path)
+            args = screen.create_parser().parse_args(
+                ["batch", os.path.join(temp_dir, "out"), path, other_path,
+                 os.path.join(temp_dir, "missing.$C"), "-j", "2"])
+            self.assertEqual(screen.render_many(args), 2)
+            for name in ("screen.$C.png", os.path.join("b", "screen.$C.png")):
+                with open(os.path.join(temp_dir, "out", name), 'rb') as res:
+                    self.assertEqual(res.read(),
+                                     screen.screen_to_png(make_screen()))
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" snapshot.py tests """
+
+import os
+import struct
+import tempfile
+import unittest
+
+from zxtools import snapshot
+
+BANK_SIZE = snapshot.BANK_SIZE
+
+
+def make_bank(number):
+    """ Bank filled with its number with a short signature in the middle """
+    data = bytearray([number]) * BANK_SIZE
+    data[100:108] = ("BANK%04d" % number).encode('ascii')
+    data[200:202] = b"\xED\xED"
+    return bytes(data)
+
+
+def compress(data):
+    """ Z80 RLE compression """
+    result = bytearray()
+    pos = 0
+    while pos < len(data):
+        run = 1
+        while pos + run < len(data) and run < 255 and \
+                data[pos+run] == data[pos]:
+            run += 1
+        if run >= 5 or (data[pos] == 0xED and run >= 2):
+            result += bytes((0xED, 0xED, run, data[pos]))
+        else:
+            result += data[pos:pos+run]
+        pos += run
+    return bytes(result)
+
+
+def z80_header(pc, flags=0):
+    return struct.pack(snapshot.Z80_HEADER_FMT, 0, 0, 0, 0, pc, 0xFFF0, 0,
+                       0, flags, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1)
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_decompress(self):
+        self.assertEqual(snapshot.decompress_z80(b"\x01\xED\xED\x05\x02\x03"),
+                         b"\x01\x02\x02\x02\x02\x02\x03")
+        self.assertEqual(snapshot.decompress_z80(b"\xED\x01\xED"),
+                         b"\xED\x01\xED")
+        with self.assertRaises(ValueError):
+            snapshot.decompress_z80(b"\xED\xED\x05\x02", 4)
+
+    def test_sna_48k(self):
+        ram = make_bank(5) + make_bank(2) + make_bank(0)
+        ram = ram[:0xFFF0-0x4000] + b"\x34\x12" + ram[0xFFF2-0x4000:]
+        header = struct.pack(snapshot.SNA_HEADER_FMT,
+                             *([0]*13 + [0xFFF0, 1, 7]))
+        result = snapshot.load_sna(header + ram)
+        self.assertFalse(result.is_128k)
+        self.assertEqual(result.pc, 0x1234)
+        self.assertEqual(bytes(result.slice(0x4000 + 100, 8)), b"BANK0005")
+        self.assertEqual(bytes(result.slice(0xC000 + 100, 8)), b"BANK0000")
+        self.assertEqual(bytes(result.bank(2)[100:108]), b"BANK0002")
+        self.assertEqual(bytes(result.slice(0, 4)), b"\x00" * 4)
+        with self.assertRaises(ValueError):
+            result.slice(0xFFFF, 2)
+        with self.assertRaises(ValueError):
+            result.bank(7)
+
+    def test_sna_128k(self):
+        header = struct.pack(snapshot.SNA_HEADER_FMT, *([0]*16))
+        data = header + make_bank(5) + make_bank(2) + make_bank(3) + \
+            struct.pack(snapshot.SNA_128K_FMT, 0x8000, 0x13, 0) + \
+            b"".join(make_bank(bank) for bank in (0, 1, 4, 6, 7))
+        result = snapshot.load_sna(data)
+        self.assertTrue(result.is_128k)
+        self.assertEqual(result.pc, 0x8000)
+        self.assertEqual(result.paged_bank, 3)
+        self.assertEqual(bytes(result.slice(0xC000 + 100, 8)), b"BANK0003")
+        for bank in range(8):
+            self.assertEqual(bytes(result.bank(bank)), make_bank(bank))
+
+    def test_z80_v1(self):
+        ram = make_bank(5) + make_bank(2) + make_bank(0)
+        data = z80_header(0x8000, snapshot.Z80_COMPRESSED) + compress(ram) + \
+            snapshot.Z80_V1_END_MARKER
+        result = snapshot.load_z80(data)
+        self.assertEqual(result.pc, 0x8000)
+        self.assertEqual(bytes(result.slice(0x4000, 3 * BANK_SIZE)), ram)
+
+        result = snapshot.load_z80(z80_header(0x8000) + ram)
+        self.assertEqual(bytes(result.slice(0x4000, 3 * BANK_SIZE)), ram)
+
+    def test_z80_v2_48k(self):
+        data = z80_header(0) + struct.pack('<HHBB', 23, 0x6000, 0, 0) + \
+            bytes(19)
+        for page, bank in ((4, 2), (5, 0), (8, 5)):
+            block = compress(make_bank(bank))
+            data += struct.pack('<HB', len(block), page) + block
+        result = snapshot.load_z80(data)
+        self.assertFalse(result.is_128k)
+        self.assertEqual(result.pc, 0x6000)
+        self.assertEqual(bytes(result.slice(0x8000 + 100, 8)), b"BANK0002")
+        for length in (10, len(z80_header(0)) + 3):
+            with self.assertRaises(ValueError):
+                snapshot.load_z80(data[0:length])
+        with self.assertRaises(ValueError):
+            result.bank(1)
+
+    def test_z80_v3_128k(self):
+        data = z80_header(0) + struct.pack('<HHBB', 54, 0x6000, 4, 0x16) + \
+            bytes(50)
+        for bank in range(8):
+            if bank == 7:
+                data += struct.pack('<HB', 0xFFFF, bank + 3) + make_bank(bank)
+            else:
+                block = compress(make_bank(bank))
+                data += struct.pack('<HB', len(block), bank + 3) + block
+        result = snapshot.load_z80(data)
+        self.assertTrue(result.is_128k)
+        self.assertEqual(result.paged_bank, 6)
+        self.assertEqual(bytes(result.slice(0xC000 + 100, 8)), b"BANK0006")
+        self.assertEqual(bytes(result.bank(7)), make_bank(7))
+
+    def test_extract(self):
+        handle, path = tempfile.mkstemp(suffix=".z80")
+        os.write(handle, z80_header(0x8000) + make_bank(5) + make_bank(2) +
+                 make_bank(0))
+        os.close(handle)
+        output_path = tempfile.mkstemp()[1]
+        try:
+            self.assertFalse(snapshot.load(path).is_128k)
+            args = snapshot.create_parser().parse_args(
+                ["extract", path, output_path, "--start", "0x8064",
+                 "--length", "8"])
+            self.assertEqual(snapshot.extract(args), 8)
+            with open(output_path, 'rb') as output_file:
+                self.assertEqual(output_file.read(), b"BANK0002")
+        finally:
+            os.remove(path)
+            os.remove(output_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
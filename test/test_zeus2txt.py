@@ -12,6 +12,7 @@
 
 import io
 import os
+import argparse
 import tempfile
 import unittest
 from collections import namedtuple
@@ -124,6 +125,89 @@ class TestZeus2Txt(unittest.TestCase):
             temp_output_file.close()
             os.remove(temp_output_path)
 
+    def test_convert_api(self):
+        self.assertEqual(
+            zeus2txt.convert_to_text(b"\x0A\x00\x0A\x06\x82\x87\x2C"
+                                     b"\x34\x32\x00\xFF\xFF"),
+            "00010       ADD BC,42\n\n")
+        source = io.BytesIO(self.test_data)
+        output = io.StringIO()
+        self.assertEqual(zeus2txt.convert(source, output), 150)
+        self.assertFalse(source.closed)
+        self.assertEqual(output.getvalue().encode().splitlines(),
+                         self.test_output.split(b"\n"))
+
+    def test_xref(self):
+        args, temp_output_path, temp_output_file = self.prepare_convert_args(
+            self.test_data)
+        xref_path = tempfile.mkstemp()[1]
+        args = argparse.Namespace(xref=open(xref_path, "w"),
+                                  xref_format="text", **args._asdict())
+
+        try:
+            zeus2txt.convert_file(args)
+            with open(xref_path, "r") as xref_file:
+                lines = xref_file.read().splitlines()
+            self.assertEqual(len(lines), 29)
+            self.assertEqual(lines[0], "ADRSH            60000 EQU 30000"
+                                       "        40390")
+            self.assertEqual(lines[11], "LOAD             40920 ORG 50000"
+                                        "        00140 40810")
+        finally:
+            temp_output_file.close()
+            os.remove(temp_output_path)
+            os.remove(xref_path)
+
+    def test_layouts(self):
+        data = (b"\x0A\x00LOOP\x0A\x02\x82\x87\x2C\x34\x32 ;hi\x00"
+                b"\x14\x00;c\x00\x1E\x00\x0A\x06\xB7\x00\xFF\xFF")
+        self.assertEqual(
+            zeus2txt.convert_to_text(data, layout=zeus2txt.LAYOUTS['columns']),
+            "00010 LOOP     ADD    BC,42 ;hi\n00020 ;c\n"
+            "00030          LDIR\n\n")
+        self.assertEqual(
+            zeus2txt.convert_to_text(data, layout=zeus2txt.LAYOUTS['plain']),
+            "LOOP     add    BC,42 ;hi\n;c\n         ldir\n\n")
+
+    def test_convert_many(self):
+        outputs = [io.StringIO() for _ in zeus2txt.LAYOUTS]
+        self.assertEqual(zeus2txt.convert_many(
+            self.test_data, list(zip(outputs, zeus2txt.LAYOUTS.values()))),
+                         150)
+        for output, layout in zip(outputs, zeus2txt.LAYOUTS.values()):
+            self.assertEqual(output.getvalue(), zeus2txt.convert_to_text(
+                self.test_data, layout=layout))
+        self.assertEqual(outputs[0].getvalue().encode().splitlines(),
+                         self.test_output.split(b"\n"))
+
+    def test_line_reader(self):
+        reader = zeus2txt.LineReader(io.BytesIO(self.test_data), 3)
+        lines = list(reader)
+        self.assertTrue(reader.complete)
+        self.assertEqual(len(lines), 150)
+        self.assertEqual(lines[2], (10, b"\x0A\x06\xBF50000"))
+        reader = zeus2txt.LineReader(io.BytesIO(self.test_data[:40]))
+        self.assertEqual(len(list(reader)), 1)
+        self.assertFalse(reader.complete)
+
+    def test_long_lines(self):
+        data = b"\x0A\x00" + b"A" * 10 + b"\x00\x14\x00" + b"B" * 100 + \
+            b"\x00\x1E\x00;c\x00\xFF\xFF"
+        splitter = zeus2txt.LineSplitter(8)
+        lines = []
+        for pos in range(0, len(data), 7):
+            lines.extend(splitter.feed(data[pos:pos+7]))
+            self.assertLess(len(splitter.data), 16)
+        self.assertEqual(lines, [(10, b"A" * 8), (20, b"B" * 8), (30, b";c")])
+        self.assertTrue(splitter.complete)
+        splitter = zeus2txt.LineSplitter(8, zeus2txt.LONG_LINES_ERROR)
+        with self.assertRaises(ValueError):
+            splitter.feed(data)
+        splitter = zeus2txt.LineSplitter(8)
+        self.assertEqual(splitter.feed(b"\x0A\x00" + b"X" * 1000),
+                         [(10, b"X" * 8)])
+        self.assertEqual(len(splitter.data), 0)
+
     def setUp(self):
         self.test_data = (
             b"\x00\x00\x3B\x20\x4C\x4F\x41\x44\x45\x52\x20\x66\x6F\x72\x20\x46"
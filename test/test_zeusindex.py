@@ -0,0 +1,92 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" zeusindex.py tests """
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from zxtools import zeusindex
+from zxtools import zeus2txt
+
+from test.test_zeussearch import TEST_DATA
+
+
+class TestZeusIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.temp_dir, "index.db")
+        self.zeus_path = os.path.join(self.temp_dir, "test.zeus")
+        with open(self.zeus_path, 'wb') as zeus_file:
+            zeus_file.write(TEST_DATA)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_postings(self):
+        lines = [0, 0, 10, 127, 128, 65534]
+        data = zeusindex.encode_postings(lines)
+        self.assertEqual(data, b"\x00\x00\x0A\x75\x01\xFE\xFE\x03")
+        self.assertEqual(zeusindex.decode_postings(data), lines)
+
+    def test_token_code(self):
+        self.assertEqual(zeusindex.token_code("call"), 0x8A)
+        self.assertEqual(zeusindex.token_code("IX"), 0xAE)
+        with self.assertRaises(ValueError):
+            zeusindex.token_code("LOAD")
+
+    def test_scan_symbols(self):
+        self.assertEqual(
+            zeus2txt.scan_symbols(b"PAUS\x0A\x02\x8APAUS:\x8ASTAND ;CALL X"),
+            ("PAUS", [("PAUS", 0x8A), ("STAND", 0x8A)]))
+        self.assertEqual(
+            zeus2txt.scan_symbols(b"\x0A\x06\xB3\x94,#2F0A"),
+            (None, []))
+        self.assertEqual(
+            zeus2txt.scan_symbols(b"\x0A\x06\x97\"MSG1\",MSG1+1"),
+            (None, [("MSG1", 0x97)]))
+
+    def test_index(self):
+        with zeusindex.ZeusIndex(self.index_path) as index:
+            self.assertTrue(index.update(self.zeus_path))
+            self.assertFalse(index.update(self.zeus_path))
+            path = os.path.abspath(self.zeus_path)
+            self.assertEqual(index.definitions("LOAD"), [(path, 256)])
+            self.assertEqual(index.references("LOAD"), [(path, 266)])
+            self.assertEqual(index.references("LOAD", 0xB3), [])
+            self.assertEqual(index.usages(0x80), [(path, 10), (path, 20)])
+
+        with open(self.zeus_path, 'wb') as zeus_file:
+            zeus_file.write(TEST_DATA[:9] + b"\xFF\xFF")
+        with zeusindex.ZeusIndex(self.index_path) as index:
+            self.assertTrue(index.update(self.zeus_path))
+            self.assertEqual(index.definitions("LOAD"), [])
+            self.assertEqual(index.usages(0x80), [(path, 10)])
+            os.remove(self.zeus_path)
+            self.assertEqual(index.prune(), [path])
+            self.assertEqual(index.usages(0x80), [])
+
+    def test_cli(self):
+        parser = zeusindex.create_parser()
+        args = parser.parse_args(["update", self.index_path, self.zeus_path])
+        self.assertEqual(zeusindex.update_index(args), 1)
+        args = parser.parse_args(["refs", self.index_path, "LOAD",
+                                  "--op", "CALL"])
+        self.assertEqual(len(zeusindex.find_references(args)), 1)
+        args = parser.parse_args(["defs", self.index_path, "LOAD"])
+        self.assertEqual(len(zeusindex.find_definitions(args)), 1)
+        args = parser.parse_args(["uses", self.index_path, "LDIR"])
+        self.assertEqual(len(zeusindex.find_usages(args)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" zeuslines.py tests """
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from zxtools import zeuslines
+from zxtools.zeusprogram import ZeusProgram
+
+from test.test_zeussearch import TEST_DATA
+
+FIRST = b"\x0A\x00;a\x00\x1E\x00;c\x00\xFF\xFF"
+SECOND = b"\x14\x00;b\x00\x1E\x00;d\x00\x28\x00;e\x00\xFF\xFF"
+
+
+def lines(data):
+    program = ZeusProgram.load(data)
+    return [(strnum, program[index])
+            for index, strnum in enumerate(program.strnums)]
+
+
+class TestZeusLines(unittest.TestCase):
+    def test_renumber(self):
+        output = io.BytesIO()
+        count = zeuslines.renumber(io.BytesIO(TEST_DATA), output, 100, 5)
+        program = ZeusProgram.load(output.getvalue())
+        self.assertEqual(len(program), count)
+        self.assertEqual(list(program.strnums), list(range(100, 100+5*count,
+                                                          5)))
+        self.assertEqual([program[index] for index in range(count)],
+                         [text for _, text in lines(TEST_DATA)])
+        with self.assertRaises(ValueError):
+            zeuslines.renumber(TEST_DATA, io.BytesIO(), 0xFFF0, 10)
+
+    def test_merge(self):
+        output = io.BytesIO()
+        self.assertEqual(
+            zeuslines.merge([FIRST, SECOND], output, chunk_size=3), 5)
+        self.assertEqual(lines(output.getvalue()), [
+            (10, ";a"), (20, ";b"), (30, ";c"), (40, ";d"), (50, ";e")])
+        output = io.BytesIO()
+        zeuslines.merge([FIRST, SECOND], output, start=1, step=1)
+        self.assertEqual([strnum for strnum, _ in lines(output.getvalue())],
+                         [1, 2, 3, 4, 5])
+        output = io.BytesIO()
+        zeuslines.merge([FIRST[0:5] + FIRST[-2:], SECOND], output, None)
+        self.assertEqual([strnum for strnum, _ in lines(output.getvalue())],
+                         [10, 20, 30, 40])
+        with self.assertRaises(ValueError):
+            zeuslines.merge([FIRST, SECOND], io.BytesIO(), None)
+        with self.assertRaises(ValueError):
+            zeuslines.merge([SECOND[5:10] + SECOND], io.BytesIO())
+
+    def test_extract(self):
+        output = io.BytesIO()
+        self.assertEqual(zeuslines.extract(SECOND, output, 30, 40), 2)
+        self.assertEqual(output.getvalue(), SECOND[5:])
+
+    def test_cli(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(temp_dir, name) for name in "abc"]
+            for path, data in zip(paths, (FIRST, SECOND)):
+                with open(path, 'wb') as zeus_file:
+                    zeus_file.write(data)
+            args = zeuslines.create_parser().parse_args(
+                ["merge", paths[2], paths[0], paths[1], "--start", "10"])
+            self.assertEqual(args.func(args), 5)
+            with open(paths[2], 'rb') as zeus_file:
+                self.assertEqual(lines(zeus_file.read())[-1], (50, ";e"))
+            args = zeuslines.create_parser().parse_args(
+                ["merge", paths[0], paths[0], paths[1]])
+            with self.assertRaises(ValueError):
+                args.func(args)
+            with open(paths[0], 'rb') as zeus_file:
+                self.assertEqual(zeus_file.read(), FIRST)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" zeusprogram.py tests """
+
+import io
+import unittest
+from mock import patch
+
+from zxtools import common
+from zxtools import zeus2txt
+from zxtools.zeusprogram import ZeusProgram
+
+from test.test_zeussearch import TEST_DATA
+
+
+class TestZeusProgram(unittest.TestCase):
+    def test_load(self):
+        program = ZeusProgram.load(io.BytesIO(TEST_DATA), chunk_size=7)
+        lines = zeus2txt.convert_to_text(TEST_DATA).splitlines()[:-1]
+        self.assertEqual(len(program), len(lines))
+        self.assertTrue(program.complete)
+        self.assertTrue(program.sorted)
+        for index, line in enumerate(lines):
+            self.assertEqual("%05d " % program.strnums[index] +
+                             program[index], line)
+        self.assertEqual(program.to_bytes(), TEST_DATA)
+        self.assertLess(program.memory_size(), 2 * len(TEST_DATA))
+
+    def test_line(self):
+        program = ZeusProgram.load(b"\x0A\x00\x0A\x06\x82\x87\x2C\x34\x32"
+                                   b"\x00\x14\x00;c\x00\xFF\xFF")
+        self.assertEqual(program.line(20), ";c")
+        self.assertEqual(program.index(10), 0)
+        self.assertEqual(program[-1], ";c")
+        self.assertEqual(program.body(0), b"\x0A\x06\x82\x87\x2C\x34\x32")
+        with self.assertRaises(ValueError):
+            program.line(15)
+        self.assertEqual(list(program), ["      ADD BC,42", ";c"])
+        self.assertEqual(list(program.items())[1], (20, b";c"))
+        for index in (2, -3):
+            with self.assertRaises(IndexError):
+                program.text(index)
+            with self.assertRaises(IndexError):
+                program.body(index)
+
+    def test_cache(self):
+        program = ZeusProgram(cache_size=2)
+        for strnum in (30, 10, 20):
+            program.append(strnum, (";%d" % strnum).encode('ascii'))
+        self.assertFalse(program.sorted)
+        self.assertEqual(program.line(20), ";20")
+        self.assertEqual([program[index] for index in range(3)],
+                         [";30", ";10", ";20"])
+        self.assertEqual(list(program._cache), [1, 2])
+
+    def test_max_size(self):
+        program = ZeusProgram(max_size=4)
+        program.append(10, b";ab")
+        with self.assertRaises(ValueError):
+            program.append(20, b";c")
+        self.assertEqual(len(program), 1)
+        with patch.dict('os.environ', {common.MAX_MEMORY_ENV: "32"}):
+            with self.assertRaises(ValueError):
+                ZeusProgram.load(TEST_DATA)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" zeussearch.py tests """
+
+import os
+import tempfile
+import unittest
+
+from zxtools import zeussearch
+
+TEST_DATA = (b"\x0A\x00\x0A\x06\xB3\x80\x2C\x86\x00"         # LD A,B
+             b"\x14\x00\x0A\x06\xC2\x28\x32\x35\x34\x29\x2C\x80\x00"
+             b"\x00\x01\x4C\x4F\x41\x44\x0A\x02\xB7\x00"     # LOAD  LDIR
+             b"\x0A\x01\x0A\x06\x8A\x4C\x4F\x41\x44\x00"     # CALL LOAD
+             b"\xFF\xFF")
+
+
+class TestZeusSearch(unittest.TestCase):
+    def test_compile_query(self):
+        self.assertEqual(zeussearch.compile_query("OUT (254)"),
+                         b"\xC2(254)")
+        self.assertEqual(zeussearch.compile_query("ld a,b"), b"\xB3\x80,\x86")
+        self.assertEqual(zeussearch.compile_query("LDIR"), b"\xB7")
+        self.assertEqual(zeussearch.compile_query("CALL LOAD"),
+                         b"\x8ALOAD")
+        self.assertEqual(zeussearch.compile_query("CLS"), b"CLS")
+        self.assertEqual(zeussearch.compile_query("EX AF,AF'"),
+                         b"\xA1\x84,\x83")
+
+    def test_search_data(self):
+        self.assertEqual(
+            zeussearch.search_data(TEST_DATA,
+                                   zeussearch.compile_query("OUT (254)")),
+            [(20, "      OUT (254),A")])
+        self.assertEqual(
+            zeussearch.search_data(TEST_DATA, zeussearch.compile_query("A")),
+            [(10, "      LD A,B"), (20, "      OUT (254),A")])
+        self.assertEqual(
+            zeussearch.search_data(TEST_DATA, b"LOAD"),
+            [(256, "LOAD  LDIR"), (266, "      CALL LOAD")])
+        # Line number bytes are not the part of the line
+        self.assertEqual(zeussearch.search_data(TEST_DATA, b"\x0A\x01"), [])
+        self.assertEqual(zeussearch.search_data(TEST_DATA, b"NOP"), [])
+
+    def test_search_files(self):
+        handle, path = tempfile.mkstemp()
+        os.write(handle, TEST_DATA)
+        os.close(handle)
+        try:
+            results = list(zeussearch.search_files(
+                [path, path], zeussearch.compile_query("LDIR"), jobs=2))
+            self.assertEqual(results, [(path, [(256, "LOAD  LDIR")])]*2)
+            args = zeussearch.create_parser().parse_args(["LDIR", path])
+            self.assertEqual(zeussearch.search(args), 1)
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" zeustokens.py tests """
+
+import io
+import os
+import json
+import argparse
+import tempfile
+import unittest
+
+from zxtools import zeus2txt
+from zxtools import zeustokens
+
+# Line with the token 0xE9 undefined in the standard table
+EXTENDED_DATA = b"\x0A\x00\x0A\x06\xE9\x80\x00\xFF\xFF"
+
+
+class TestZeusTokens(unittest.TestCase):
+    def setUp(self):
+        handle, self.table_path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(handle, 'w', encoding='utf-8') as table_file:
+            json.dump({'base': 'zeus', 'extra': {'0xE9': "SLI "}},
+                      table_file)
+
+    def tearDown(self):
+        os.remove(self.table_path)
+
+    def test_tables(self):
+        table = zeustokens.get_table(self.table_path)
+        self.assertEqual(len(table), 256)
+        self.assertEqual(table[0xE9], "SLI ")
+        self.assertEqual(table[0x80], "A")
+        self.assertIs(zeustokens.get_table(self.table_path), table)
+        self.assertIsNone(zeustokens.get_table('zeus')[0xE9])
+        table = zeustokens.compile_table({'first_token': 0xF0,
+                                          'tokens': ["X", "Y"]})
+        self.assertEqual(table[0xF1], "Y")
+        self.assertIsNone(table[0x80])
+        self.assertIsNone(table[0xEF])
+        self.assertEqual(table[0x7F], chr(0x7F))
+        self.assertEqual(zeus2txt.decode_line(b"A\x80\xF1", table=table),
+                         "AY")
+        self.assertEqual(zeus2txt.decode_line(b"\x80", table=table,
+                                              recover=True), "<#80>")
+        with self.assertRaises(ValueError):
+            zeustokens.get_table('unknown')
+        with self.assertRaises(ValueError):
+            zeustokens.compile_table({'extra': {'256': "X"}})
+
+    def test_decode(self):
+        self.assertEqual(zeus2txt.convert_to_text(EXTENDED_DATA),
+                         "00010       A\n\n")
+        output = io.StringIO()
+        zeus2txt.convert(EXTENDED_DATA, output, recover=True)
+        self.assertEqual(output.getvalue(), "00010       <#E9>A\n\n")
+        output = io.StringIO()
+        zeus2txt.convert(EXTENDED_DATA, output,
+                         table=zeustokens.get_table(self.table_path))
+        self.assertEqual(output.getvalue(), "00010       SLI A\n\n")
+
+    def test_auto(self):
+        name, table, src_file = zeustokens.choose_table(
+            io.BytesIO(EXTENDED_DATA), 'auto', [self.table_path])
+        self.assertEqual(name, self.table_path)
+        self.assertEqual(src_file.read(), EXTENDED_DATA)
+        name, table, src_file = zeustokens.choose_table(
+            io.BytesIO(EXTENDED_DATA[4:]), 'auto', [self.table_path], 3)
+        self.assertEqual(name, 'zeus')
+        self.assertIs(table, zeus2txt.TOKEN_TABLE)
+
+    def test_convert_file(self):
+        output = io.StringIO()
+        output.close = lambda: None
+        args = argparse.Namespace(
+            zeus_file=io.BytesIO(EXTENDED_DATA), output_file=output,
+            include_code=False, tokens='auto',
+            token_tables=[self.table_path])
+        zeus2txt.convert_file(args)
+        self.assertEqual(output.getvalue(), "00010       SLI A\n\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+# vim: set fileencoding=utf-8 :
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" zeusxref.py tests """
+
+import io
+import json
+import unittest
+
+from zxtools import zeusxref
+
+
+class TestZeusXRef(unittest.TestCase):
+    def setUp(self):
+        self.xref = zeusxref.XRef()
+        self.xref.add_line(10, b"\x0A\x06\xBF50000")            # ORG 50000
+        self.xref.add_line(20, b"\x0A\x06\x8ACLS:\x8ACLS")     # CALL CLS
+        self.xref.add_line(30, b"CLS\x0A\x03\xB3\xA5,SCR")      # LD HL,SCR
+        self.xref.add_line(40, b"SCR\x0A\x03\xA016384 ;Screen")  # EQU 16384
+
+    def test_symbols(self):
+        cls = self.xref.symbols["CLS"]
+        self.assertEqual(cls.line, 30)
+        self.assertEqual(cls.org, "50000")
+        self.assertIsNone(cls.equ)
+        self.assertEqual(cls.refs, [20])
+        scr = self.xref.symbols["SCR"]
+        self.assertEqual(scr.line, 40)
+        self.assertEqual(scr.equ, "16384")
+        self.assertEqual(scr.refs, [30])
+
+    def test_operand(self):
+        self.assertEqual(zeusxref.operand(b"\x0A\xBF\xBF1", 0xBF), "1")
+        self.assertIsNone(zeusxref.operand(b"\x0A\xBF1", 0xBF))
+
+    def test_write(self):
+        output = io.StringIO()
+        self.xref.write(output)
+        self.assertEqual(output.getvalue().splitlines(), [
+            "CLS              00030 ORG 50000        00020",
+            "SCR              00040 EQU 16384        00030"])
+
+        output = io.StringIO()
+        self.xref.write(output, 'json')
+        self.assertEqual(json.loads(output.getvalue()), {'symbols': [
+            {'name': 'CLS', 'line': 30, 'equ': None, 'org': '50000',
+             'refs': [20]},
+            {'name': 'SCR', 'line': 40, 'equ': '16384', 'org': None,
+             'refs': [30]}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,259 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Convert members of zip and tar archives without unpacking them """
+
+import io
+import os
+import re
+import argparse
+import logging
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from zxtools import detect
+from zxtools import hobeta
+from zxtools import zeus2txt
+from zxtools.batch import OUTPUTS
+from zxtools.common import add_max_memory_argument, default_main
+from zxtools.common import get_buffer_limit
+
+
+def iter_members(path):
+    """ Iterate over the regular files of zip or tar (also .gz, .bz2, .xz)
+    archive. Yields the member name, its size and the file object to read
+    it from, which is valid until the next member is requested. Tar archives
+    are read as a stream, so they are decompressed only once """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.filename.endswith('/'):
+                    continue
+                with archive.open(info) as member_file:
+                    yield info.filename, info.file_size, member_file
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, member.size, \
+                        archive.extractfile(member)
+    else:
+        raise ValueError("%s is not a zip or tar archive" % path)
+
+
+# Result of the member skipped in the queue of the parallel conversions
+SKIPPED = Future()
+SKIPPED.set_result(None)
+
+
+def member_path(name):
+    """ Relative path of the member in the archive. Raises ValueError if
+    the name is an absolute path or has .. in it, so the output can't
+    escape the output folder """
+    parts = [part for part in re.split(r'[/\\]', name)
+             if part not in ('', '.')]
+    if re.match(r'^([/\\]|[A-Za-z]:)', name) or '..' in parts or not parts:
+        raise ValueError("Unsafe member name %s" % name)
+    return os.path.join(*parts)
+
+
+class MemberNames(object):
+    """ Check that the members have safe and unique paths """
+
+    def __init__(self):
+        self.paths = set()
+
+    def accept(self, name):
+        """ Check the member, log the error and return False if it can't be
+        converted """
+        try:
+            path = member_path(name)
+        except ValueError as error:
+            logging.getLogger('MemberNames').error("%s, skipped", error)
+            return False
+        if path in self.paths:
+            logging.getLogger('MemberNames').error(
+                "Member %s is repeated, skipped", name)
+            return False
+        self.paths.add(path)
+        return True
+
+
+def convert_stream(name, src_file, size, output_dir, include_code=False,
+                   ignore_header=False):
+    """ Convert the member depending on its format. The file doesn't need to
+    be seekable. The output keeps the member path (see member_path) with
+    the output extension appended. Returns the output path or None if
+    the format is not supported """
+    logger = logging.getLogger('convert_stream')
+
+    file_format, src_file = detect.peek(src_file, size)
+    if file_format not in OUTPUTS:
+        logger.warning("Skipped %s file %s", file_format, name)
+        return None
+    extension, mode = OUTPUTS[file_format]
+    output_path = os.path.join(output_dir, member_path(name) + extension)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, mode, encoding=None if 'b' in mode
+              else 'utf-8') as output_file:
+        if file_format == detect.FORMAT_HOBETA:
+            hobeta.strip(src_file, output_file, ignore_header)
+        else:
+            zeus2txt.convert(src_file, output_file, include_code)
+    return output_path
+
+
+# Zip archives opened by the worker process, by their paths
+_ZIP_ARCHIVES = {}
+
+
+def _open_zip(path):
+    """ Open the zip archive once per process, so its central directory is
+    not read again for each member """
+    archive = _ZIP_ARCHIVES.get(path)
+    if archive is None:
+        archive = _ZIP_ARCHIVES[path] = zipfile.ZipFile(path)
+    return archive
+
+
+def convert_zip_member(path, info, *args):
+    """ Convert the member of the zip archive given by its ZipInfo, the names
+    may be repeated """
+    with _open_zip(path).open(info) as src_file:
+        return convert_stream(info.filename, src_file, info.file_size, *args)
+
+
+def convert_data(name, data, *args):
+    """ Convert the member read to memory """
+    return convert_stream(name, io.BytesIO(data), len(data), *args)
+
+
+def convert_archive(path, output_dir, include_code=False, ignore_header=False,
+                    jobs=1):
+    """ Convert all the supported members of the archive to output_dir.
+    Members of zip archives are converted in parallel by their ZipInfo, tar
+    archive is decompressed by this process and the members are passed to
+    the others, except the ones larger than the buffer limit (see
+    common.get_buffer_limit) which are converted by this process. Members
+    with unsafe or repeated names are skipped. Returns the list of pairs
+    of the member name and the output path or None if the member was
+    skipped """
+    args = (output_dir, include_code, ignore_header)
+    names = MemberNames()
+    if jobs <= 1:
+        return [(name, convert_stream(name, member_file, size, *args)
+                 if names.accept(name) else None)
+                for name, size, member_file in iter_members(path)]
+
+    results = []
+    pending = deque()
+    with ProcessPoolExecutor(jobs) as executor:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                members = [info for info in archive.infolist()
+                           if not info.filename.endswith('/')]
+            for info in members:
+                if not names.accept(info.filename):
+                    pending.append((info.filename, SKIPPED))
+                    continue
+                pending.append((info.filename, executor.submit(
+                    convert_zip_member, path, info, *args)))
+        else:
+            limit = get_buffer_limit()
+            for name, size, member_file in iter_members(path):
+                if not names.accept(name):
+                    pending.append((name, SKIPPED))
+                    continue
+                if limit is not None and size > limit:
+                    # Too large to pass to the worker, stream it here
+                    results.extend((name, future.result())
+                                   for name, future in pending)
+                    pending.clear()
+                    results.append((name, convert_stream(
+                        name, member_file, size, *args)))
+                    continue
+                pending.append((name, executor.submit(
+                    convert_data, name, member_file.read(), *args)))
+                # Don't keep in memory more members than the workers need
+                while len(pending) > 2 * jobs:
+                    name, future = pending.popleft()
+                    results.append((name, future.result()))
+        results.extend((name, future.result()) for name, future in pending)
+    return results
+
+
+def list_members(parsed_args):
+    """ Print the members of the archive and their formats """
+    formats = []
+    for name, size, member_file in iter_members(parsed_args.archive):
+        file_format, _ = detect.peek(member_file, size)
+        print("%s:\t%s" % (name, file_format))
+        formats.append((name, file_format))
+    return formats
+
+
+def convert_members(parsed_args):
+    """ Convert the members of the archive """
+    if not os.path.isdir(parsed_args.output_dir):
+        os.makedirs(parsed_args.output_dir)
+    results = convert_archive(
+        parsed_args.archive, parsed_args.output_dir, parsed_args.include_code,
+        parsed_args.ignore_header, parsed_args.jobs)
+    print("Converted %d of %d file(s)." % (
+        sum(1 for _, output in results if output is not None), len(results)))
+    return results
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Convert files in zip and tar archives")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_max_memory_argument(parser)
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    list_parser = subparsers.add_parser(
+        'list', help="Show the members of the archive and their formats")
+    list_parser.add_argument(
+        'archive', help="Zip or tar (.gz, .bz2, .xz) archive")
+    list_parser.set_defaults(func=list_members)
+
+    convert_parser = subparsers.add_parser(
+        'convert', help="Strip Hobeta headers and convert Zeus Z80 "
+        "assembler files in the archive depending on their format")
+    convert_parser.add_argument(
+        'archive', help="Zip or tar (.gz, .bz2, .xz) archive")
+    convert_parser.add_argument(
+        'output_dir', metavar='output-dir', help="Path to the output folder")
+    convert_parser.add_argument(
+        '--include-code', dest='include_code',
+        action='store_true', help="Include original code in the output file")
+    convert_parser.add_argument(
+        '--ignore-header', dest='ignore_header',
+        action='store_true', help="Ignore the file size from Hobeta header")
+    convert_parser.add_argument(
+        '-j', '--jobs', type=int, default=1, help="Number of processes")
+    convert_parser.set_defaults(func=convert_members)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
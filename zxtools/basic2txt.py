@@ -0,0 +1,385 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Convert ZX Spectrum BASIC program to a plain text """
+
+import io
+import math
+import argparse
+import logging
+import struct
+from collections import namedtuple
+
+from zxtools import charset
+from zxtools import detect
+from zxtools import hobeta
+from zxtools.common import default_main, open_source, open_target
+from zxtools.common import add_max_memory_argument, read_limited
+
+###############################################################################
+#
+# Each line of the program starts with the line number (big-endian) and
+# the length of the rest of the line (little-endian) and ends with 0x0D.
+# Number literals are followed by 0x0E and the 5-byte number ROM uses.
+# The variables area follows the program, the first byte of each variable
+# has bits 5-7 set to its type and it ends with 0x80. In TR-DOS (and so in
+# Hobeta) header the start parameter of B file is the program length.
+#
+LINE_HEADER_SIZE = 4
+LINE_END = 0x0D
+NUMBER_MARK = 0x0E
+NUMBER_SIZE = 5
+QUOTE = 0x22
+BIN_TOKEN = 0xC4
+REM_TOKEN = 0xEA
+FIRST_COMMAND = 0xC5  # Keywords from OR on may have a leading space
+VARIABLES_END = 0x80
+MAX_PROGRAM_SIZE = 64 * 1024
+
+# Embedded colour and position controls and the number of their parameters
+CONTROL_CODES = {
+    0x10: ("INK", 1), 0x11: ("PAPER", 1), 0x12: ("FLASH", 1),
+    0x13: ("BRIGHT", 1), 0x14: ("INVERSE", 1), 0x15: ("OVER", 1),
+    0x16: ("AT", 2), 0x17: ("TAB", 2),
+}
+CONTROL_FORMAT = "{#%02X}"
+NUMBER_FORMAT = "{=%s}"
+
+NUMBERS_SKIP = 'skip'
+NUMBERS_DIFFERENT = 'different'
+NUMBERS_ALL = 'all'
+
+TokenTable = namedtuple('TokenTable', 'texts leading')
+
+
+def make_token_table(spectrum128=False):
+    """ Texts of the 256 byte values and the set of the keywords printed
+    with a leading space. 128K models have SPECTRUM and PLAY keywords
+    instead of the last two UDGs """
+    texts = list(charset.CHARSET)
+    for code in range(0x20):
+        texts[code] = CONTROL_FORMAT % code
+    leading = set()
+    keywords = list(enumerate(charset.KEYWORDS, charset.FIRST_KEYWORD))
+    if spectrum128:
+        keywords += list(enumerate(charset.KEYWORDS_128, charset.FIRST_KEYWORD
+                                   - len(charset.KEYWORDS_128)))
+    for code, keyword in keywords:
+        # Like ROM does, the commands and the operators starting with
+        # a letter are printed with a leading space. RND, INKEY$, PI and
+        # the keywords ending with anything but a letter are printed
+        # without a trailing space
+        if (code >= FIRST_COMMAND or code < charset.FIRST_KEYWORD) and \
+                keyword[0] >= 'A':
+            leading.add(code)
+        if not charset.FIRST_KEYWORD <= code < charset.FIRST_KEYWORD + 3 \
+                and keyword[-1] >= 'A':
+            keyword += " "
+        texts[code] = keyword
+    return TokenTable(tuple(texts), frozenset(leading))
+
+
+TOKEN_TABLE = make_token_table()
+TOKEN_TABLE_128 = make_token_table(True)
+
+
+def parse_number(data):
+    """ Value of the number in 5-byte ROM format """
+    if data[0] == 0:  # Small integer: sign byte and little-endian value
+        value = data[2] + data[3] * 256
+        return value - 0x10000 if data[1] == 0xFF else value
+    mantissa = struct.unpack('>I', bytes(data[1:NUMBER_SIZE]))[0]
+    value = math.ldexp(mantissa | 0x80000000, data[0] - 160)
+    return -value if mantissa & 0x80000000 else value
+
+
+def format_number(value):
+    """ Integers without a fraction, the rest with 10 significant digits """
+    if isinstance(value, int) or (value.is_integer() and abs(value) < 1e15):
+        return "%d" % value
+    return "%.10g" % value
+
+
+def literal_value(body, end):
+    """ Value of the number literal ending at end, None if there's no
+    literal or it can't be parsed """
+    start = end
+    while start > 0:
+        value = body[start-1]
+        if 0x30 <= value <= 0x39 or value in b".Ee" or \
+                (value in b"+-" and start > 1 and body[start-2] in b"Ee"):
+            start -= 1
+        else:
+            break
+    text = bytes(body[start:end]).decode('ascii')
+    try:
+        if start > 0 and body[start-1] == BIN_TOKEN:
+            return int(text or "0", 2)
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _is_same(literal, value):
+    return literal is not None and \
+        abs(literal - value) <= 1e-9 * max(1.0, abs(value))
+
+
+def decode_line(body, table=TOKEN_TABLE, numbers=NUMBERS_SKIP):
+    """ Convert the tokenized line body to the plain text. Hidden numbers
+    are skipped, shown as {=value} if numbers is 'all' or only if the value
+    differs from the literal if numbers is 'different'. Like in ROM the line
+    ends at the first 0x0D outside of the numbers """
+    texts, leading = table
+    parts = []
+    spaced = True  # The last character is a space, no leading one needed
+    quoted = rem = False
+    pos = 0
+    end = len(body)
+    while pos < end:
+        value = body[pos]
+        pos += 1
+        if value == NUMBER_MARK and not quoted and not rem:
+            if numbers != NUMBERS_SKIP and pos + NUMBER_SIZE <= end:
+                number = parse_number(body[pos:pos+NUMBER_SIZE])
+                if numbers == NUMBERS_ALL or \
+                        not _is_same(literal_value(body, pos-1), number):
+                    parts.append(NUMBER_FORMAT % format_number(number))
+                    spaced = False
+            pos += NUMBER_SIZE
+            continue
+        if value == LINE_END:
+            break
+        if value in CONTROL_CODES:
+            name, size = CONTROL_CODES[value]
+            parts.append("{%s %s}" % (name, ",".join(
+                "%d" % param for param in body[pos:pos+size])))
+            pos += size
+            spaced = False
+            continue
+        if value == QUOTE:
+            quoted = not quoted
+        elif value == REM_TOKEN and not quoted:
+            rem = True
+        text = texts[value]
+        if value in leading and not spaced:
+            parts.append(" ")
+        parts.append(text)
+        spaced = text.endswith(" ")
+    return "".join(parts)
+
+
+def split_program(data, program_length=None):
+    """ Find the lines of the program in data. Returns the list of triples:
+    the line number and the boundaries of the line body, and the offset of
+    the variables area. It starts at program_length if given, or where
+    the line number is too large to be a line number """
+    logger = logging.getLogger('split_program')
+
+    end = len(data) if program_length is None \
+        else min(program_length, len(data))
+    lines = []
+    pos = 0
+    while pos + LINE_HEADER_SIZE <= end and data[pos] < 0x40:
+        strnum = struct.unpack_from('>H', data, pos)[0]
+        length = struct.unpack_from('<H', data, pos+2)[0]
+        body_start = pos + LINE_HEADER_SIZE
+        body_end = body_start + length
+        if body_end > end:
+            logger.warning("Line %d is truncated", strnum)
+            body_end = end
+        lines.append((strnum, body_start, body_end))
+        pos = body_end
+    return lines, pos if program_length is None else end
+
+
+def _decode_text(data, table):
+    return "".join(table.texts[value] for value in data)
+
+
+def _dimensions(data, pos):
+    count = data[pos]
+    dims = struct.unpack_from('<%dH' % count, data, pos+1)
+    return dims, pos + 1 + 2 * count
+
+
+def decode_variables(data, pos=0, table=TOKEN_TABLE):
+    """ Convert the variables area to the list of texts like a = 1 """
+    logger = logging.getLogger('decode_variables')
+
+    variables = []
+    try:
+        while pos < len(data) and data[pos] != VARIABLES_END:
+            kind = data[pos] & 0xE0
+            name = chr(data[pos] & 0x1F | 0x60)
+            pos += 1
+            if kind == 0x60:  # Number with a single letter name
+                value = parse_number(data[pos:pos+NUMBER_SIZE])
+                pos += NUMBER_SIZE
+                text = "%s = %s" % (name, format_number(value))
+            elif kind == 0xA0:  # Number with a long name
+                while not data[pos] & 0x80:
+                    name += chr(data[pos]).lower()
+                    pos += 1
+                name += chr(data[pos] & 0x7F).lower()
+                value = parse_number(data[pos+1:pos+1+NUMBER_SIZE])
+                pos += 1 + NUMBER_SIZE
+                text = "%s = %s" % (name, format_number(value))
+            elif kind == 0xE0:  # Control variable of FOR loop
+                value, limit, step = (
+                    format_number(parse_number(data[offset:offset+5]))
+                    for offset in range(pos, pos + 3 * NUMBER_SIZE,
+                                        NUMBER_SIZE))
+                pos += 3 * NUMBER_SIZE
+                strnum, statement = struct.unpack_from('<HB', data, pos)
+                pos += 3
+                text = "%s = %s TO %s STEP %s LINE %d:%d" % (
+                    name, value, limit, step, strnum, statement)
+            elif kind == 0x40:  # String
+                length = struct.unpack_from('<H', data, pos)[0]
+                text = '%s$ = "%s"' % (name, _decode_text(
+                    data[pos+2:pos+2+length], table))
+                pos += 2 + length
+            elif kind in (0x80, 0xC0):  # Array of numbers or characters
+                length = struct.unpack_from('<H', data, pos)[0]
+                dims, start = _dimensions(data, pos+2)
+                pos += 2 + length
+                if kind == 0x80:
+                    values = ", ".join(
+                        format_number(parse_number(data[offset:offset+5]))
+                        for offset in range(start, pos, NUMBER_SIZE))
+                else:
+                    name += "$"
+                    row = dims[-1] if dims else 1
+                    values = ", ".join(
+                        '"%s"' % _decode_text(data[offset:offset+row], table)
+                        for offset in range(start, pos, row))
+                text = "%s(%s) = %s" % (name, ",".join(
+                    "%d" % dim for dim in dims), values)
+            else:
+                logger.warning("Unknown variable type 0x%02X", data[pos-1])
+                break
+            if pos > len(data):
+                logger.warning("Variable %s is truncated", name)
+                break
+            variables.append(text)
+    except (IndexError, struct.error):
+        logger.warning("Variables area is truncated")
+    return variables
+
+
+def read_program(source, ignore_header=False):
+    """ Read BASIC program from bytes, a path or a binary file, with or
+    without Hobeta header. Returns the data and the program length from
+    the header of B file or None """
+    with open_source(source) as src_file:
+        data = read_limited(src_file,
+                            detect.HOBETA_HEADER_SIZE + MAX_PROGRAM_SIZE)
+    if not detect.is_hobeta(data, len(data)):
+        return data, None
+    header, _ = hobeta.parse_header(data)
+    logging.getLogger('read_program').debug(header)
+    data = data[detect.HOBETA_HEADER_SIZE:]
+    if not ignore_header:
+        data = data[0:header.length]
+    return data, header.start if header.filetype == ord('B') else None
+
+
+def convert(source, output, numbers=NUMBERS_SKIP, variables=False,
+            spectrum128=False, ignore_header=False, program_length=None):
+    """ Convert ZX Spectrum BASIC program to the plain text and write it to
+    the output. The source is bytes, a path or a binary file, with or without
+    Hobeta header, the output is a path or a text file. See decode_line for
+    numbers. The variables area is appended if variables is set, it starts
+    at program_length or at the length from Hobeta header if not given.
+    Returns the number of lines converted """
+    data, header_length = read_program(source, ignore_header)
+    if program_length is None:
+        program_length = header_length
+    table = TOKEN_TABLE_128 if spectrum128 else TOKEN_TABLE
+    lines, variables_start = split_program(data, program_length)
+    with open_target(output, 'w') as dst_file:
+        for strnum, start, end in lines:
+            dst_file.write("%4d %s\n" % (strnum, decode_line(
+                data[start:end], table, numbers)))
+        if variables:
+            for text in decode_variables(data, variables_start, table):
+                dst_file.write("%s\n" % text)
+    return len(lines)
+
+
+def convert_to_text(source, numbers=NUMBERS_SKIP, variables=False):
+    """ Convert ZX Spectrum BASIC program to the plain text """
+    output = io.StringIO()
+    convert(source, output, numbers, variables)
+    return output.getvalue()
+
+
+def convert_file(parsed_args):
+    """ Convert BASIC program specified in basic_file to the plain text and
+    print it to the output_file """
+    with parsed_args.basic_file as src_file, \
+            parsed_args.output_file as dst_file:
+        return convert(src_file, dst_file, parsed_args.numbers,
+                       parsed_args.variables, parsed_args.spectrum128,
+                       parsed_args.ignore_header, parsed_args.program_length)
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="ZX Spectrum BASIC programs converter")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_max_memory_argument(parser)
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    convert_parser = subparsers.add_parser(
+        'convert', help="Convert BASIC program to a plain text file")
+    convert_parser.add_argument(
+        'basic_file', metavar='basic-file', type=argparse.FileType('rb', 0),
+        help="Input file with BASIC program, Hobeta header is parsed if "
+        "present (usually FILENAME.$B)")
+    convert_parser.add_argument(
+        'output_file', metavar='output-file',
+        type=argparse.FileType('w', encoding='utf-8'),
+        help="Path to the output file")
+    convert_parser.add_argument(
+        '--numbers', choices=(NUMBERS_SKIP, NUMBERS_DIFFERENT, NUMBERS_ALL),
+        default=NUMBERS_SKIP, help="Show the hidden 5-byte numbers as "
+        "{=value}: never, only if differ from the number shown or always")
+    convert_parser.add_argument(
+        '--variables', action='store_true',
+        help="Append the variables saved with the program")
+    convert_parser.add_argument(
+        '--128k', dest='spectrum128', action='store_true',
+        help="Decode SPECTRUM and PLAY keywords of 128K models")
+    convert_parser.add_argument(
+        '--program-length', dest='program_length',
+        type=lambda value: int(value, 0),
+        help="Offset of the variables area (default is the start parameter "
+        "of Hobeta header or the first line number above 16383)")
+    convert_parser.add_argument(
+        '--ignore-header', dest='ignore_header',
+        action='store_true', help="Ignore the file size from Hobeta header")
+    convert_parser.set_defaults(func=convert_file)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Resumable batch conversion of many files """
+
+import io
+import os
+import struct
+import argparse
+import hashlib
+import logging
+import tempfile
+
+from zxtools import basic2txt
+from zxtools import detect
+from zxtools import hobeta
+from zxtools import zeus2txt
+from zxtools.common import default_main, get_chunk_size
+from zxtools.common import add_max_memory_argument, common_folder
+
+JOURNAL_NAME = '.zxtools-journal'
+TEMP_PREFIX = '.zxtools-'
+TEMP_SUFFIX = '.tmp'
+
+# Output file extension and open mode for each supported input format
+OUTPUTS = {
+    detect.FORMAT_HOBETA: ('.bin', 'wb'),
+    detect.FORMAT_ZEUS: ('.asm', 'w'),
+}
+# Hobeta files with BASIC programs if they are converted to the plain text
+BASIC_OUTPUT = ('.bas', 'w')
+
+
+def file_digest(path):
+    """ SHA-1 of the file content """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as src_file:
+        chunk_size = get_chunk_size(None, src_file)
+        while True:
+            chunk = src_file.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DigestFile(io.FileIO):
+    """ Raw file that computes SHA-1 of the data as it's written. It hides
+    its descriptor, so the data is not copied around write by the system
+    calls like os.sendfile """
+
+    def __init__(self, *args, **kwargs):
+        super(DigestFile, self).__init__(*args, **kwargs)
+        self.digest = hashlib.sha1()
+
+    def write(self, data):
+        written = super(DigestFile, self).write(data)
+        if written:
+            self.digest.update(memoryview(data)[0:written])
+        return written
+
+    def fileno(self):
+        raise io.UnsupportedOperation("fileno")
+
+
+def open_digest_file(handle, mode):
+    """ Open the file descriptor for writing in binary or text mode,
+    the text is encoded to UTF-8. Returns the file object and DigestFile
+    under it """
+    raw_file = DigestFile(handle, 'w')
+    output_file = io.BufferedWriter(raw_file)
+    if 'b' not in mode:
+        output_file = io.TextIOWrapper(output_file, encoding='utf-8')
+    return output_file, raw_file
+
+
+class Journal(object):
+    """ Append-only log of the completed inputs. Each record is a line:
+    path, size, mtime in nanoseconds, output path, output size, output mtime
+    in nanoseconds and SHA-1 of the output separated by tabs. Incomplete
+    records at the end of the file are ignored """
+
+    def __init__(self, path, resume=False):
+        self.done = {}
+        if resume and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as journal_file:
+                for record in journal_file:
+                    if not record.endswith('\n'):
+                        break
+                    fields = record.rstrip('\n').split('\t')
+                    if len(fields) != 7:
+                        continue
+                    self.done[fields[0]] = (
+                        int(fields[1]), int(fields[2]), fields[3],
+                        int(fields[4]), int(fields[5]), fields[6])
+        self.journal_file = open(path, 'a' if resume else 'w',
+                                 encoding='utf-8')
+
+    def close(self):
+        """ Close the journal file """
+        self.journal_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def is_done(self, path, stat, verify=False):
+        """ Check if the input was completed and was not changed since, and
+        its output still has the recorded size and mtime. If verify is set,
+        the SHA-1 of the output is checked as well """
+        record = self.done.get(path)
+        if record is None or record[0:2] != (stat.st_size, stat.st_mtime_ns):
+            return False
+        output_path = record[2]
+        try:
+            output_stat = os.stat(output_path)
+        except OSError:
+            return False
+        if record[3:5] != (output_stat.st_size, output_stat.st_mtime_ns):
+            return False
+        return not verify or file_digest(output_path) == record[5]
+
+    def add(self, path, stat, output_path, output_digest):
+        """ Record the completed input and its output with the digest """
+        output_stat = os.stat(output_path)
+        record = (stat.st_size, stat.st_mtime_ns, output_path,
+                  output_stat.st_size, output_stat.st_mtime_ns, output_digest)
+        self.journal_file.write("%s\t%d\t%d\t%s\t%d\t%d\t%s\n" % (
+            (path,) + record))
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+        self.done[path] = record
+
+
+def remove_stale_files(output_dir):
+    """ Remove the temporary files left by the killed runs """
+    logger = logging.getLogger('remove_stale_files')
+
+    for root, _, names in os.walk(output_dir):
+        for name in names:
+            if name.startswith(TEMP_PREFIX) and name.endswith(TEMP_SUFFIX):
+                logger.info("Removed stale %s", os.path.join(root, name))
+                os.remove(os.path.join(root, name))
+
+
+def output_file_mode():
+    """ Permissions of the new files by the process umask. The umask can
+    be read only by changing it, so call it once before starting threads """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def convert_one(path, output_dir, include_code=False, ignore_header=False,
+                basic=False, root=None, file_mode=None):
+    """ Convert a single file and atomically put the result to output_dir.
+    The output path is the input path relative to root (the folder of
+    the input if not given) with the output extension appended. If basic
+    is set, BASIC programs in Hobeta files are converted to the plain text.
+    The output gets file_mode permissions (see output_file_mode by
+    default). Returns the output path and SHA-1 of the output, or None if
+    the format is not supported """
+    logger = logging.getLogger('convert_one')
+
+    src_file = open(path, 'rb')
+    file_format = detect.sniff(src_file)
+    if file_format not in OUTPUTS:
+        src_file.close()
+        logger.warning("Skipped %s file %s", file_format, path)
+        return None
+    extension, mode = OUTPUTS[file_format]
+    is_basic = False
+    if basic and file_format == detect.FORMAT_HOBETA:
+        is_basic = hobeta.parse_info(src_file)[0].filetype == ord('B')
+        src_file.seek(0)
+        if is_basic:
+            extension, mode = BASIC_OUTPUT
+    if root is None:
+        root = os.path.dirname(os.path.abspath(path))
+    output_path = os.path.join(
+        output_dir, os.path.relpath(os.path.abspath(path), root) + extension)
+    output_folder = os.path.dirname(output_path)
+    if not os.path.isdir(output_folder):
+        os.makedirs(output_folder)
+    handle, temp_path = tempfile.mkstemp(
+        dir=output_folder, prefix=TEMP_PREFIX, suffix=TEMP_SUFFIX)
+    try:
+        output_file, raw_file = open_digest_file(handle, mode)
+        with src_file, output_file:
+            if is_basic:
+                basic2txt.convert(src_file, output_file,
+                                  ignore_header=ignore_header)
+            elif file_format == detect.FORMAT_HOBETA:
+                hobeta.strip(src_file, output_file, ignore_header)
+            else:
+                zeus2txt.convert(src_file, output_file, include_code)
+            # The journal may record the output right after the rename,
+            # so the data must be on the disk before it
+            output_file.flush()
+            os.fsync(handle)
+        # mkstemp creates the file readable only by the owner
+        os.chmod(temp_path, output_file_mode() if file_mode is None
+                 else file_mode)
+        os.replace(temp_path, output_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return output_path, raw_file.digest.hexdigest()
+
+
+def convert_files(parsed_args):
+    """ Convert the files skipping the completed ones if resumed. The folder
+    structure of the inputs is kept in the output folder. The files that
+    can't be read or converted are reported and the rest are converted.
+    Returns the numbers of converted, skipped and failed files """
+    logger = logging.getLogger('convert_files')
+
+    if not os.path.isdir(parsed_args.output_dir):
+        os.makedirs(parsed_args.output_dir)
+    remove_stale_files(parsed_args.output_dir)
+    journal_path = parsed_args.journal or \
+        os.path.join(parsed_args.output_dir, JOURNAL_NAME)
+    paths = []
+    for path in parsed_args.files:
+        path = os.path.abspath(path)
+        if path not in paths:
+            paths.append(path)
+    root = common_folder(paths)
+    file_mode = output_file_mode()
+    verify = getattr(parsed_args, 'verify', False)
+    converted = skipped = failed = 0
+    with Journal(journal_path, parsed_args.resume) as journal:
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                if journal.is_done(path, stat, verify):
+                    logger.debug("%s is already converted", path)
+                    skipped += 1
+                    continue
+                result = convert_one(
+                    path, parsed_args.output_dir, parsed_args.include_code,
+                    parsed_args.ignore_header, parsed_args.basic, root,
+                    file_mode)
+            except (IOError, ValueError, struct.error) as error:
+                logger.error("%s: %s", path, error)
+                failed += 1
+                continue
+            if result is None:
+                continue
+            journal.add(path, stat, *result)
+            converted += 1
+    print("Converted %d file(s), skipped %d already converted, %d failed." %
+          (converted, skipped, failed))
+    return converted, skipped, failed
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Resumable batch conversion of Hobeta and Zeus files")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_max_memory_argument(parser)
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    convert_parser = subparsers.add_parser(
+        'convert', help="Strip Hobeta headers and convert Zeus Z80 "
+        "assembler files depending on their format")
+    convert_parser.add_argument(
+        'output_dir', metavar='output-dir', help="Path to the output folder")
+    convert_parser.add_argument(
+        'files', metavar='file', nargs='+', help="Input files")
+    convert_parser.add_argument(
+        '--journal', help="Path to the journal of the completed files "
+        "(default is %s in the output folder)" % JOURNAL_NAME)
+    convert_parser.add_argument(
+        '--resume', action='store_true',
+        help="Skip the files completed by the previous run")
+    convert_parser.add_argument(
+        '--verify', action='store_true',
+        help="With --resume, also check SHA-1 of the completed outputs "
+        "instead of their size and time only")
+    convert_parser.add_argument(
+        '--include-code', dest='include_code',
+        action='store_true', help="Include original code in the output file")
+    convert_parser.add_argument(
+        '--ignore-header', dest='ignore_header',
+        action='store_true', help="Ignore the file size from Hobeta header")
+    convert_parser.add_argument(
+        '--basic', action='store_true',
+        help="Convert BASIC programs in Hobeta files to the plain text "
+        "instead of stripping the header")
+    convert_parser.set_defaults(func=convert_files)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
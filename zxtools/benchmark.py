@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Performance benchmarks """
+
+import os
+import argparse
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from zxtools import hobeta
+from zxtools.common import default_main
+
+
+def make_hobeta_files(folder, count, size):
+    """ Create count Hobeta files with size bytes of data each """
+    paths = []
+    for index in range(count):
+        header = ('file%04dC' % (index % 10000)).encode('ascii') + \
+            bytes((0, 0x80, size & 0xFF, (size >> 8) & 0xFF, 0, 0))
+        check_sum = hobeta.calc_checksum(header)
+        path = os.path.join(folder, 'file%04d.$C' % index)
+        with open(path, 'wb') as hobeta_file:
+            hobeta_file.write(header + bytes((check_sum & 0xFF,
+                                              check_sum >> 8)))
+            hobeta_file.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def strip_files(paths, threads):
+    """ Strip Hobeta headers in the thread pool.
+    Returns the number of bytes copied and the time spent """
+    outputs = [path + '.out' for path in paths]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        copied = sum(result.copied for result in executor.map(
+            hobeta.strip, paths, outputs, [True]*len(paths)))
+    elapsed = time.perf_counter() - start
+    for path in outputs:
+        os.remove(path)
+    return copied, elapsed
+
+
+def strip_benchmark(parsed_args):
+    """ Measure hobeta.strip throughput depending on the number of threads """
+    folder = tempfile.mkdtemp(dir=parsed_args.dir)
+    results = []
+    try:
+        paths = make_hobeta_files(folder, parsed_args.files, parsed_args.size)
+        strip_files(paths, 1)  # Warm up the page cache
+        base = None
+        print("Threads  MB/s      Speedup")
+        for threads in parsed_args.threads:
+            copied, elapsed = strip_files(paths, threads)
+            throughput = copied / elapsed / 1024 / 1024
+            base = base or throughput
+            print("%-8d %-9.1f %.2f" % (threads, throughput, throughput/base))
+            results.append((threads, throughput))
+    finally:
+        shutil.rmtree(folder)
+    return results
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(description="zxtools benchmarks")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+
+    subparsers = parser.add_subparsers(help="Available benchmarks")
+    subparsers.required = False
+
+    strip_parser = subparsers.add_parser(
+        'strip', help="Concurrent Hobeta header stripping")
+    strip_parser.add_argument(
+        '--threads', type=int, nargs='+', default=[1, 2, 4, 8],
+        help="Numbers of threads to measure")
+    strip_parser.add_argument(
+        '--files', type=int, default=256, help="Number of files")
+    strip_parser.add_argument(
+        '--size', type=int, default=48*1024,
+        help="Size of each file, up to 65535 bytes")
+    strip_parser.add_argument(
+        '--dir', help="Folder for the temporary files (on the disk to test)")
+    strip_parser.set_defaults(func=strip_benchmark)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
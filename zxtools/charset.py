@@ -0,0 +1,71 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" ZX Spectrum character set """
+
+# ZX Spectrum character set differs from ASCII in a few codes
+# and continues with the block graphics, user defined graphics (UDG)
+# and BASIC keywords:
+#
+# 0x00-0x1F  - control codes
+# 0x20-0x7F  - ASCII, but 0x5E is up arrow, 0x60 is pound, 0x7F is copyright
+# 0x80-0x8F  - 2x2 block graphics, bits are quarters: 0 - top right,
+#              1 - top left, 2 - bottom right, 3 - bottom left
+# 0x90-0xA4  - UDG A-U (0x90-0xA2 in 128K models, where the rest is
+#              SPECTRUM and PLAY keywords)
+# 0xA5-0xFF  - BASIC keywords
+#
+SPECIAL_CHARS = {0x5E: "↑", 0x60: "£", 0x7F: "©"}
+BLOCK_GRAPHICS = " ▝▘▀▗▐▚▜▖▞▌▛▄▟▙█"
+UDG_FIRST = 0x90
+UDG_COUNT = 21
+# UDGs are shown as the circled letters they are typed with
+UDG_CHARS = "".join(chr(0x24B6 + index) for index in range(UDG_COUNT))
+
+
+def make_charset(graphics=True, placeholder='.'):
+    """ Tuple of 256 characters to show the each byte value. Without
+    graphics only the printable ASCII characters are shown, the rest
+    are placeholders """
+    chars = [placeholder] * 256
+    for code in range(0x20, 0x7F):
+        chars[code] = chr(code)
+    if graphics:
+        for code, char in SPECIAL_CHARS.items():
+            chars[code] = char
+        chars[0x80:0x80+len(BLOCK_GRAPHICS)] = BLOCK_GRAPHICS
+        chars[UDG_FIRST:UDG_FIRST+UDG_COUNT] = UDG_CHARS
+    return tuple(chars)
+
+
+CHARSET = make_charset()
+ASCII_CHARSET = make_charset(False)
+
+
+def translation(charset):
+    """ Table for str.translate of the bytes decoded as latin-1 """
+    return {code: char for code, char in enumerate(charset)
+            if chr(code) != char}
+
+
+FIRST_KEYWORD = 0xA5
+KEYWORDS = (
+    "RND", "INKEY$", "PI", "FN", "POINT", "SCREEN$", "ATTR", "AT", "TAB",
+    "VAL$", "CODE", "VAL", "LEN", "SIN", "COS", "TAN", "ASN", "ACS", "ATN",
+    "LN", "EXP", "INT", "SQR", "SGN", "ABS", "PEEK", "IN", "USR", "STR$",
+    "CHR$", "NOT", "BIN", "OR", "AND", "<=", ">=", "<>", "LINE", "THEN", "TO",
+    "STEP", "DEF FN", "CAT", "FORMAT", "MOVE", "ERASE", "OPEN #", "CLOSE #",
+    "MERGE", "VERIFY", "BEEP", "CIRCLE", "INK", "PAPER", "FLASH", "BRIGHT",
+    "INVERSE", "OVER", "OUT", "LPRINT", "LLIST", "STOP", "READ", "DATA",
+    "RESTORE", "NEW", "BORDER", "CONTINUE", "DIM", "REM", "FOR", "GO TO",
+    "GO SUB", "INPUT", "LOAD", "LIST", "LET", "PAUSE", "NEXT", "POKE",
+    "PRINT", "PLOT", "RUN", "SAVE", "RANDOMIZE", "IF", "CLS", "DRAW",
+    "CLEAR", "RETURN", "COPY")
+# 128K models replace the last two UDGs with these keywords
+KEYWORDS_128 = ("SPECTRUM", "PLAY")
@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Single entry point for all the tools """
+
+import sys
+import os
+import argparse
+import importlib
+import logging
+
+from zxtools import detect
+from zxtools import hobeta
+from zxtools import zeus2txt
+from zxtools.common import add_max_memory_argument, default_main
+
+# Tools that can be invoked as "zxtools <tool> <tool arguments>"
+TOOLS = {
+    'archive': 'zxtools.archive',
+    'basic': 'zxtools.basic2txt',
+    'batch': 'zxtools.batch',
+    'benchmark': 'zxtools.benchmark',
+    'fanout': 'zxtools.fanout',
+    'golden': 'zxtools.golden',
+    'hobeta': 'zxtools.hobeta',
+    'index': 'zxtools.zeusindex',
+    'lines': 'zxtools.zeuslines',
+    'screen': 'zxtools.screen',
+    'search': 'zxtools.zeussearch',
+    'snapshot': 'zxtools.snapshot',
+    'zeus2txt': 'zxtools.zeus2txt',
+}
+
+
+def detect_files(parsed_args):
+    """ Print detected format of the each file """
+    formats = []
+    for path in parsed_args.files:
+        with open(path, 'rb') as src_file:
+            file_format = detect.sniff(src_file)
+        print("%s:\t%s" % (path, file_format))
+        formats.append(file_format)
+    return formats
+
+
+def show_info(parsed_args):
+    """ Show information about the each file according to its format """
+    for path in parsed_args.files:
+        if len(parsed_args.files) > 1:
+            print("%s:" % path)
+        with open(path, 'rb') as src_file:
+            file_format = detect.sniff(src_file)
+            if file_format == detect.FORMAT_HOBETA:
+                print(hobeta.format_info(*hobeta.parse_info(src_file)))
+            else:
+                src_file.seek(0, os.SEEK_END)
+                print(("Format:\t" + file_format + "\n" +
+                       "File size:\t" + str(src_file.tell())).expandtabs(20))
+
+
+def convert_file(parsed_args):
+    """ Convert the input file with the tool suitable for its format.
+    Exits with status 1 if the format is not supported """
+    logger = logging.getLogger('convert_file')
+
+    with open(parsed_args.input_file, 'rb') as src_file:
+        file_format = detect.sniff(src_file)
+        logger.debug(file_format)
+        if file_format == detect.FORMAT_HOBETA:
+            result = hobeta.strip(src_file, parsed_args.output_file,
+                                  parsed_args.ignore_header)
+            if result.header.check_sum != result.check_sum:
+                print("WARNING: wrong checksum in the header.")
+            return result.copied
+        if file_format == detect.FORMAT_ZEUS:
+            return zeus2txt.convert(src_file, parsed_args.output_file,
+                                    parsed_args.include_code)
+    print("ERROR: don't know how to convert %s file %s." %
+          (file_format, parsed_args.input_file), file=sys.stderr)
+    sys.exit(1)
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Tools to manipulate ZX Spectrum files",
+        epilog="Run 'zxtools TOOL -h' to get help on the specific tool. "
+        "Available tools: " + ", ".join(sorted(TOOLS)) + ".")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_max_memory_argument(parser)
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    detect_parser = subparsers.add_parser(
+        'detect', help="Detect format of the specified files")
+    detect_parser.add_argument(
+        'files', metavar='file', nargs='+', help="Input files")
+    detect_parser.set_defaults(func=detect_files)
+
+    info_parser = subparsers.add_parser(
+        'info', help="Show information about the specified files")
+    info_parser.add_argument(
+        'files', metavar='file', nargs='+', help="Input files")
+    info_parser.set_defaults(func=show_info)
+
+    convert_parser = subparsers.add_parser(
+        'convert', help="Strip Hobeta header or convert Zeus Z80 assembler "
+        "file depending on the input format")
+    convert_parser.add_argument(
+        'input_file', metavar='input-file', help="Input file")
+    convert_parser.add_argument(
+        'output_file', metavar='output-file', help="Path to the output file")
+    convert_parser.add_argument(
+        '--include-code', dest='include_code',
+        action='store_true', help="Include original code in the output file")
+    convert_parser.add_argument(
+        '--ignore-header', dest='ignore_header',
+        action='store_true', help="Ignore the file size from Hobeta header")
+    convert_parser.set_defaults(func=convert_file)
+
+    return parser
+
+
+def run(argv=None):
+    """ Run the tool given in the arguments, returns the parsed arguments """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] in TOOLS:
+        tool = importlib.import_module(TOOLS[argv[0]])
+        return default_main(tool.create_parser(), argv[1:])
+    return default_main(create_parser(), argv)
+
+
+def main():
+    """Entry point of the console script, returns None so the exit status
+    is 0 on success"""
+    run()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,8 +8,26 @@
 #
 """ Common functions """
 
+import io
+import os
+import re
 import sys
+import argparse
 import logging
+import threading
+from contextlib import contextmanager
+
+from zxtools import CHUNK_SIZE
+
+CHUNK_SIZE_ENV = 'ZXTOOLS_CHUNK_SIZE'
+CHUNK_SIZE_AUTO = 'auto'
+MAX_AUTO_CHUNK_SIZE = 1024 * 1024  # 1 MByte
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 * 1024, 'G': 1024 * 1024 * 1024}
+MAX_MEMORY_ENV = 'ZXTOOLS_MAX_MEMORY'
+# Part of the memory budget a single buffer may take
+BUFFER_SHARE = 16
+# Zeus editor lines are much shorter, longer lines mean broken file
+MAX_LINE_SIZE = 64 * 1024
 
 
 def safe_parse_args(parser, args):
@@ -25,13 +43,194 @@ def safe_parse_args(parser, args):
     return options
 
 
-def default_main(parser):
+def default_main(parser, argv=None):
     """ Default entry point implementation """
-    args = safe_parse_args(parser, sys.argv[1:])
+    args = safe_parse_args(parser, sys.argv[1:] if argv is None else argv)
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
 
+    max_memory = getattr(args, 'max_memory', None)
+    if max_memory is not None:
+        set_max_memory(max_memory)
+
     if hasattr(args, 'func'):
         args.func(args)
 
     return args
+
+
+def is_path(source):
+    """ Check if the source is a file system path """
+    return isinstance(source, str) or hasattr(source, '__fspath__')
+
+
+def common_folder(paths):
+    """ The deepest folder containing all the paths """
+    folders = [os.path.dirname(os.path.abspath(path)).split(os.sep)
+               for path in paths]
+    return os.sep.join(os.path.commonprefix(folders)) or os.sep
+
+
+@contextmanager
+def open_source(source):
+    """ Open the source given as a bytes-like object, a path or a binary
+    file object. File objects are owned by the caller and are not closed """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif is_path(source):
+        with open(source, 'rb') as src_file:
+            yield src_file
+    else:
+        yield source
+
+
+@contextmanager
+def open_target(target, mode='wb'):
+    """ Open the target given as a path or a file object. File objects are
+    owned by the caller and are not closed """
+    if is_path(target):
+        with open(target, mode) as dst_file:
+            yield dst_file
+    else:
+        yield target
+
+
+def parse_size(text):
+    """ Parse size like 4096, 64K or 1M """
+    match = re.match(r'^\s*(\d+)\s*([KMG]?)B?\s*$', str(text), re.I)
+    if not match or not int(match.group(1)):
+        raise ValueError("Invalid size: %s" % text)
+    return int(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
+
+
+def size_arg(text):
+    """ Validate size command line argument """
+    try:
+        return parse_size(text)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+
+def chunk_size_arg(text):
+    """ Validate --chunk-size command line argument """
+    if text.lower() == CHUNK_SIZE_AUTO:
+        return CHUNK_SIZE_AUTO
+    try:
+        return parse_size(text)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+
+
+def auto_chunk_size(src_file):
+    """ Choose the chunk size by the size of the rest of the file and
+    the preferred block size of its file system """
+    try:
+        stat = os.fstat(src_file.fileno())
+        remaining = stat.st_size - src_file.tell()
+    except (AttributeError, OSError, ValueError):
+        return CHUNK_SIZE
+    block_size = getattr(stat, 'st_blksize', 0) or 4096
+    size = min(max(remaining, 1), MAX_AUTO_CHUNK_SIZE)
+    return (size + block_size - 1) // block_size * block_size
+
+
+def get_chunk_size(chunk_size=None, src_file=None):
+    """ Get the chunk size to read the file. The explicit chunk_size goes
+    first, then ZXTOOLS_CHUNK_SIZE environment variable, then CHUNK_SIZE.
+    Each of them can be 'auto' to choose the size for the specific file.
+    The size is limited by the memory budget, see get_buffer_limit """
+    if chunk_size is None:
+        chunk_size = os.environ.get(CHUNK_SIZE_ENV)
+    if chunk_size is None:
+        size = CHUNK_SIZE
+    elif str(chunk_size).lower() == CHUNK_SIZE_AUTO:
+        size = auto_chunk_size(src_file)
+    else:
+        size = parse_size(chunk_size)
+    limit = get_buffer_limit()
+    return size if limit is None else min(size, limit)
+
+
+def get_max_memory(max_memory=None):
+    """ Memory budget in bytes: the explicit value or ZXTOOLS_MAX_MEMORY
+    environment variable, None if the memory is not limited """
+    if max_memory is None:
+        max_memory = os.environ.get(MAX_MEMORY_ENV)
+    return None if max_memory is None else parse_size(max_memory)
+
+
+def get_buffer_limit(max_memory=None):
+    """ Maximum size of a single buffer, None if the memory is not limited """
+    max_memory = get_max_memory(max_memory)
+    return None if max_memory is None else max(max_memory // BUFFER_SHARE, 1)
+
+
+def get_max_line_size(max_memory=None):
+    """ Maximum size of a line of Zeus Z80 assembler file """
+    limit = get_buffer_limit(max_memory)
+    return MAX_LINE_SIZE if limit is None else min(MAX_LINE_SIZE, limit)
+
+
+def set_max_memory(max_memory):
+    """ Apply the memory budget to this process and to the processes it
+    starts. The buffers are sized by the budget. Where it's supported
+    RLIMIT_DATA is lowered as a best-effort cap: it limits the address space
+    of the data segment, not the resident memory, so the allocation beyond
+    it raises MemoryError but the resident size may stay lower """
+    logger = logging.getLogger('set_max_memory')
+
+    max_memory = parse_size(max_memory)
+    os.environ[MAX_MEMORY_ENV] = str(max_memory)
+    try:
+        import resource
+        _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        if hard == resource.RLIM_INFINITY or max_memory < hard:
+            resource.setrlimit(resource.RLIMIT_DATA, (max_memory, hard))
+    except (ImportError, AttributeError, ValueError, OSError) as error:
+        logger.debug("Data segment is not limited: %s", error)
+    return max_memory
+
+
+def read_limited(src_file, limit=None):
+    """ Read the whole file checking that it fits the buffer limit, see
+    get_buffer_limit. Raises ValueError if the file is larger """
+    if limit is None:
+        limit = get_buffer_limit()
+    if limit is None:
+        return src_file.read()
+    data = src_file.read(limit + 1)
+    if len(data) > limit:
+        raise ValueError("%s is larger than %d bytes allowed by the memory "
+                         "budget" % (getattr(src_file, 'name', "Input file"),
+                                     limit))
+    return data
+
+
+_THREAD_DATA = threading.local()
+
+
+def thread_buffer(size):
+    """ Buffer of the specified size reused by the current thread """
+    buffer = getattr(_THREAD_DATA, 'buffer', None)
+    if buffer is None or len(buffer) < size:
+        buffer = _THREAD_DATA.buffer = memoryview(bytearray(size))
+    return buffer[0:size]
+
+
+def add_chunk_size_argument(parser):
+    """ Add --chunk-size option to the command line parser """
+    parser.add_argument(
+        '--chunk-size', dest='chunk_size', type=chunk_size_arg,
+        help="Size of the read buffer, e.g. 64K or 1M, or 'auto' to choose "
+        "it by the file size (default is %s or %dK)" %
+        (CHUNK_SIZE_ENV, CHUNK_SIZE // 1024))
+
+
+def add_max_memory_argument(parser):
+    """ Add --max-memory option to the command line parser """
+    parser.add_argument(
+        '--max-memory', dest='max_memory', type=size_arg,
+        help="Memory budget, e.g. 256M, the buffers are sized by it, "
+        "the larger inputs are rejected and the data address space is capped "
+        "where supported (default is %s or not limited)" %
+        MAX_MEMORY_ENV)
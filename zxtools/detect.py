@@ -0,0 +1,176 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" File format auto-detection """
+
+import os
+import struct
+
+from zxtools import hobeta
+from zxtools import trdos
+from zxtools.zeus2txt import ASM_FIRST_TOKEN, ASM_META
+
+FORMAT_HOBETA = 'hobeta'
+FORMAT_TRD = 'trd'
+FORMAT_SCL = 'scl'
+FORMAT_TAP = 'tap'
+FORMAT_ZEUS = 'zeus'
+FORMAT_UNKNOWN = 'unknown'
+
+# Enough to see the TR-DOS disk info record in the sector 8
+PEEK_SIZE = 4096
+
+HOBETA_HEADER_SIZE = struct.calcsize(hobeta.HEADER_FMT)
+ZEUS_LAST_TOKEN = ASM_FIRST_TOKEN + len(ASM_META) - 1
+
+
+def is_hobeta(data, size):
+    """ Check that data starts with a Hobeta header with valid checksum """
+    if size < HOBETA_HEADER_SIZE or len(data) < HOBETA_HEADER_SIZE:
+        return False
+    check_sum = struct.unpack_from('<H', data, HOBETA_HEADER_SIZE-2)[0]
+    return hobeta.calc_checksum(data[0:HOBETA_HEADER_SIZE-2]) == check_sum
+
+
+def is_scl(data, size):
+    """ Check SCL signature """
+    sig_len = len(trdos.SCL_SIGNATURE)
+    return size > sig_len and data[0:sig_len] == trdos.SCL_SIGNATURE
+
+
+def is_trd(data, size):
+    """ Check TR-DOS disk info in the sector 8 """
+    info_end = trdos.DISK_INFO_OFFSET + struct.calcsize(trdos.DISK_INFO_FMT)
+    if size % trdos.SECTOR_SIZE or len(data) < info_end:
+        return False
+    info = trdos.DiskInfo._make(struct.unpack_from(
+        trdos.DISK_INFO_FMT, data, trdos.DISK_INFO_OFFSET))
+    return info.trdos_id == trdos.TRDOS_ID and \
+        info.disk_type in trdos.DISK_TYPES
+
+
+def is_tap(data, size):
+    """ Check that data starts with a valid TAP block """
+    if len(data) < 4:
+        return False
+    block_len = struct.unpack_from('<H', data)[0]
+    if block_len < 2 or block_len + 2 > size:
+        return False
+    if data[2] not in (0x00, 0xFF):  # Header or data block flag
+        return False
+    block = data[2:block_len+2]
+    if len(block) < block_len:  # The block does not fit the peek buffer
+        return block_len == 19 and data[2] == 0x00
+    check_sum = 0
+    for value in block:
+        check_sum ^= value
+    return check_sum == 0
+
+
+def is_zeus(data, size):
+    """ Check that data looks like a stream of Zeus lines """
+    if size < 3:
+        return False
+    pos = 0
+    lines = 0
+    prev_strnum = -1
+    while pos + 2 <= len(data):
+        strnum = data[pos] + data[pos+1]*256
+        if strnum == 0xFFFF:  # End of file
+            return lines > 0
+        if strnum < prev_strnum:
+            return False
+        prev_strnum = strnum
+        end = data.find(b'\x00', pos+2)
+        if end < 0:
+            break
+        tab = False
+        for value in data[pos+2:end]:
+            if tab:
+                tab = False
+            elif value == 0x0A:
+                tab = True
+            elif value < 0x20 or value > ZEUS_LAST_TOKEN:
+                return False
+        lines += 1
+        pos = end + 1
+    return lines > 0
+
+
+DETECTORS = (
+    (FORMAT_SCL, is_scl),
+    (FORMAT_HOBETA, is_hobeta),
+    (FORMAT_TRD, is_trd),
+    (FORMAT_TAP, is_tap),
+    (FORMAT_ZEUS, is_zeus),
+)
+
+
+def detect_format(data, size=None):
+    """ Detect file format by the first bytes and the file size """
+    if size is None:
+        size = len(data)
+    for name, detector in DETECTORS:
+        if detector(data, size):
+            return name
+    return FORMAT_UNKNOWN
+
+
+def sniff(src_file):
+    """ Detect format of the opened binary file and rewind it """
+    pos = src_file.tell()
+    data = src_file.read(PEEK_SIZE)
+    src_file.seek(0, os.SEEK_END)
+    size = src_file.tell() - pos
+    src_file.seek(pos)
+    return detect_format(data, size)
+
+
+class PeekedFile(object):
+    """ Binary file object returning the data already read from the file
+    and then the rest of the file """
+
+    def __init__(self, data, src_file):
+        self.data = data
+        self.pos = 0
+        self.src_file = src_file
+
+    def read(self, size=-1):
+        """ Read up to size bytes, everything if size is negative """
+        if self.pos < len(self.data):
+            end = len(self.data) if size is None or size < 0 \
+                else self.pos + size
+            data = self.data[self.pos:end]
+            self.pos += len(data)
+            return data
+        return self.src_file.read(size)
+
+    def readinto(self, buffer):
+        """ Read into the buffer, returns the number of bytes read """
+        if self.pos < len(self.data):
+            data = self.read(len(buffer))
+            buffer[0:len(data)] = data
+            return len(data)
+        readinto = getattr(self.src_file, 'readinto', None)
+        if readinto is not None:
+            return readinto(buffer)
+        data = self.src_file.read(len(buffer))
+        buffer[0:len(data)] = data
+        return len(data)
+
+
+def peek(src_file, size=None):
+    """ Detect format of the file that may be not seekable, e.g. a stream
+    of an archive member. Size is the file size if known. Returns the format
+    and the file object to read the file from the beginning """
+    data = src_file.read(PEEK_SIZE)
+    if size is None and len(data) < PEEK_SIZE:
+        size = len(data)
+    file_format = detect_format(data, len(data) if size is None else size)
+    return file_format, PeekedFile(data, src_file)
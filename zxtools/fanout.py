@@ -0,0 +1,276 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Write several artifacts from a single read of the input file """
+
+import argparse
+import hashlib
+import json
+import logging
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+
+from zxtools import detect
+from zxtools import hobeta
+from zxtools import zeus2txt
+from zxtools.common import default_main, open_source, open_target
+from zxtools.common import add_chunk_size_argument, get_chunk_size
+from zxtools.common import add_max_memory_argument
+
+FanOutResult = namedtuple('FanOutResult', 'header check_sum size results')
+
+
+class Sink(object):
+    """ Consumer of the input: gets the Hobeta header (None if the input
+    is not a Hobeta file) and then the payload chunk by chunk. Chunks are
+    only valid during the write call. Output is a path or a file object """
+    mode = 'w'
+
+    def __init__(self, output):
+        self.output = output
+        self.dst_file = None
+
+    def start(self, header, check_sum):
+        """ Called before the payload """
+
+    def write(self, chunk):
+        """ Called for the each chunk of the payload """
+
+    def finish(self):
+        """ Called after the payload, returns the result of the sink """
+        return None
+
+
+class HeaderSink(Sink):
+    """ Hobeta header as JSON """
+
+    def __init__(self, output):
+        super(HeaderSink, self).__init__(output)
+        self.info = None
+
+    def start(self, header, check_sum):
+        if header is None:
+            self.info = {'hobeta': False}
+        else:
+            self.info = dict(header._asdict(), hobeta=True,
+                             filename=header.filename.decode('ascii',
+                                                             'replace'),
+                             filetype=chr(header.filetype),
+                             actual_check_sum=check_sum)
+
+    def finish(self):
+        json.dump(self.info, self.dst_file, indent=1, sort_keys=True)
+        print(file=self.dst_file)
+        return self.info
+
+
+class PayloadSink(Sink):
+    """ Payload without Hobeta header """
+    mode = 'wb'
+
+    def __init__(self, output):
+        super(PayloadSink, self).__init__(output)
+        self.copied = 0
+
+    def write(self, chunk):
+        self.dst_file.write(chunk)
+        self.copied += len(chunk)
+
+    def finish(self):
+        return self.copied
+
+
+class ListingSink(Sink):
+    """ Payload converted from Zeus Z80 assembler to the plain text """
+
+    def __init__(self, output, layout=None, symbols=None):
+        super(ListingSink, self).__init__(output)
+        self.render = zeus2txt.Formatter(layout).render
+        self.symbols = symbols
+        self.splitter = zeus2txt.LineSplitter()
+        self.lines = 0
+
+    def write(self, chunk):
+        for strnum, body in self.splitter.feed(chunk):
+            self.dst_file.write(
+                self.render(zeus2txt.DecodedLine(strnum, body)) + "\n")
+            if self.symbols is not None:
+                self.symbols.add_line(strnum, body)
+            self.lines += 1
+
+    def finish(self):
+        if self.splitter.complete:
+            self.dst_file.write("\n")
+        return self.lines
+
+
+class HashSink(Sink):
+    """ Hash of the payload in the sha1sum format """
+
+    def __init__(self, output, algorithm='sha1', name='-'):
+        super(HashSink, self).__init__(output)
+        self.digest = hashlib.new(algorithm)
+        self.name = name
+
+    def write(self, chunk):
+        self.digest.update(chunk)
+
+    def finish(self):
+        hexdigest = self.digest.hexdigest()
+        print("%s  %s" % (hexdigest, self.name), file=self.dst_file)
+        return hexdigest
+
+
+class StatsSink(Sink):
+    """ Payload size, number of reads and time spent as JSON """
+
+    def __init__(self, output):
+        super(StatsSink, self).__init__(output)
+        self.stats = {'size': 0, 'reads': 0}
+        self.started = None
+
+    def start(self, header, check_sum):
+        self.started = time.perf_counter()
+        self.stats['format'] = detect.FORMAT_HOBETA if header is not None \
+            else detect.FORMAT_UNKNOWN
+        self.stats['check_sum_ok'] = header is None or \
+            header.check_sum == check_sum
+
+    def write(self, chunk):
+        self.stats['size'] += len(chunk)
+        self.stats['reads'] += 1
+
+    def finish(self):
+        self.stats['seconds'] = time.perf_counter() - self.started
+        json.dump(self.stats, self.dst_file, indent=1, sort_keys=True)
+        print(file=self.dst_file)
+        return self.stats
+
+
+def fan_out(source, sinks, ignore_header=False, chunk_size=None):
+    """ Read the source once and feed all the sinks with it. The source is
+    bytes, a path or a binary file, it doesn't need to be seekable. If it
+    starts with a valid Hobeta header, the payload is limited by its length
+    unless ignore_header is set. See common.get_chunk_size for chunk_size """
+    logger = logging.getLogger('fan_out')
+
+    with open_source(source) as src_file, ExitStack() as stack:
+        for sink in sinks:
+            sink.dst_file = stack.enter_context(
+                open_target(sink.output, sink.mode))
+        buffer = memoryview(bytearray(get_chunk_size(chunk_size, src_file)))
+        head = src_file.read(detect.HOBETA_HEADER_SIZE)
+        header = check_sum = None
+        length = None
+        if detect.is_hobeta(head, len(head)):
+            header, check_sum = hobeta.parse_header(head)
+            logger.debug(header)
+            length = None if ignore_header else header.length
+            head = b''
+        for sink in sinks:
+            sink.start(header, check_sum)
+
+        size = 0
+        readinto = getattr(src_file, 'readinto', None)
+        while length is None or size < length:
+            if head:  # Not a Hobeta file, the bytes read are the payload
+                chunk, head = memoryview(head), b''
+            else:
+                want = len(buffer) if length is None \
+                    else min(len(buffer), length-size)
+                if readinto is None:
+                    chunk = src_file.read(want)
+                else:
+                    chunk = buffer[0:readinto(buffer[0:want]) or 0]
+            if not chunk:
+                break
+            for sink in sinks:
+                sink.write(chunk)
+            size += len(chunk)
+        results = [sink.finish() for sink in sinks]
+    return FanOutResult(header, check_sum, size, results)
+
+
+def run(parsed_args):
+    """ Produce the requested outputs from the input file """
+    sinks = []
+    if parsed_args.header is not None:
+        sinks.append(HeaderSink(parsed_args.header))
+    if parsed_args.payload is not None:
+        sinks.append(PayloadSink(parsed_args.payload))
+    if parsed_args.listing is not None:
+        layout = zeus2txt.LAYOUTS[parsed_args.layout]
+        if parsed_args.include_code:
+            layout = layout._replace(hex_dump=True)
+        sinks.append(ListingSink(parsed_args.listing, layout))
+    if parsed_args.hash is not None:
+        sinks.append(HashSink(parsed_args.hash, parsed_args.hash_algorithm,
+                              parsed_args.input_file))
+    if parsed_args.stats is not None:
+        sinks.append(StatsSink(parsed_args.stats))
+    if not sinks:
+        print("ERROR: no outputs specified.")
+        return None
+    result = fan_out(parsed_args.input_file, sinks, parsed_args.ignore_header,
+                     getattr(parsed_args, 'chunk_size', None))
+    if result.header is not None and \
+            result.header.check_sum != result.check_sum:
+        print("WARNING: wrong checksum in the header.")
+    return result
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Write several artifacts from a single read of the file")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_chunk_size_argument(parser)
+    add_max_memory_argument(parser)
+    parser.add_argument(
+        'input_file', metavar='input-file',
+        help="Input file, Hobeta header is parsed if present")
+    parser.add_argument(
+        '--header', help="Path to the Hobeta header in JSON")
+    parser.add_argument(
+        '--payload', help="Path to the data without Hobeta header")
+    parser.add_argument(
+        '--listing', help="Path to the data converted from Zeus Z80 "
+        "assembler to the plain text")
+    parser.add_argument(
+        '--layout', choices=sorted(zeus2txt.LAYOUTS), default='zeus',
+        help="Layout of the listing")
+    parser.add_argument(
+        '--include-code', dest='include_code',
+        action='store_true', help="Include original code in the listing")
+    parser.add_argument(
+        '--hash', help="Path to the hash of the data in the sha1sum format")
+    parser.add_argument(
+        '--hash-algorithm', dest='hash_algorithm', default='sha1',
+        choices=sorted(hashlib.algorithms_guaranteed),
+        help="Hash algorithm")
+    parser.add_argument(
+        '--stats', help="Path to the statistics in JSON")
+    parser.add_argument(
+        '--ignore-header', dest='ignore_header',
+        action='store_true', help="Ignore the file size from Hobeta header")
+    parser.set_defaults(func=run)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Compare converters with the reference ones on a corpus of files """
+
+import os
+import sys
+import argparse
+import contextlib
+import importlib
+import json
+import logging
+import random
+import shutil
+import struct
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+
+from zxtools import detect
+from zxtools import hobeta
+from zxtools import zeus2txt
+from zxtools.common import default_main
+
+DEFAULT_CANDIDATE = 'zxtools.golden:library_convert'
+DEFAULT_THRESHOLD = 0.1
+
+FileResult = namedtuple('FileResult', 'path file_format size identical '
+                        'diff_offset reference_time candidate_time')
+
+
+def reference_convert(input_path, output_path):
+    """ Convert the file with the command line functions of hobeta and
+    zeus2txt. Returns the format or None if the format is not supported """
+    with open(input_path, 'rb') as src_file:
+        file_format = detect.sniff(src_file)
+    args = argparse.Namespace(include_code=False, ignore_header=False)
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        if file_format == detect.FORMAT_HOBETA:
+            args.hobeta_file = open(input_path, 'rb')
+            args.output_file = open(output_path, 'wb')
+            hobeta.strip_header(args)
+        elif file_format == detect.FORMAT_ZEUS:
+            args.zeus_file = open(input_path, 'rb')
+            args.output_file = open(output_path, 'w', encoding='utf-8')
+            zeus2txt.convert_file(args)
+        else:
+            return None
+    return file_format
+
+
+def library_convert(input_path, output_path):
+    """ Convert the file with the library functions """
+    with open(input_path, 'rb') as src_file:
+        file_format = detect.sniff(src_file)
+        if file_format == detect.FORMAT_HOBETA:
+            hobeta.strip(src_file, output_path)
+        elif file_format == detect.FORMAT_ZEUS:
+            zeus2txt.convert(src_file, output_path)
+
+
+def load_candidate(name):
+    """ Import the function given as module:function """
+    module_name, _, func_name = name.partition(':')
+    if not func_name:
+        raise ValueError("Candidate must be given as module:function, got %s"
+                         % name)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def first_difference(left, right):
+    """ Offset of the first different byte or None if the data is equal """
+    if left == right:
+        return None
+    for offset, (left_byte, right_byte) in enumerate(zip(left, right)):
+        if left_byte != right_byte:
+            return offset
+    return min(len(left), len(right))
+
+
+def check_file(path, candidate, temp_dir):
+    """ Convert the file with the reference and the candidate functions
+    and compare the results. Returns FileResult or None if the format is
+    not supported """
+    convert = load_candidate(candidate)
+    outputs = []
+    for suffix in ('.reference', '.candidate'):
+        # Unique names, the files with the same name may be checked at once
+        handle, output = tempfile.mkstemp(dir=temp_dir, suffix=suffix)
+        os.close(handle)
+        outputs.append(output)
+    try:
+        start = time.perf_counter()
+        file_format = reference_convert(path, outputs[0])
+        reference_time = time.perf_counter() - start
+        if file_format is None:
+            return None
+        start = time.perf_counter()
+        convert(path, outputs[1])
+        candidate_time = time.perf_counter() - start
+        data = []
+        for output in outputs:
+            with open(output, 'rb') as output_file:
+                data.append(output_file.read())
+    finally:
+        for output in outputs:
+            if os.path.exists(output):
+                os.remove(output)
+    diff_offset = first_difference(*data)
+    return FileResult(path, file_format, os.path.getsize(path),
+                      diff_offset is None, diff_offset,
+                      reference_time, candidate_time)
+
+
+def corpus_files(folder):
+    """ All the files in the folder and its subfolders """
+    paths = []
+    for root, _, names in os.walk(folder):
+        paths.extend(os.path.join(root, name) for name in sorted(names))
+    return sorted(paths)
+
+
+def compare(paths, candidate=DEFAULT_CANDIDATE, jobs=None):
+    """ Check the files in parallel, returns the list of FileResult for
+    the files of the supported formats """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with ProcessPoolExecutor(jobs) as executor:
+            results = executor.map(check_file, paths, [candidate]*len(paths),
+                                   [temp_dir]*len(paths))
+            return [result for result in results if result is not None]
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def throughput(results):
+    """ Bytes per second of the reference and the candidate functions """
+    size = sum(result.size for result in results)
+    return (size / (sum(result.reference_time for result in results) or 1e-9),
+            size / (sum(result.candidate_time for result in results) or 1e-9))
+
+
+def check_baseline(baseline, candidate_throughput, threshold):
+    """ Check that the throughput is not lower than the baseline by more
+    than threshold (a fraction). Returns the ratio to the baseline """
+    ratio = candidate_throughput / baseline['throughput']
+    if ratio < 1 - threshold:
+        raise ValueError("Throughput %.1f KB/s is %.0f%% lower than the "
+                         "baseline %.1f KB/s" % (
+                             candidate_throughput / 1024, (1 - ratio) * 100,
+                             baseline['throughput'] / 1024))
+    return ratio
+
+
+def make_zeus_line(rng):
+    """ Random tokenized line body """
+    body = bytearray()
+    if rng.random() < 0.3:
+        body += bytes(rng.choice(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+                      for _ in range(rng.randint(2, 6)))
+    if rng.random() < 0.9:
+        body += bytes((0x0A, max(1, 6 - len(body))))
+        body.append(zeus2txt.ASM_FIRST_TOKEN +
+                    rng.randrange(len(zeus2txt.ASM_META)))
+        for index in range(rng.randint(0, 2)):
+            if index:
+                body += b','
+            if rng.random() < 0.5:
+                body += str(rng.randrange(65536)).encode('ascii')
+            else:
+                body.append(zeus2txt.ASM_FIRST_TOKEN +
+                            rng.randrange(len(zeus2txt.ASM_META)))
+    if not body or rng.random() < 0.2:
+        body += b' ;' + bytes(rng.randrange(0x20, 0x80)
+                              for _ in range(rng.randint(0, 30)))
+    return bytes(body)
+
+
+def make_zeus_file(rng, lines, max_size=0xFF00):
+    """ Random Zeus Z80 assembler file """
+    chunks = []
+    size = 2
+    for index in range(min(lines, 0xFFFE // 10)):
+        line = struct.pack('<H', (index+1) * 10) + make_zeus_line(rng) + \
+            b'\x00'
+        if size + len(line) > max_size:
+            break
+        chunks.append(line)
+        size += len(line)
+    chunks.append(b'\xFF\xFF')
+    return b''.join(chunks)
+
+
+def make_hobeta_file(name, data):
+    """ Hobeta file with the data """
+    header = struct.pack('<8sBHHBB', name.encode('ascii')[:8].ljust(8),
+                         ord('C'), 0x8000, len(data), 0,
+                         (len(data) + 255) // 256)
+    return header + struct.pack('<H', hobeta.calc_checksum(header)) + data
+
+
+def generate_corpus(folder, count, lines=500, seed=0):
+    """ Create count synthetic files: Zeus files, half of them in Hobeta
+    files. The same seed gives the same files. Returns the paths """
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    paths = []
+    for index in range(count):
+        rng = random.Random(seed * 1000003 + index)
+        data = make_zeus_file(rng, rng.randint(1, lines))
+        if index % 2:
+            path = os.path.join(folder, 'zeus%04d.$C' % index)
+            data = make_hobeta_file('zeus%04d' % index, data)
+        else:
+            path = os.path.join(folder, 'zeus%04d.zeus' % index)
+        with open(path, 'wb') as corpus_file:
+            corpus_file.write(data)
+        paths.append(path)
+    return paths
+
+
+def run_compare(parsed_args):
+    """ Compare the candidate with the reference on the corpus """
+    logger = logging.getLogger('run_compare')
+
+    results = compare(corpus_files(parsed_args.corpus), parsed_args.candidate,
+                      parsed_args.jobs)
+    failed = [result for result in results if not result.identical]
+    for result in failed:
+        print("DIFF: %s, the first difference at offset %d" %
+              (result.path, result.diff_offset))
+    reference_speed, candidate_speed = throughput(results)
+    print("Checked %d file(s), %d differ. Reference %.1f KB/s, candidate "
+          "%.1f KB/s." % (len(results), len(failed), reference_speed / 1024,
+                          candidate_speed / 1024))
+    try:
+        if parsed_args.baseline and parsed_args.save_baseline:
+            with open(parsed_args.baseline, 'w',
+                      encoding='utf-8') as baseline_file:
+                json.dump({'candidate': parsed_args.candidate,
+                           'throughput': candidate_speed}, baseline_file)
+        elif parsed_args.baseline and os.path.exists(parsed_args.baseline):
+            with open(parsed_args.baseline, 'r',
+                      encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+            ratio = check_baseline(baseline, candidate_speed,
+                                   parsed_args.threshold)
+            logger.debug(ratio)
+            print("Throughput is %.2f of the baseline." % ratio)
+    except ValueError as error:
+        print("ERROR: %s" % error)
+        sys.exit(1)
+    if failed:
+        sys.exit(1)
+    return results
+
+
+def run_generate(parsed_args):
+    """ Create the synthetic corpus """
+    paths = generate_corpus(parsed_args.corpus, parsed_args.files,
+                            parsed_args.lines, parsed_args.seed)
+    print("Created %d file(s) in %s." % (len(paths), parsed_args.corpus))
+    return paths
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Golden corpus tests of the converters")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    compare_parser = subparsers.add_parser(
+        'compare', help="Compare the outputs of the candidate and "
+        "the reference converters byte for byte")
+    compare_parser.add_argument(
+        'corpus', help="Folder with Hobeta and Zeus Z80 assembler files")
+    compare_parser.add_argument(
+        '--candidate', default=DEFAULT_CANDIDATE,
+        help="Function converting input path to output path given as "
+        "module:function (default: %s)" % DEFAULT_CANDIDATE)
+    compare_parser.add_argument(
+        '-j', '--jobs', type=int, default=cpu_count(),
+        help="Number of processes")
+    compare_parser.add_argument(
+        '--baseline', help="Path to the JSON file with the baseline "
+        "throughput of the candidate")
+    compare_parser.add_argument(
+        '--save-baseline', dest='save_baseline', action='store_true',
+        help="Save the throughput as the baseline instead of checking it")
+    compare_parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help="Allowed throughput drop, fraction of the baseline "
+        "(default: %s)" % DEFAULT_THRESHOLD)
+    compare_parser.set_defaults(func=run_compare)
+
+    generate_parser = subparsers.add_parser(
+        'generate', help="Create synthetic corpus")
+    generate_parser.add_argument(
+        'corpus', help="Folder for the files")
+    generate_parser.add_argument(
+        '--files', type=int, default=100, help="Number of files")
+    generate_parser.add_argument(
+        '--lines', type=int, default=500,
+        help="Maximum number of lines in a file")
+    generate_parser.add_argument(
+        '--seed', type=int, default=0, help="Random seed")
+    generate_parser.set_defaults(func=run_generate)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
@@ -10,18 +10,29 @@
 """ Hobeta file utils """
 
 import os
+import stat
 import logging
 import struct
 from collections import namedtuple
 import argparse
 
-from zxtools import CHUNK_SIZE
-from zxtools.common import default_main
+from zxtools.charset import CHARSET, ASCII_CHARSET, translation
+from zxtools.common import default_main, open_source, open_target
+from zxtools.common import add_chunk_size_argument, get_chunk_size
+from zxtools.common import add_max_memory_argument, thread_buffer
 
 HEADER_FMT = '<8sBHHBBH'
 Header = namedtuple(
     'Header',
     'filename filetype start length first_sector occupied_sectors check_sum')
+StripResult = namedtuple('StripResult', 'header check_sum copied')
+
+DUMP_WIDTH = 16
+DUMP_HEX = tuple("%02X " % value for value in range(256))
+DUMP_CHARSETS = {
+    'zx': translation(CHARSET),
+    'ascii': translation(ASCII_CHARSET),
+}
 
 
 def hobeta_help(*parsed_args):
@@ -53,72 +64,231 @@ def calc_checksum(data):
     return check_sum
 
 
+def parse_header(data):
+    """ Parse Hobeta header from bytes.
+    Returns the header and the actual check sum """
+    header_len = struct.calcsize(HEADER_FMT)
+    actual_check_sum = calc_checksum(data[0:header_len-2])
+    header = Header._make(struct.unpack_from(HEADER_FMT, data))
+    return header, actual_check_sum
+
+
 def parse_info(hobeta_file):
     """ Parse Hobeta header """
     logger = logging.getLogger('parse_info')
 
     header_len = struct.calcsize(HEADER_FMT)
     logger.debug(header_len)
-    data = hobeta_file.read(header_len)
-
-    actual_check_sum = calc_checksum(data[0:header_len-2])
-    header = Header._make(struct.unpack_from(HEADER_FMT, data))
+    header, actual_check_sum = parse_header(hobeta_file.read(header_len))
     logger.debug(header)
 
     return header, actual_check_sum
 
 
+def read_info(source):
+    """ Read Hobeta header from bytes, a path or a binary file.
+    Returns the header and the actual check sum """
+    with open_source(source) as hobeta_file:
+        return parse_info(hobeta_file)
+
+
+def format_info(header, crc):
+    """ Format Hobeta header as a human readable text """
+    return (
+        "File name:\t" + header.filename.decode("ascii") + "\n" +
+        "Extension:\t" + chr(header.filetype) + "\n" +
+        ("Prg LEN:\t" if header.filetype == ord('B') else "Place at:\t") +
+        str(header.start) + "\n" +
+        "File size:\t" + str(header.length) + "\n" +
+        "First sector:\t" + str(header.first_sector) + "\n" +
+        "Occupied sectors:\t" + str(header.occupied_sectors) + "\n" +
+        "Check sum:\t" + str(header.check_sum) + " " +
+        ("(OK)" if crc == header.check_sum
+         else "(WRONG! Should be " + str(crc) + ")")).expandtabs(20)
+
+
 def show_info(parsed_args):
     """ Show info from Hobeta header """
-    header, crc = parse_info(parsed_args.hobeta_file)
-
-    print(
-        ("File name:\t" + header.filename.decode("ascii") + "\n" +
-         "Extension:\t" + chr(header.filetype) + "\n" +
-         ("Prg LEN:\t" if header.filetype == ord('B') else "Place at:\t") +
-         str(header.start) + "\n" +
-         "File size:\t" + str(header.length) + "\n" +
-         "First sector:\t" + str(header.first_sector) + "\n" +
-         "Occupied sectors:\t" + str(header.occupied_sectors) + "\n" +
-         "Check sum:\t" + str(header.check_sum) + " " +
-         ("(OK)" if crc == header.check_sum
-          else "(WRONG! Should be " + str(crc) + ")")).expandtabs(20))
+    print(format_info(*parse_info(parsed_args.hobeta_file)))
+
+
+def _fileno(file_obj):
+    try:
+        return file_obj.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _copy_fd(src_fd, dst_fd, offset, length):
+    """ Copy in the kernel, so the GIL is released for the whole chunk.
+    Returns the number of bytes copied or None if it's not supported for
+    these files """
+    for copy_func in (getattr(os, 'copy_file_range', None),
+                      getattr(os, 'sendfile', None)):
+        if copy_func is None:
+            continue
+        copied = 0
+        try:
+            while copied < length:
+                if copy_func is os.sendfile:
+                    done = os.sendfile(dst_fd, src_fd, offset+copied,
+                                       length-copied)
+                else:
+                    done = copy_func(src_fd, dst_fd, length-copied,
+                                     offset+copied)
+                if not done:
+                    break
+                copied += done
+        except OSError:
+            if copied:
+                raise
+            continue
+        return copied
+    return None
+
+
+def _copy_files(src_file, dst_file, length):
+    """ Copy between two regular files with system calls """
+    src_fd = _fileno(src_file)
+    dst_fd = _fileno(dst_file)
+    if src_fd is None or dst_fd is None or \
+            not stat.S_ISREG(os.fstat(src_fd).st_mode):
+        return None
+    offset = src_file.tell()
+    available = max(0, os.fstat(src_fd).st_size - offset)
+    length = available if length is None else min(length, available)
+    dst_file.flush()
+    copied = _copy_fd(src_fd, dst_fd, offset, length)
+    if copied is not None:
+        src_file.seek(offset + copied)
+        try:
+            dst_file.seek(0, os.SEEK_CUR)  # Sync with the descriptor position
+        except OSError:
+            pass
+    return copied
+
+
+def copy_data(src_file, dst_file, length=None, chunk_size=None):
+    """ Copy length bytes or everything up to the end of the source file.
+    Regular files are copied by os.copy_file_range or os.sendfile, other
+    file objects through the per-thread buffer """
+    copied = _copy_files(src_file, dst_file, length)
+    if copied is not None:
+        return copied
+
+    buffer = thread_buffer(get_chunk_size(chunk_size, src_file))
+    readinto = getattr(src_file, 'readinto', None)
+    copied = 0
+    while length is None or copied < length:
+        chunk_size = len(buffer) if length is None \
+            else min(len(buffer), length-copied)
+        if readinto is None:
+            data = src_file.read(chunk_size)
+        else:
+            data = buffer[0:readinto(buffer[0:chunk_size]) or 0]
+        if not data:
+            break
+        dst_file.write(data)
+        copied += len(data)
+    return copied
+
+
+def strip(source, output, ignore_header=False, chunk_size=None):
+    """ Copy Hobeta file data excluding the header to the output.
+    The source is bytes, a path or a binary file positioned at the header,
+    the output is a path or a binary file. The source doesn't need to be
+    seekable. See common.get_chunk_size for chunk_size """
+    logger = logging.getLogger('strip')
+
+    with open_source(source) as src_file, \
+            open_target(output, 'wb') as dst_file:
+        header, crc = parse_info(src_file)
+        length = None if ignore_header else header.length
+        logger.debug(length)
+        copied = copy_data(src_file, dst_file, length, chunk_size)
+    return StripResult(header, crc, copied)
 
 
 def strip_header(parsed_args):
     """ Copy the source file to the output file excluding Hobeta header """
-    logger = logging.getLogger('strip_header')
-
-    header, crc = parse_info(parsed_args.hobeta_file)
-    if header.check_sum != crc:
+    with parsed_args.hobeta_file as src_file, \
+            parsed_args.output_file as dst_file:
+        result = strip(src_file, dst_file, parsed_args.ignore_header,
+                       getattr(parsed_args, 'chunk_size', None))
+    if result.header.check_sum != result.check_sum:
         print("WARNING: wrong checksum in the header.")
-
-    header_size = struct.calcsize(HEADER_FMT)
-
-    with parsed_args.hobeta_file as src_file:
-        src_file.seek(0, os.SEEK_END)
-        hobeta_file_size = src_file.tell()
-        if parsed_args.ignore_header:
-            bytes_to_copy = hobeta_file_size-header_size
-        else:
-            bytes_to_copy = header.length
-        logger.debug(bytes_to_copy)
-
-        length = bytes_to_copy
-        src_file.seek(header_size)
-        with parsed_args.output_file as dst_file:
-            while length:
-                chunk_size = min(CHUNK_SIZE, length)
-                data = src_file.read(chunk_size)
-                if not data:
-                    break
-                dst_file.write(data)
-                length -= len(data)
     print("Created file %s, %d bytes copied." %
-          (dst_file.name, bytes_to_copy-length))
-    dst_file.close()
-    src_file.close()
-    return bytes_to_copy-length
+          (dst_file.name, result.copied))
+    return result.copied
+
+
+def dump_rows(data, address, width=DUMP_WIDTH, charset='zx', mask=-1):
+    """ Format the data as rows of the address, hex bytes and characters.
+    The whole data is converted to hex and to characters at once, the rows
+    are slices of them. Addresses are masked with mask """
+    data = bytes(data)
+    hex_width = width * 3
+    hex_data = "".join(map(DUMP_HEX.__getitem__, data))
+    text = data.decode('latin-1').translate(DUMP_CHARSETS[charset])
+    return "".join(
+        "%04X  %-*s %s\n" % ((address + pos) & mask, hex_width,
+                              hex_data[pos*3:pos*3+hex_width],
+                              text[pos:pos+width])
+        for pos in range(0, len(data), width))
+
+
+def dump(source, output, start=None, width=DUMP_WIDTH, charset='zx',
+         raw=False, ignore_header=False, chunk_size=None):
+    """ Print hex dump of the Hobeta file data to the output (a path or
+    a text file). The addresses start from the header start parameter unless
+    start is given. If raw is set the source has no header and the addresses
+    are the offsets unless start is given. Addresses wrap at 64K like in
+    the Spectrum memory. The data is read by chunks, so the memory used
+    doesn't depend on the file size. Returns the number of bytes dumped """
+    with open_source(source) as src_file, \
+            open_target(output, 'w') as dst_file:
+        address = 0
+        length = None
+        mask = 0xFFFF if start is not None or not raw else -1
+        if not raw:
+            header, _ = parse_info(src_file)
+            address = header.start
+            length = None if ignore_header else header.length
+        if start is not None:
+            address = start
+        chunk_size = max(width, get_chunk_size(chunk_size, src_file) //
+                         width * width)
+        dumped = 0
+        tail = b''  # Incomplete row left from the previous read
+        while length is None or dumped + len(tail) < length:
+            want = chunk_size if length is None \
+                else min(chunk_size, length - dumped - len(tail))
+            chunk = src_file.read(want)
+            if not chunk:
+                break
+            data = tail + chunk
+            full = len(data) // width * width
+            dst_file.write(dump_rows(data[0:full], address + dumped, width,
+                                     charset, mask))
+            dumped += full
+            tail = data[full:]
+        if tail:
+            dst_file.write(dump_rows(tail, address + dumped, width, charset,
+                                     mask))
+            dumped += len(tail)
+    return dumped
+
+
+def dump_file(parsed_args):
+    """ Print hex dump of the file data """
+    with parsed_args.hobeta_file as src_file:
+        dumped = dump(src_file, parsed_args.output_file, parsed_args.start,
+                      parsed_args.width, parsed_args.charset, parsed_args.raw,
+                      parsed_args.ignore_header,
+                      getattr(parsed_args, 'chunk_size', None))
+    # The output may be the standard output, so it's flushed, not closed
+    parsed_args.output_file.flush()
+    return dumped
 
 
 def create_parser():
@@ -127,6 +297,8 @@ def create_parser():
     parser.add_argument(
         '-v', '--verbose', help="Increase output verbosity",
         action='store_true')
+    add_chunk_size_argument(parser)
+    add_max_memory_argument(parser)
 
     subparsers = parser.add_subparsers(help="Available commands")
     subparsers.required = False
@@ -151,6 +323,33 @@ def create_parser():
         action='store_true', help="Ignore the file size from Hobeta header")
     strip_parser.set_defaults(func=strip_header)
 
+    dump_parser = subparsers.add_parser(
+        'dump', help="Show hex dump of the data at the addresses it's loaded")
+    dump_parser.add_argument(
+        'hobeta_file', metavar='hobeta-file', type=argparse.FileType('rb', 0),
+        help="Input file in Hobeta format (usually FILENAME.$C)")
+    dump_parser.add_argument(
+        'output_file', metavar='output-file', nargs='?', default='-',
+        type=argparse.FileType('w', encoding='utf-8'),
+        help="Path to the output file (default is the standard output)")
+    dump_parser.add_argument(
+        '--raw', action='store_true',
+        help="The file has no Hobeta header, e.g. it is already stripped")
+    dump_parser.add_argument(
+        '--start', type=lambda value: int(value, 0),
+        help="Address of the first byte, e.g. 32768 or 0x8000 (default is "
+        "the start from the header or 0 for raw files)")
+    dump_parser.add_argument(
+        '--width', type=int, default=DUMP_WIDTH, help="Bytes per row")
+    dump_parser.add_argument(
+        '--charset', choices=sorted(DUMP_CHARSETS), default='zx',
+        help="Show ZX Spectrum characters, block graphics and UDGs or ASCII "
+        "only")
+    dump_parser.add_argument(
+        '--ignore-header', dest='ignore_header',
+        action='store_true', help="Ignore the file size from Hobeta header")
+    dump_parser.set_defaults(func=dump_file)
+
     help_parser = subparsers.add_parser(
         'hobeta-help',
         help="Show Hobeta header format description")
@@ -0,0 +1,222 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Render ZX Spectrum screen (SCREEN$) to PNG """
+
+import os
+import argparse
+import logging
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+
+from zxtools import detect
+from zxtools.common import add_max_memory_argument, common_folder
+from zxtools.common import default_main
+
+# ZX Spectrum screen layout
+#
+# The bitmap is 6144 bytes, 32 bytes per pixel line. Pixel lines are
+# interleaved: the address of the line Y is 0 1 0 Y7 Y6 Y2 Y1 Y0 Y5 Y4 Y3 X...
+# The bitmap is followed by 768 bytes of attributes, one per 8x8 cell:
+#
+#  7   6   5   4   3   2   1   0
+# +---+---+---+---+---+---+---+---+
+# | F | B |   PAPER   |    INK    |
+# +---+---+---+---+---+---+---+---+
+#
+# F - flash (swap ink and paper twice a second), B - bright.
+#
+WIDTH = 256
+HEIGHT = 192
+BITMAP_SIZE = WIDTH * HEIGHT // 8
+ATTR_SIZE = WIDTH * HEIGHT // 64
+SCREEN_SIZE = BITMAP_SIZE + ATTR_SIZE
+SCREEN_START = 16384
+
+ROW_OFFSETS = tuple(((y & 0xC0) << 5) | ((y & 0x07) << 8) | ((y & 0x38) << 2)
+                    for y in range(HEIGHT))
+
+# Colour index is BRIGHT*8 + colour, where colour bits are G R B
+NORMAL = 0xD7
+PALETTE = bytes(
+    component
+    for level in (NORMAL, 0xFF)
+    for colour in range(8)
+    for component in (level if colour & 2 else 0,
+                      level if colour & 4 else 0,
+                      level if colour & 1 else 0))
+
+# Attribute of the second flash frame: ink and paper swapped for flashing cells
+FLASH_SWAP = bytes(
+    (attr & 0x40) | ((attr & 0x07) << 3) | ((attr >> 3) & 0x07)
+    if attr & 0x80 else attr & 0x7F
+    for attr in range(256))
+
+_CELLS = []
+
+
+def cells():
+    """ 8 palette indexes of each (attribute << 8 | bitmap byte) """
+    if not _CELLS:
+        bits = [bytes((value >> (7 - pos)) & 1 for pos in range(8))
+                for value in range(256)]
+        for attr in range(256):
+            bright = 8 if attr & 0x40 else 0
+            table = bytes((bright + ((attr >> 3) & 0x07),
+                           bright + (attr & 0x07))) + bytes(254)
+            _CELLS.extend(pattern.translate(table) for pattern in bits)
+    return _CELLS
+
+
+def render(data, flash=False):
+    """ Convert screen data to 192 rows of 256 palette indexes """
+    if len(data) < SCREEN_SIZE:
+        raise ValueError("Screen must be %d bytes long, got %d" %
+                         (SCREEN_SIZE, len(data)))
+    data = bytes(data[0:SCREEN_SIZE])
+    attrs = data[BITMAP_SIZE:]
+    if flash:
+        attrs = attrs.translate(FLASH_SWAP)
+    table = cells().__getitem__
+    unpack = struct.Struct('>32H').unpack
+    keys = bytearray(64)
+    rows = []
+    for y, offset in enumerate(ROW_OFFSETS):
+        attr_offset = (y >> 3) * 32
+        keys[0::2] = attrs[attr_offset:attr_offset+32]
+        keys[1::2] = data[offset:offset+32]
+        rows.append(b''.join(map(table, unpack(keys))))
+    return rows
+
+
+def png_chunk(chunk_type, data):
+    """ Make PNG chunk with its length and CRC """
+    return (struct.pack('>I', len(data)) + chunk_type + data +
+            struct.pack('>I', zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+def encode_png(rows, width=WIDTH, palette=PALETTE):
+    """ Encode rows of palette indexes as 8-bit paletted PNG """
+    raw = b''.join(b'\x00' + row for row in rows)
+    return (b'\x89PNG\r\n\x1a\n' +
+            png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, len(rows),
+                                           8, 3, 0, 0, 0)) +
+            png_chunk(b'PLTE', palette) +
+            png_chunk(b'IDAT', zlib.compress(raw, 6)) +
+            png_chunk(b'IEND', b''))
+
+
+def screen_to_png(data, flash=False):
+    """ Render screen data to PNG """
+    return encode_png(render(data, flash))
+
+
+def read_screen(path):
+    """ Read screen data from the file, skip Hobeta header if any """
+    with open(path, 'rb') as src_file:
+        data = src_file.read(detect.HOBETA_HEADER_SIZE + SCREEN_SIZE)
+    if detect.is_hobeta(data, len(data)):
+        data = data[detect.HOBETA_HEADER_SIZE:]
+    return data
+
+
+def render_file(path, output_path, flash=False):
+    """ Render screen from the file and save it as PNG """
+    png = screen_to_png(read_screen(path), flash)
+    with open(output_path, 'wb') as png_file:
+        png_file.write(png)
+    return output_path
+
+
+def render_one(parsed_args):
+    """ Render a single screen """
+    return render_file(parsed_args.screen_file, parsed_args.output_file,
+                       parsed_args.flash)
+
+
+def render_many(parsed_args):
+    """ Render many screens in parallel. The outputs keep the folders of
+    the inputs relative to their common folder and the names of the inputs
+    with .png appended """
+    logger = logging.getLogger('render_many')
+
+    paths = []
+    for path in parsed_args.files:
+        path = os.path.abspath(path)
+        if path not in paths:
+            paths.append(path)
+    root = common_folder(paths)
+    outputs = [os.path.join(parsed_args.output_dir,
+                            os.path.relpath(path, root) + '.png')
+               for path in paths]
+    for folder in set(os.path.dirname(output) for output in outputs):
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+    flash = [parsed_args.flash] * len(outputs)
+    rendered = 0
+    with ProcessPoolExecutor(parsed_args.jobs) as executor:
+        futures = [executor.submit(render_file, *args)
+                   for args in zip(paths, outputs, flash)]
+        for path, future in zip(paths, futures):
+            try:
+                future.result()
+                rendered += 1
+            except (IOError, ValueError) as error:
+                logger.warning("%s: %s", path, error)
+    print("Rendered %d screen(s)." % rendered)
+    return rendered
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="ZX Spectrum screen renderer")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_max_memory_argument(parser)
+    parser.add_argument(
+        '--flash', action='store_true',
+        help="Render the second frame of flashing cells")
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    render_parser = subparsers.add_parser(
+        'render', help="Render the screen to PNG")
+    render_parser.add_argument(
+        'screen_file', metavar='screen-file',
+        help="Input file with 6912 bytes of screen, Hobeta header is skipped")
+    render_parser.add_argument(
+        'output_file', metavar='output-file', help="Path to the PNG file")
+    render_parser.set_defaults(func=render_one)
+
+    batch_parser = subparsers.add_parser(
+        'batch', help="Render many screens in parallel")
+    batch_parser.add_argument(
+        'output_dir', metavar='output-dir', help="Path to the output folder")
+    batch_parser.add_argument(
+        'files', metavar='file', nargs='+', help="Input files")
+    batch_parser.add_argument(
+        '-j', '--jobs', type=int, default=cpu_count(),
+        help="Number of processes")
+    batch_parser.set_defaults(func=render_many)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
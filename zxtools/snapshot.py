@@ -0,0 +1,310 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Emulator snapshot (.SNA and .Z80) utils """
+
+import os
+import argparse
+import logging
+import struct
+from collections import namedtuple
+
+from zxtools import hobeta
+from zxtools.common import default_main, open_source, open_target
+from zxtools.common import add_max_memory_argument, read_limited
+
+BANK_SIZE = 16 * 1024
+RAM_START = 0x4000
+MEMORY_SIZE = 64 * 1024
+
+# Banks mapped to 0x4000, 0x8000 and 0xC000. The last one is switched by
+# the port 0x7FFD in 128K models
+MAPPED_BANKS = (5, 2, 0)
+
+###############################################################################
+#
+# SNA starts with the following header followed by 48K of RAM:
+#
+SNA_HEADER_FMT = '<BHHHHHHHHHBBHHBB'
+SNAHeader = namedtuple('SNAHeader', 'i hl2 de2 bc2 af2 hl de bc iy ix iff2 '
+                       'r af sp im border')
+SNA_HEADER_SIZE = struct.calcsize(SNA_HEADER_FMT)
+SNA_48K_SIZE = SNA_HEADER_SIZE + 3 * BANK_SIZE
+#
+# 128K snapshot continues with PC, the last value written to the port 0x7FFD,
+# TR-DOS ROM paged flag and the rest of the banks in ascending order
+# excluding 5, 2 and the paged one (so there are 5 or 6 of them)
+#
+SNA_128K_FMT = '<HBB'
+SNA_128K_SIZES = (SNA_48K_SIZE + 4 + 5 * BANK_SIZE,
+                  SNA_48K_SIZE + 4 + 6 * BANK_SIZE)
+
+###############################################################################
+#
+# Z80 version 1 header. PC is 0 for versions 2 and 3, they continue with
+# the additional header of the specified length: 23 for version 2,
+# 54 or 55 for version 3.
+#
+Z80_HEADER_FMT = '<BBHHHHBBBHHHHBBHHBBB'
+Z80Header = namedtuple('Z80Header', 'a f bc hl pc sp i r flags de bc2 de2 '
+                       'hl2 a2 f2 iy ix iff1 iff2 flags2')
+Z80_HEADER_SIZE = struct.calcsize(Z80_HEADER_FMT)
+Z80_EXT_HEADER_FMT = '<HHBB'
+Z80ExtHeader = namedtuple('Z80ExtHeader', 'length pc hw_mode port_7ffd')
+Z80_COMPRESSED = 0x20  # Bit in the flags, version 1 only
+Z80_V1_END_MARKER = b'\x00\xED\xED\x00'
+# Hardware modes of 128K models
+Z80_V2_128K_MODES = (3, 4)
+Z80_V3_128K_MODES = (4, 5, 6, 7, 8, 9, 10, 12, 13)
+# Memory blocks of 48K models
+Z80_48K_PAGES = {8: 5, 4: 2, 5: 0}
+# Block with this length is not compressed
+Z80_UNCOMPRESSED = 0xFFFF
+
+Z80_RLE_MARKER = b'\xED\xED'
+
+# Larger than any valid snapshot: 128K of RAM, the headers and block headers
+MAX_SNAPSHOT_SIZE = 256 * 1024
+
+
+def decompress_z80(data, size=None):
+    """ Decompress Z80 RLE block: ED ED nn bb is nn bytes of bb """
+    result = bytearray()
+    pos = 0
+    while size is None or len(result) < size:
+        found = data.find(Z80_RLE_MARKER, pos)
+        if found < 0 or found + 4 > len(data):
+            result += data[pos:]
+            break
+        result += data[pos:found]
+        result += data[found+3:found+4] * data[found+2]
+        pos = found + 4
+    if size is not None and len(result) != size:
+        raise ValueError("Wrong size of decompressed block: %d instead of %d"
+                         % (len(result), size))
+    return result
+
+
+class Snapshot(object):
+    """ Memory of the snapshot: all RAM banks and the 64K address space
+    as the CPU sees it (ROM is filled with zeros) """
+
+    def __init__(self, banks, paged_bank=0, pc=None, is_128k=False):
+        self.is_128k = is_128k
+        self.pc = pc
+        self.paged_bank = paged_bank
+        self.ram = memoryview(bytearray(8 * BANK_SIZE if is_128k
+                                        else MEMORY_SIZE))
+        if not is_128k:  # RAM is the address space in 48K models
+            self._bank_offsets = {bank: RAM_START + index * BANK_SIZE
+                                  for index, bank in enumerate(MAPPED_BANKS)}
+        else:
+            self._bank_offsets = {bank: bank * BANK_SIZE for bank in range(8)}
+        for bank, data in banks.items():
+            self.bank(bank)[:] = data
+        if is_128k:
+            self.memory = memoryview(bytearray(MEMORY_SIZE))
+            for index, bank in enumerate((5, 2, paged_bank)):
+                start = RAM_START + index * BANK_SIZE
+                self.memory[start:start+BANK_SIZE] = self.bank(bank)
+        else:
+            self.memory = self.ram
+
+    def bank(self, number):
+        """ Memory view of the RAM bank """
+        try:
+            offset = self._bank_offsets[number]
+        except KeyError as error:
+            raise ValueError("No RAM bank %d in 48K snapshot" %
+                             number) from error
+        return self.ram[offset:offset+BANK_SIZE]
+
+    def slice(self, start, length):
+        """ Memory view of the address range, no data is copied """
+        if start < 0 or length < 0 or start + length > MEMORY_SIZE:
+            raise ValueError("Address range %d+%d is out of memory" %
+                             (start, length))
+        return self.memory[start:start+length]
+
+
+def load_sna(data):
+    """ Load .SNA snapshot from bytes """
+    if len(data) != SNA_48K_SIZE and len(data) not in SNA_128K_SIZES:
+        raise ValueError("Wrong size of SNA snapshot: %d" % len(data))
+    data = memoryview(data)
+    header = SNAHeader._make(struct.unpack_from(SNA_HEADER_FMT, data))
+    logging.getLogger('load_sna').debug(header)
+    pos = SNA_HEADER_SIZE
+    if len(data) == SNA_48K_SIZE:
+        banks = {}
+        for bank in MAPPED_BANKS:
+            banks[bank] = data[pos:pos+BANK_SIZE]
+            pos += BANK_SIZE
+        # PC is on the stack of 48K snapshot
+        sp_offset = SNA_HEADER_SIZE + header.sp - RAM_START
+        pc = struct.unpack_from('<H', data, sp_offset)[0] \
+            if header.sp >= RAM_START and header.sp < 0xFFFF else None
+        return Snapshot(banks, pc=pc)
+
+    pc, port_7ffd, _ = struct.unpack_from(SNA_128K_FMT, data, SNA_48K_SIZE)
+    paged_bank = port_7ffd & 0x07
+    banks = {}
+    for bank in (5, 2, paged_bank):
+        banks[bank] = data[pos:pos+BANK_SIZE]
+        pos += BANK_SIZE
+    pos += struct.calcsize(SNA_128K_FMT)
+    for bank in range(8):
+        if bank in (5, 2, paged_bank):
+            continue
+        banks[bank] = data[pos:pos+BANK_SIZE]
+        pos += BANK_SIZE
+    return Snapshot(banks, paged_bank, pc, is_128k=True)
+
+
+def load_z80(data):
+    """ Load .Z80 snapshot (versions 1, 2 and 3) from bytes """
+    logger = logging.getLogger('load_z80')
+
+    data = bytes(data)
+    if len(data) < Z80_HEADER_SIZE:
+        raise ValueError("Z80 snapshot is too short")
+    header = Z80Header._make(struct.unpack_from(Z80_HEADER_FMT, data))
+    logger.debug(header)
+    if header.pc:  # Version 1
+        block = data[Z80_HEADER_SIZE:]
+        if header.flags != 0xFF and header.flags & Z80_COMPRESSED:
+            if block.endswith(Z80_V1_END_MARKER):
+                block = block[:-len(Z80_V1_END_MARKER)]
+            block = decompress_z80(block, 3 * BANK_SIZE)
+        elif len(block) < 3 * BANK_SIZE:
+            raise ValueError("Z80 snapshot is too short")
+        return Snapshot({bank: block[index*BANK_SIZE:(index+1)*BANK_SIZE]
+                         for index, bank in enumerate(MAPPED_BANKS)},
+                        pc=header.pc)
+
+    try:
+        ext = Z80ExtHeader._make(struct.unpack_from(
+            Z80_EXT_HEADER_FMT, data, Z80_HEADER_SIZE))
+    except struct.error as error:
+        raise ValueError("Z80 snapshot is too short") from error
+    logger.debug(ext)
+    is_128k = ext.hw_mode in (Z80_V2_128K_MODES if ext.length == 23
+                              else Z80_V3_128K_MODES)
+    banks = {}
+    pos = Z80_HEADER_SIZE + 2 + ext.length
+    while pos + 3 <= len(data):
+        length, page = struct.unpack_from('<HB', data, pos)
+        pos += 3
+        if length == Z80_UNCOMPRESSED:
+            block = data[pos:pos+BANK_SIZE]
+            pos += BANK_SIZE
+        else:
+            block = decompress_z80(data[pos:pos+length], BANK_SIZE)
+            pos += length
+        if is_128k and 3 <= page <= 10:
+            banks[page - 3] = block
+        elif not is_128k and page in Z80_48K_PAGES:
+            banks[Z80_48K_PAGES[page]] = block
+        else:
+            logger.debug("Skipped page %d", page)
+    return Snapshot(banks, ext.port_7ffd & 0x07, ext.pc, is_128k)
+
+
+def load(source, name=None):
+    """ Load snapshot from bytes, a path or a binary file. The format is
+    chosen by the file extension if known, by the size otherwise """
+    if name is None and isinstance(source, str):
+        name = source
+    with open_source(source) as src_file:
+        data = read_limited(src_file, MAX_SNAPSHOT_SIZE)
+    extension = os.path.splitext(name or '')[1].lower()
+    if extension == '.sna' or (extension != '.z80' and (
+            len(data) == SNA_48K_SIZE or len(data) in SNA_128K_SIZES)):
+        return load_sna(data)
+    return load_z80(data)
+
+
+def show_info(parsed_args):
+    """ Show some information about the snapshot """
+    snapshot = load(parsed_args.snapshot_file)
+    print(("Model:\t" + ("128K" if snapshot.is_128k else "48K") + "\n" +
+           "PC:\t" + ("unknown" if snapshot.pc is None
+                      else str(snapshot.pc)) + "\n" +
+           "Paged bank:\t" + str(snapshot.paged_bank)).expandtabs(20))
+    return snapshot
+
+
+def extract(parsed_args):
+    """ Save the memory region to the file """
+    start, length = parsed_args.start, parsed_args.length
+    if parsed_args.hobeta_file is not None:
+        header, _ = hobeta.read_info(parsed_args.hobeta_file)
+        start, length = header.start, header.length
+    if start is None or length is None:
+        raise ValueError("Specify start and length or Hobeta file")
+    snapshot = load(parsed_args.snapshot_file)
+    if parsed_args.bank is not None:
+        region = snapshot.bank(parsed_args.bank)[start:start+length]
+    else:
+        region = snapshot.slice(start, length)
+    with open_target(parsed_args.output_file, 'wb') as dst_file:
+        dst_file.write(region)
+    print("Created file %s, %d bytes copied." %
+          (parsed_args.output_file, len(region)))
+    return len(region)
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Emulator snapshot (.SNA, .Z80) utils")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_max_memory_argument(parser)
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    info_parser = subparsers.add_parser(
+        'info', help="Show information about the snapshot")
+    info_parser.add_argument(
+        'snapshot_file', metavar='snapshot-file', help="Input .SNA/.Z80 file")
+    info_parser.set_defaults(func=show_info)
+
+    extract_parser = subparsers.add_parser(
+        'extract', help="Save the memory region to the file")
+    extract_parser.add_argument(
+        'snapshot_file', metavar='snapshot-file', help="Input .SNA/.Z80 file")
+    extract_parser.add_argument(
+        'output_file', metavar='output-file', help="Path to the output file")
+    extract_parser.add_argument(
+        '--start', type=lambda value: int(value, 0),
+        help="Start address, e.g. 16384 or 0x4000")
+    extract_parser.add_argument(
+        '--length', type=lambda value: int(value, 0), help="Region length")
+    extract_parser.add_argument(
+        '--hobeta', dest='hobeta_file',
+        help="Take start and length from the header of this Hobeta file")
+    extract_parser.add_argument(
+        '--bank', type=int, choices=range(8),
+        help="Extract from the RAM bank instead of the address space, "
+        "start is the offset in the bank")
+    extract_parser.set_defaults(func=extract)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
@@ -42,3 +42,41 @@ FATRecord = namedtuple('FATRecord', 'filename filetype start length '
 # Sector 8 contains disk information in the following format:
 #
 #
+# 0                   1                   2
+# 0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7 8 9 0 1 2 3 4 5 6 7
+# +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+# |S|T|D|N|FRE|I|   |    PADDING      | |X|LABEL          |
+# +-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+-+
+#
+# The record starts at offset 0xE1 of the sector.
+#
+# S         The first free sector.
+# T         The first free track.
+# D         Disk type: 0x16 - 80 tracks, double side,
+#                      0x17 - 40 tracks, double side,
+#                      0x18 - 80 tracks, single side,
+#                      0x19 - 40 tracks, single side.
+# N         The number of files on the disk.
+# FRE       The number of free sectors.
+# I         TR-DOS disk ID, always 0x10.
+# PADDING   Nine spaces.
+# X         The number of deleted files.
+# LABEL     Disk label.
+#
+SECTOR_SIZE = 256
+DISK_INFO_SECTOR = 8
+DISK_INFO_OFFSET = DISK_INFO_SECTOR * SECTOR_SIZE + 0xE1
+DISK_INFO_FMT = '<BBBBHB2s9sBB8s'
+DiskInfo = namedtuple('DiskInfo', 'first_free_sector first_free_track '
+                      'disk_type files_count free_sectors trdos_id reserved '
+                      'padding reserved2 deleted_files label')
+TRDOS_ID = 0x10
+DISK_TYPES = (0x16, 0x17, 0x18, 0x19)
+
+###############################################################################
+#
+# SCL is a compact container of TR-DOS files. It starts with the signature
+# below followed by the number of files, then by FAT records without
+# the first sector and track fields, then by the file data.
+#
+SCL_SIGNATURE = b'SINCLAIR'
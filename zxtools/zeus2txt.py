@@ -12,9 +12,13 @@
 import argparse
 import logging
 import io
+from collections import namedtuple
+from contextlib import ExitStack
+from functools import partial
 
-from zxtools import CHUNK_SIZE
-from zxtools.common import default_main
+from zxtools.common import default_main, open_source, open_target
+from zxtools.common import add_chunk_size_argument, get_chunk_size
+from zxtools.common import add_max_memory_argument, get_max_line_size
 
 CODE_ALIGN_WIDTH = 35
 
@@ -25,18 +29,6 @@ def show_info(*parsed_args):
     return parsed_args
 
 
-def read_file(src_file):
-    """Read source file for future processing"""
-    with src_file:
-        while True:
-            chunk = src_file.read(CHUNK_SIZE)
-            if chunk:
-                for cur_char in chunk:
-                    yield cur_char
-            else:
-                break
-
-
 ASM_FIRST_TOKEN = 128
 ASM_META = [
     "A", "ADC ", "ADD ", "AF'", "AF", "AND ", "B", "BC", "BIT ", "C",
@@ -52,61 +44,422 @@ ASM_META = [
     "Z"]
 
 
-def convert_file(parsed_args):
-    """ Convert Zeus Z80 assembler file specified in zeus_file to the plain
-    text and print it to the output_file """
-    logger = logging.getLogger('convert_file')
+def iter_lines(data):
+    """ Iterate over complete lines of Zeus Z80 assembler file data.
+    Yields line number and the boundaries of the line body in data """
+    pos = 0
+    data_len = len(data)
+    while pos + 2 <= data_len:
+        strnum = data[pos] + data[pos+1]*256
+        if strnum == 0xFFFF:  # End of file
+            break
+        end = data.find(b'\x00', pos+2)
+        if end < 0:  # No end of string
+            break
+        yield strnum, pos+2, end
+        pos = end + 1
+
+
+UNDEFINED_FORMAT = "<#%02X>"
+
+
+def make_token_table(tokens, first_token=ASM_FIRST_TOKEN, extra=None):
+    """ Compile the list of token texts to the flat table of 256 texts
+    indexed by the byte value: characters, tokens and None for undefined
+    tokens. Extra is the dictionary of the additional token texts by code.
+    Only the codes below ASM_FIRST_TOKEN are characters, the codes from
+    there up to first_token are undefined as well """
+    table = [chr(code) if code < ASM_FIRST_TOKEN else None
+             for code in range(first_token)] + list(tokens)
+    table = table[0:256] + [None] * (256 - len(table))
+    for code, text in (extra or {}).items():
+        table[code] = text
+    return tuple(table)
 
-    process_string = False
-    strnum_lo = False, 0
+
+TOKEN_TABLE = make_token_table(ASM_META)
+
+
+def decode_line(body, strnum=None, table=TOKEN_TABLE, recover=False):
+    """ Convert the tokenized line body to the plain text. Undefined tokens
+    are skipped, with a warning if the line number is given, or shown as
+    <#XX> if recover is set """
+    parts = []
     tab = False
-    output = parsed_args.output_file
-    strnum = 0
-    cur_buffer = ""
-    cur_line = io.StringIO()
-    for cur_char in read_file(parsed_args.zeus_file):
-        if process_string:
-            cur_buffer += "0x%02X " % cur_char
-            if not cur_char:  # End of string
-                process_string = False
-                strnum_lo = False, 0
-                cur_str = cur_line.getvalue()
-                print(cur_str, end="", file=output)
-                if parsed_args.include_code:
-                    print(" "*(CODE_ALIGN_WIDTH-len(cur_str))+";",
-                          "0x%04X " % strnum + cur_buffer, file=output)
-                else:
-                    print(file=output)
-                continue
-            if tab:
-                print(" "*cur_char, end="", file=cur_line)
-                tab = False
-                continue
-            if cur_char == 0x0A:
-                tab = True
-                continue
-            if cur_char < ASM_FIRST_TOKEN:  # Printable character
-                print(chr(cur_char), end="", file=cur_line)
-                continue
-            try:
-                print(ASM_META[cur_char-ASM_FIRST_TOKEN], end="", file=cur_line)
-            except IndexError:
-                logger.warning("Token not defined: 0x%02X (%d), at line %05d. "
-                               "Skipped.", cur_char, cur_char, strnum)
+    for cur_char in body:
+        if tab:
+            parts.append(" "*cur_char)
+            tab = False
+        elif cur_char == 0x0A:
+            tab = True
         else:
-            if not strnum_lo[0]:
-                strnum_lo = True, cur_char
-            else:
-                strnum = strnum_lo[1] + cur_char*256
-                if strnum == 0xFFFF:  # End of file
-                    print(file=output)
+            text = table[cur_char]
+            if text is None:
+                if recover:
+                    text = UNDEFINED_FORMAT % cur_char
+                elif strnum is not None:
+                    logging.getLogger('decode_line').warning(
+                        "Token not defined: 0x%02X (%d), at line %05d. "
+                        "Skipped.", cur_char, cur_char, strnum)
+            if text is not None:
+                parts.append(text)
+    return "".join(parts)
+
+
+def _is_ident_start(value):
+    return 0x41 <= value <= 0x5A or 0x61 <= value <= 0x7A or value == 0x5F
+
+
+def _is_ident_char(value):
+    return _is_ident_start(value) or 0x30 <= value <= 0x39
+
+
+def _skip_ident(body, pos):
+    while pos < len(body) and _is_ident_char(body[pos]):
+        pos += 1
+    return pos
+
+
+def scan_symbols(body):
+    """ Find the label defined in the tokenized line body and the identifiers
+    it refers to. Returns the label (or None) and the list of pairs
+    (identifier, token of the instruction), the token is 0 for the
+    identifiers outside of instructions """
+    label = None
+    refs = []
+    pos = 0
+    if body and _is_ident_start(body[0]):
+        pos = _skip_ident(body, 0)
+        label = bytes(body[0:pos]).decode("ascii")
+    instruction = 0
+    while pos < len(body):
+        cur_char = body[pos]
+        if cur_char == 0x0A:  # Tab and its width
+            pos += 2
+        elif cur_char == 0x3B:  # Comment
+            break
+        elif cur_char == 0x3A:  # Next statement
+            instruction = 0
+            pos += 1
+        elif cur_char >= ASM_FIRST_TOKEN:
+            if not instruction:
+                instruction = cur_char
+            pos += 1
+        elif cur_char == 0x22:  # String
+            end = body.find(b'"', pos+1)
+            pos = len(body) if end < 0 else end + 1
+        elif _is_ident_start(cur_char):
+            end = _skip_ident(body, pos)
+            refs.append((bytes(body[pos:end]).decode("ascii"), instruction))
+            pos = end
+        elif _is_ident_char(cur_char) or cur_char == 0x23:  # Number
+            pos = _skip_ident(body, pos+1)
+        else:
+            pos += 1
+    return label, refs
+
+
+LONG_LINES_TRUNCATE = 'truncate'
+LONG_LINES_ERROR = 'error'
+
+
+class LineSplitter(object):
+    """ Split Zeus Z80 assembler file fed by chunks into lines. Only the
+    incomplete line is kept between the chunks, complete is set when the end
+    of file marker is met and the rest of data is ignored. Lines longer than
+    max_line are truncated or raise ValueError depending on long_lines,
+    so the memory is bounded even if the file has no end of string """
+
+    def __init__(self, max_line=None, long_lines=LONG_LINES_TRUNCATE):
+        self.data = bytearray()
+        self.scanned = 0  # Where to continue the search of the end of string
+        self.complete = False
+        self.skipping = False  # Skipping the rest of the truncated line
+        self.max_line = max_line or get_max_line_size()
+        self.long_lines = long_lines
+
+    def _long_line(self, strnum, body):
+        if self.long_lines == LONG_LINES_ERROR:
+            raise ValueError("Line %05d is longer than %d bytes" %
+                             (strnum, self.max_line))
+        logging.getLogger('LineSplitter').warning(
+            "Line %05d is longer than %d bytes. Truncated.",
+            strnum, self.max_line)
+        return strnum, bytes(body)
+
+    def feed(self, chunk):
+        """ Add the chunk, returns the list of pairs of line number and
+        line body completed by it """
+        if self.complete:
+            return []
+        data = self.data
+        data += chunk
+        lines = []
+        pos = 0
+        max_line = self.max_line
+        while True:
+            if self.skipping:
+                end = data.find(b'\x00', max(pos, self.scanned))
+                if end < 0:
+                    pos = len(data)
+                    break
+                pos = self.scanned = end + 1
+                self.skipping = False
+            if len(data) - pos < 2:
+                break
+            strnum = data[pos] + data[pos+1]*256
+            if strnum == 0xFFFF:  # End of file
+                self.complete = True
+                break
+            end = data.find(b'\x00', max(pos+2, self.scanned))
+            if end < 0:
+                self.scanned = len(data)
+                if len(data) - pos - 2 <= max_line:
                     break
-                cur_line = io.StringIO()
-                cur_line.truncate(0)
-                cur_buffer = ""
-                print("%05d" % strnum, end=" ", file=cur_line)
-                process_string = True
-    output.close()
+                lines.append(self._long_line(
+                    strnum, data[pos+2:pos+2+max_line]))
+                pos += 2 + max_line
+                self.skipping = True
+                continue
+            if end - pos - 2 > max_line:
+                lines.append(self._long_line(
+                    strnum, data[pos+2:pos+2+max_line]))
+            else:
+                lines.append((strnum, bytes(data[pos+2:end])))
+            pos = self.scanned = end + 1
+        del data[0:pos]
+        self.scanned = max(0, self.scanned - pos)
+        return lines
+
+
+class LineReader(object):
+    """ Split Zeus Z80 assembler file stream into lines reading it by chunks.
+    Yields line number and the line body, complete is set when the end of
+    file marker is met """
+
+    def __init__(self, src_file, chunk_size=None,
+                 long_lines=LONG_LINES_TRUNCATE):
+        self.src_file = src_file
+        self.chunk_size = get_chunk_size(chunk_size, src_file)
+        self.splitter = LineSplitter(long_lines=long_lines)
+
+    @property
+    def complete(self):
+        """ The end of file marker is met """
+        return self.splitter.complete
+
+    def _chunks(self):
+        buffer = memoryview(bytearray(self.chunk_size))
+        readinto = getattr(self.src_file, 'readinto', None)
+        while True:
+            if readinto is None:
+                chunk = self.src_file.read(self.chunk_size)
+            else:
+                chunk = buffer[0:readinto(buffer) or 0]
+            if not chunk:
+                break
+            yield chunk
+
+    def __iter__(self):
+        for chunk in self._chunks():
+            for line in self.splitter.feed(chunk):
+                yield line
+            if self.complete:
+                break
+
+
+HEX_BYTES = tuple("0x%02X " % value for value in range(256))
+
+
+class DecodedLine(object):
+    """ Tokenized line which is decoded on demand, only once for all
+    the formatters """
+    __slots__ = ('strnum', 'body', 'decode', '_text', '_fields', '_code')
+
+    def __init__(self, strnum, body, decode=decode_line):
+        self.strnum = strnum
+        self.body = body
+        self.decode = decode
+        self._text = self._fields = self._code = None
+
+    @property
+    def text(self):
+        """ Line text as Zeus shows it, without the line number """
+        if self._text is None:
+            self._text = self.decode(self.body, self.strnum)
+        return self._text
+
+    @property
+    def code(self):
+        """ Hex dump of the line including the line number """
+        if self._code is None:
+            self._code = "0x%04X " % self.strnum + \
+                "".join(map(HEX_BYTES.__getitem__, self.body)) + HEX_BYTES[0]
+        return self._code
+
+    @property
+    def fields(self):
+        """ Label, mnemonic, operands and comment """
+        if self._fields is None:
+            self._fields = split_fields(self.body, self.decode)
+        return self._fields
+
+
+def split_fields(body, decode=decode_line):
+    """ Split the tokenized line body to label, mnemonic, operands and
+    comment """
+    pos = 0
+    while pos < len(body) and body[pos] not in (0x0A, 0x20, 0x3B) and \
+            body[pos] < ASM_FIRST_TOKEN:
+        pos += 1
+    label = decode(body[0:pos])
+    while pos < len(body) and body[pos] in (0x0A, 0x20):
+        pos += 2 if body[pos] == 0x0A else 1
+    comment_pos = pos
+    quoted = False
+    while comment_pos < len(body):
+        cur_char = body[comment_pos]
+        if cur_char == 0x0A:
+            comment_pos += 1
+        elif cur_char == 0x22:
+            quoted = not quoted
+        elif cur_char == 0x3B and not quoted:
+            break
+        comment_pos += 1
+    mnemonic = ""
+    if pos < comment_pos and body[pos] >= ASM_FIRST_TOKEN:
+        mnemonic = decode(body[pos:pos+1]).rstrip()
+        pos += 1
+    return (label, mnemonic, decode(body[pos:comment_pos]).strip(),
+            decode(body[comment_pos:]).rstrip())
+
+
+Layout = namedtuple('Layout', 'line_numbers columns lowercase hex_dump')
+Layout.__new__.__defaults__ = (True, None, False, False)
+
+LAYOUTS = {
+    'zeus': Layout(),
+    'zeus-code': Layout(hex_dump=True),
+    'columns': Layout(columns=(8, 6)),
+    'columns-lower': Layout(columns=(8, 6), lowercase=True),
+    'plain': Layout(line_numbers=False, columns=(8, 6), lowercase=True),
+}
+
+
+class Formatter(object):
+    """ Renders decoded lines according to the layout. The format is
+    compiled once for the layout """
+
+    def __init__(self, layout=None):
+        self.layout = layout = layout or LAYOUTS['zeus']
+        self.prefix = "%05d " if layout.line_numbers else ""
+        if layout.columns:
+            self.line_format = "%%-%ds %%-%ds %%s" % layout.columns
+            self.render_text = self._render_columns
+        else:
+            self.render_text = self._render_zeus
+
+    def _render_zeus(self, line):
+        return line.text
+
+    def _render_columns(self, line):
+        label, mnemonic, operands, comment = line.fields
+        if self.layout.lowercase:
+            mnemonic = mnemonic.lower()
+        if not (label or mnemonic or operands):
+            return comment
+        text = self.line_format % (label, mnemonic, operands)
+        return (text + " " + comment if comment else text).rstrip()
+
+    def render(self, line):
+        """ Render the line without the end of line """
+        text = self.render_text(line)
+        if self.prefix:
+            text = self.prefix % line.strnum + text
+        if self.layout.hex_dump:
+            text += " "*(CODE_ALIGN_WIDTH-len(text)) + "; " + line.code
+        return text
+
+
+def convert_many(source, targets, symbols=None, chunk_size=None,
+                 table=TOKEN_TABLE, recover=False,
+                 long_lines=LONG_LINES_TRUNCATE):
+    """ Convert Zeus Z80 assembler file to several text files at once,
+    targets is the list of pairs (output, layout), see convert """
+    decode = partial(decode_line, table=table, recover=recover)
+    with open_source(source) as src_file, ExitStack() as stack:
+        outputs = [(Formatter(layout), stack.enter_context(
+            open_target(output, 'w'))) for output, layout in targets]
+        lines = 0
+        reader = LineReader(src_file, chunk_size, long_lines)
+        for strnum, body in reader:
+            line = DecodedLine(strnum, body, decode)
+            for formatter, dst_file in outputs:
+                dst_file.write(formatter.render(line) + "\n")
+            if symbols is not None:
+                symbols.add_line(strnum, body)
+            lines += 1
+        if reader.complete:
+            for _, dst_file in outputs:
+                dst_file.write("\n")
+    return lines
+
+
+def convert(source, output, include_code=False, symbols=None,
+            chunk_size=None, layout=None, table=TOKEN_TABLE, recover=False,
+            long_lines=LONG_LINES_TRUNCATE):
+    """ Convert Zeus Z80 assembler file to the plain text and write it to
+    the output. The source is bytes, a path or a binary file, the output is
+    a path or a text file. If symbols is given (see zeusxref.XRef) it is
+    filled with the labels found. See common.get_chunk_size for chunk_size,
+    make_token_table and decode_line for table and recover, LineSplitter
+    for long_lines. Returns the number of lines converted """
+    if layout is None:
+        layout = LAYOUTS['zeus-code' if include_code else 'zeus']
+    return convert_many(source, [(output, layout)], symbols, chunk_size,
+                        table, recover, long_lines)
+
+
+def convert_to_text(source, include_code=False, layout=None):
+    """ Convert Zeus Z80 assembler file to the plain text """
+    output = io.StringIO()
+    convert(source, output, include_code, layout=layout)
+    return output.getvalue()
+
+
+def convert_file(parsed_args):
+    """ Convert Zeus Z80 assembler file specified in zeus_file to the plain
+    text and print it to the output_file """
+    xref = getattr(parsed_args, 'xref', None)
+    symbols = None
+    if xref is not None:
+        from zxtools.zeusxref import XRef
+        symbols = XRef()
+    layout = LAYOUTS[getattr(parsed_args, 'layout', None) or 'zeus']
+    if parsed_args.include_code:
+        layout = layout._replace(hex_dump=True)
+    extra_outputs = getattr(parsed_args, 'extra_outputs', None) or []
+    for name, _ in extra_outputs:
+        if name not in LAYOUTS:
+            raise ValueError("Unknown layout %s, choose from %s" %
+                             (name, ", ".join(sorted(LAYOUTS))))
+    with parsed_args.zeus_file as src_file, \
+            parsed_args.output_file as dst_file:
+        table = TOKEN_TABLE
+        tokens = getattr(parsed_args, 'tokens', None)
+        if tokens is not None:
+            from zxtools import zeustokens
+            name, table, src_file = zeustokens.choose_table(
+                src_file, tokens, getattr(parsed_args, 'token_tables', ()))
+            logging.getLogger('convert_file').info("Token table: %s", name)
+        convert_many(src_file, [(dst_file, layout)] + [
+            (path, LAYOUTS[name]) for name, path in extra_outputs],
+                     symbols, getattr(parsed_args, 'chunk_size', None), table,
+                     getattr(parsed_args, 'recover_tokens', False),
+                     getattr(parsed_args, 'long_lines', LONG_LINES_TRUNCATE))
+    if xref is not None:
+        with xref:
+            symbols.write(xref, parsed_args.xref_format)
 
 
 def create_parser():
@@ -116,6 +469,8 @@ def create_parser():
     parser.add_argument(
         '-v', '--verbose', help="Increase output verbosity",
         action='store_true')
+    add_chunk_size_argument(parser)
+    add_max_memory_argument(parser)
 
     subparsers = parser.add_subparsers(help="Available commands")
     subparsers.required = False
@@ -139,6 +494,35 @@ def create_parser():
     convert_parser.add_argument(
         '--include-code', dest='include_code',
         action='store_true', help="Include original code in the output file")
+    convert_parser.add_argument(
+        '--layout', choices=sorted(LAYOUTS), default='zeus',
+        help="Layout of the output file")
+    convert_parser.add_argument(
+        '--extra-output', dest='extra_outputs', nargs=2, action='append',
+        metavar=('LAYOUT', 'PATH'),
+        help="Also write the file in the layout, the source is decoded once")
+    convert_parser.add_argument(
+        '--tokens', help="Token table: a built-in one (zeus), path to "
+        "the JSON file or 'auto' to choose the table with the fewest "
+        "undefined tokens")
+    convert_parser.add_argument(
+        '--token-table', dest='token_tables', action='append', default=[],
+        metavar='PATH', help="Additional JSON token table for --tokens auto")
+    convert_parser.add_argument(
+        '--recover-tokens', dest='recover_tokens', action='store_true',
+        help="Show undefined tokens as <#XX> instead of skipping them")
+    convert_parser.add_argument(
+        '--long-lines', dest='long_lines',
+        choices=(LONG_LINES_TRUNCATE, LONG_LINES_ERROR),
+        default=LONG_LINES_TRUNCATE,
+        help="What to do with the lines longer than 64K (or 1/16 of "
+        "the memory budget): truncate them or stop with an error")
+    convert_parser.add_argument(
+        '--xref', type=argparse.FileType('w'),
+        help="Path to the output file for the cross-reference table")
+    convert_parser.add_argument(
+        '--xref-format', dest='xref_format', choices=('text', 'json'),
+        default='text', help="Format of the cross-reference table")
     convert_parser.set_defaults(func=convert_file)
 
     return parser
@@ -0,0 +1,308 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Persistent index of tokens and labels of Zeus Z80 assembler files """
+
+import os
+import argparse
+import hashlib
+import logging
+import sqlite3
+
+from zxtools.common import default_main, read_limited
+from zxtools.common import add_max_memory_argument
+from zxtools.zeus2txt import ASM_FIRST_TOKEN, ASM_META
+from zxtools.zeus2txt import iter_lines, scan_symbols
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS postings (
+    token INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    lines BLOB NOT NULL,
+    PRIMARY KEY (token, file_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS labels (
+    name TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS refs (
+    name TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    token INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS labels_name ON labels (name);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+"""
+
+
+def token_code(name):
+    """ Get token code by its name, e.g. 'CALL' or 'IX' """
+    name = name.upper()
+    for index, token in enumerate(ASM_META):
+        if token.rstrip(" ") == name:
+            return ASM_FIRST_TOKEN + index
+    raise ValueError("Unknown token: %s" % name)
+
+
+def encode_postings(lines):
+    """ Encode sorted line numbers as deltas in LEB128 varints """
+    result = bytearray()
+    prev = 0
+    for line in sorted(lines):
+        delta = line - prev
+        prev = line
+        while delta >= 0x80:
+            result.append(delta & 0x7F | 0x80)
+            delta >>= 7
+        result.append(delta)
+    return bytes(result)
+
+
+def decode_postings(data):
+    """ Decode line numbers encoded by encode_postings """
+    lines = []
+    line = 0
+    delta = 0
+    shift = 0
+    for value in data:
+        delta |= (value & 0x7F) << shift
+        if value & 0x80:
+            shift += 7
+            continue
+        line += delta
+        lines.append(line)
+        delta = 0
+        shift = 0
+    return lines
+
+
+def collect(data):
+    """ Collect postings, labels and references from Zeus file data """
+    postings = {}
+    labels = []
+    refs = []
+    for strnum, start, end in iter_lines(data):
+        body = data[start:end]
+        tokens = set()
+        tab = False
+        for cur_char in body:
+            if tab:
+                tab = False
+            elif cur_char == 0x0A:
+                tab = True
+            elif cur_char >= ASM_FIRST_TOKEN:
+                tokens.add(cur_char)
+        for token in tokens:
+            postings.setdefault(token, []).append(strnum)
+        label, line_refs = scan_symbols(body)
+        if label is not None:
+            labels.append((label, strnum))
+        for name, token in line_refs:
+            refs.append((name, strnum, token))
+    return postings, labels, refs
+
+
+class ZeusIndex(object):
+    """ SQLite-based index of Zeus Z80 assembler files """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """ Close the index database """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _remove(self, file_id):
+        for table in ("postings", "labels", "refs"):
+            self.connection.execute(
+                "DELETE FROM %s WHERE file_id = ?" % table, (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def update(self, path, data=None):
+        """ Index the file if its content was changed since the last update.
+        Returns True if the file was (re)indexed """
+        logger = logging.getLogger('update')
+
+        path = os.path.abspath(path)
+        if data is None:
+            with open(path, 'rb') as zeus_file:
+                data = read_limited(zeus_file)
+        digest = hashlib.sha1(data).hexdigest()
+        row = self.connection.execute(
+            "SELECT id, digest FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[1] == digest:
+            logger.debug("%s is up to date", path)
+            return False
+
+        postings, labels, refs = collect(data)
+        with self.connection:
+            if row is not None:
+                self._remove(row[0])
+            file_id = self.connection.execute(
+                "INSERT INTO files (path, digest, size) VALUES (?, ?, ?)",
+                (path, digest, len(data))).lastrowid
+            self.connection.executemany(
+                "INSERT INTO postings VALUES (?, ?, ?)",
+                ((token, file_id, encode_postings(lines))
+                 for token, lines in postings.items()))
+            self.connection.executemany(
+                "INSERT INTO labels VALUES (?, ?, ?)",
+                ((name, file_id, line) for name, line in labels))
+            self.connection.executemany(
+                "INSERT INTO refs VALUES (?, ?, ?, ?)",
+                ((name, file_id, line, token) for name, line, token in refs))
+        return True
+
+    def prune(self):
+        """ Remove the files which do not exist anymore """
+        removed = []
+        with self.connection:
+            for file_id, path in self.connection.execute(
+                    "SELECT id, path FROM files").fetchall():
+                if not os.path.exists(path):
+                    self._remove(file_id)
+                    removed.append(path)
+        return removed
+
+    def definitions(self, label):
+        """ Where the label is defined """
+        return self.connection.execute(
+            "SELECT files.path, labels.line FROM labels "
+            "JOIN files ON files.id = labels.file_id "
+            "WHERE labels.name = ? ORDER BY files.path, labels.line",
+            (label,)).fetchall()
+
+    def references(self, label, token=None):
+        """ Where the label is referred to, optionally by the specified
+        instruction token only """
+        query = ("SELECT files.path, refs.line FROM refs "
+                 "JOIN files ON files.id = refs.file_id "
+                 "WHERE refs.name = ?")
+        params = (label,)
+        if token is not None:
+            query += " AND refs.token = ?"
+            params = (label, token)
+        return self.connection.execute(
+            query + " ORDER BY files.path, refs.line", params).fetchall()
+
+    def usages(self, token):
+        """ Where the token is used """
+        result = []
+        for path, lines in self.connection.execute(
+                "SELECT files.path, postings.lines FROM postings "
+                "JOIN files ON files.id = postings.file_id "
+                "WHERE postings.token = ? ORDER BY files.path", (token,)):
+            result.extend((path, line) for line in decode_postings(lines))
+        return result
+
+
+def print_locations(locations):
+    """ Print path:line pairs """
+    for path, line in locations:
+        print("%s:%05d" % (path, line))
+    return locations
+
+
+def update_index(parsed_args):
+    """ Add or update files in the index """
+    updated = 0
+    with ZeusIndex(parsed_args.index) as index:
+        for path in parsed_args.zeus_files:
+            updated += index.update(path)
+        if parsed_args.prune:
+            for path in index.prune():
+                print("Removed %s" % path)
+    print("Indexed %d file(s), %d up to date." %
+          (updated, len(parsed_args.zeus_files) - updated))
+    return updated
+
+
+def find_definitions(parsed_args):
+    """ Show where the label is defined """
+    with ZeusIndex(parsed_args.index) as index:
+        return print_locations(index.definitions(parsed_args.label))
+
+
+def find_references(parsed_args):
+    """ Show where the label is referred to """
+    token = None if parsed_args.op is None else token_code(parsed_args.op)
+    with ZeusIndex(parsed_args.index) as index:
+        return print_locations(index.references(parsed_args.label, token))
+
+
+def find_usages(parsed_args):
+    """ Show where the token is used """
+    with ZeusIndex(parsed_args.index) as index:
+        return print_locations(index.usages(token_code(parsed_args.token)))
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Index of Zeus Z80 assembler files")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_max_memory_argument(parser)
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    update_parser = subparsers.add_parser(
+        'update', help="Add files to the index or update the changed ones")
+    update_parser.add_argument('index', help="Path to the index file")
+    update_parser.add_argument(
+        'zeus_files', metavar='zeus-file', nargs='+',
+        help="Input file with Zeus Z80 assembler (usually FILENAME.$C)")
+    update_parser.add_argument(
+        '--prune', action='store_true',
+        help="Remove the files which do not exist anymore from the index")
+    update_parser.set_defaults(func=update_index)
+
+    defs_parser = subparsers.add_parser(
+        'defs', help="Show where the label is defined")
+    defs_parser.add_argument('index', help="Path to the index file")
+    defs_parser.add_argument('label', help="Label name")
+    defs_parser.set_defaults(func=find_definitions)
+
+    refs_parser = subparsers.add_parser(
+        'refs', help="Show where the label is referred to")
+    refs_parser.add_argument('index', help="Path to the index file")
+    refs_parser.add_argument('label', help="Label name")
+    refs_parser.add_argument(
+        '--op', help="Only references by this instruction, e.g. CALL")
+    refs_parser.set_defaults(func=find_references)
+
+    uses_parser = subparsers.add_parser(
+        'uses', help="Show where the token is used")
+    uses_parser.add_argument('index', help="Path to the index file")
+    uses_parser.add_argument('token', help="Token name, e.g. IX")
+    uses_parser.set_defaults(func=find_usages)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
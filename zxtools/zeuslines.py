@@ -0,0 +1,247 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Renumber, merge and extract lines of Zeus Z80 assembler files without
+decoding the tokens """
+
+import os
+import argparse
+import heapq
+import struct
+from contextlib import ExitStack
+
+from zxtools.common import default_main, open_source, open_target
+from zxtools.common import add_chunk_size_argument, is_path
+from zxtools.common import add_max_memory_argument
+from zxtools.zeus2txt import LineReader
+
+MAX_STRNUM = 0xFFFE  # 0xFFFF is the end of file marker
+END_MARKER = b'\xFF\xFF'
+STRNUM = struct.Struct('<H')
+
+
+def source_name(source, index=0):
+    """ Name of the source for the error messages """
+    return str(source) if is_path(source) else "source %d" % (index + 1)
+
+
+def checked_lines(lines, name):
+    """ Pass the lines through checking that the line numbers ascend """
+    prev_strnum = -1
+    for strnum, body in lines:
+        if strnum < prev_strnum:
+            raise ValueError("%s: line %05d goes after %05d, the lines are "
+                             "not sorted" % (name, strnum, prev_strnum))
+        prev_strnum = strnum
+        yield strnum, body
+
+
+def unique_lines(lines):
+    """ Pass the sorted lines through checking that the line numbers are
+    not repeated """
+    prev_strnum = None
+    for strnum, body in lines:
+        if strnum == prev_strnum:
+            raise ValueError("Line %05d is repeated, renumber the lines"
+                             % strnum)
+        prev_strnum = strnum
+        yield strnum, body
+
+
+def check_output(output, sources):
+    """ Raise ValueError if the output is one of the sources, it would be
+    truncated before it's read """
+    if not is_path(output) or not os.path.exists(output):
+        return
+    for source in sources:
+        if is_path(source) and os.path.exists(source) and \
+                os.path.samefile(source, output):
+            raise ValueError("Output file %s is one of the inputs" % output)
+
+
+def renumbered(lines, start=10, step=10):
+    """ Replace the line numbers with start, start+step, ... """
+    strnum = start
+    for _, body in lines:
+        if strnum > MAX_STRNUM:
+            raise ValueError("Line number %d is out of range, use smaller "
+                             "start or step" % strnum)
+        yield strnum, body
+        strnum += step
+
+
+def merged(*sources):
+    """ Merge the sorted sequences of lines by the line number. The lines
+    with the same number follow in the order of the sources """
+    return ((strnum, body) for strnum, _, _, body in heapq.merge(*(
+        ((strnum, index, pos, body)
+         for pos, (strnum, body) in enumerate(lines))
+        for index, lines in enumerate(sources))))
+
+
+def extracted(lines, first=0, last=MAX_STRNUM):
+    """ Lines with numbers from first to last inclusive, the lines must be
+    sorted, so reading stops after the last one """
+    for strnum, body in lines:
+        if strnum > last:
+            break
+        if strnum >= first:
+            yield strnum, body
+
+
+def write_lines(output, lines):
+    """ Write the lines and the end of file marker to the output (a path or
+    a binary file). Returns the number of lines written """
+    count = 0
+    with open_target(output, 'wb') as dst_file:
+        for strnum, body in lines:
+            dst_file.write(STRNUM.pack(strnum) + body + b'\x00')
+            count += 1
+        dst_file.write(END_MARKER)
+    return count
+
+
+def renumber(source, output, start=10, step=10, chunk_size=None):
+    """ Renumber the lines of the source (bytes, a path or a binary file).
+    See common.get_chunk_size for chunk_size.
+    Returns the number of lines written """
+    check_output(output, [source])
+    with open_source(source) as src_file:
+        return write_lines(output, renumbered(
+            LineReader(src_file, chunk_size), start, step))
+
+
+def merge(sources, output, start=10, step=10, chunk_size=None):
+    """ Merge the sources by the line number, only one line of each source
+    is kept in memory. The result is renumbered unless start is None, then
+    the repeated line numbers are an error (ValueError).
+    Returns the number of lines written """
+    check_output(output, sources)
+    with ExitStack() as stack:
+        readers = [
+            checked_lines(LineReader(stack.enter_context(open_source(source)),
+                                     chunk_size), source_name(source, index))
+            for index, source in enumerate(sources)]
+        lines = merged(*readers)
+        if start is None:
+            lines = unique_lines(lines)
+        else:
+            lines = renumbered(lines, start, step)
+        return write_lines(output, lines)
+
+
+def extract(source, output, first=0, last=MAX_STRNUM, start=None, step=10,
+            chunk_size=None):
+    """ Copy the lines from first to last inclusive, renumber them if start
+    is given. Returns the number of lines written """
+    check_output(output, [source])
+    with open_source(source) as src_file:
+        lines = extracted(checked_lines(LineReader(src_file, chunk_size),
+                                        source_name(source)), first, last)
+        if start is not None:
+            lines = renumbered(lines, start, step)
+        return write_lines(output, lines)
+
+
+def renumber_file(parsed_args):
+    """ Renumber the lines of the file """
+    count = renumber(parsed_args.zeus_file, parsed_args.output_file,
+                     parsed_args.start, parsed_args.step,
+                     getattr(parsed_args, 'chunk_size', None))
+    print("Created file %s, %d lines." % (parsed_args.output_file, count))
+    return count
+
+
+def merge_files(parsed_args):
+    """ Merge the files by the line number """
+    count = merge(parsed_args.zeus_files, parsed_args.output_file,
+                  None if parsed_args.keep_numbers else parsed_args.start,
+                  parsed_args.step,
+                  getattr(parsed_args, 'chunk_size', None))
+    print("Created file %s, %d lines." % (parsed_args.output_file, count))
+    return count
+
+
+def extract_lines(parsed_args):
+    """ Extract the range of lines from the file """
+    count = extract(parsed_args.zeus_file, parsed_args.output_file,
+                    parsed_args.first, parsed_args.last, parsed_args.start,
+                    parsed_args.step, getattr(parsed_args, 'chunk_size', None))
+    print("Created file %s, %d lines." % (parsed_args.output_file, count))
+    return count
+
+
+def add_renumber_arguments(parser, start=None):
+    """ Add --start and --step options """
+    parser.add_argument(
+        '--start', type=int, default=start,
+        help="Renumber the lines starting from this number" +
+        ("" if start is None else " (default: %d)" % start))
+    parser.add_argument(
+        '--step', type=int, default=10,
+        help="Step of the line numbers (default: 10)")
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Zeus Z80 assembler files line editor")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_chunk_size_argument(parser)
+    add_max_memory_argument(parser)
+
+    subparsers = parser.add_subparsers(help="Available commands")
+    subparsers.required = False
+
+    renumber_parser = subparsers.add_parser(
+        'renumber', help="Renumber the lines")
+    renumber_parser.add_argument(
+        'zeus_file', metavar='zeus-file', help="Input file")
+    renumber_parser.add_argument(
+        'output_file', metavar='output-file', help="Path to the output file")
+    add_renumber_arguments(renumber_parser, 10)
+    renumber_parser.set_defaults(func=renumber_file)
+
+    merge_parser = subparsers.add_parser(
+        'merge', help="Merge the files by the line number")
+    merge_parser.add_argument(
+        'output_file', metavar='output-file', help="Path to the output file")
+    merge_parser.add_argument(
+        'zeus_files', metavar='zeus-file', nargs='+', help="Input files")
+    add_renumber_arguments(merge_parser, 10)
+    merge_parser.add_argument(
+        '--keep-numbers', dest='keep_numbers', action='store_true',
+        help="Keep the original line numbers, they must not repeat")
+    merge_parser.set_defaults(func=merge_files)
+
+    extract_parser = subparsers.add_parser(
+        'extract', help="Extract the range of lines")
+    extract_parser.add_argument(
+        'zeus_file', metavar='zeus-file', help="Input file")
+    extract_parser.add_argument(
+        'output_file', metavar='output-file', help="Path to the output file")
+    extract_parser.add_argument(
+        'first', type=int, help="The first line number")
+    extract_parser.add_argument(
+        'last', type=int, help="The last line number")
+    add_renumber_arguments(extract_parser)
+    extract_parser.set_defaults(func=extract_lines)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Compact in-memory representation of Zeus Z80 assembler programs """
+
+import struct
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from zxtools.common import get_buffer_limit, open_source
+from zxtools.zeus2txt import LineReader, decode_line
+
+CACHE_SIZE = 256
+END_MARKER = b'\xFF\xFF'
+
+
+class ZeusProgram(object):
+    """ Tokenized lines are kept as is in a single buffer indexed by the
+    offsets of the line bodies, so the memory used is close to the file
+    size. Line text is decoded on access, the recent lines are cached.
+    The buffer is limited to max_size bytes, by default to the buffer limit
+    of the memory budget, see common.get_buffer_limit """
+
+    def __init__(self, cache_size=CACHE_SIZE, max_size=None):
+        self.data = bytearray()
+        self.max_size = get_buffer_limit() if max_size is None else max_size
+        self.offsets = array('I', [0])  # Body of the line i is [i, i+1)
+        self.strnums = array('H')
+        self.complete = False
+        self.sorted = True
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @classmethod
+    def load(cls, source, chunk_size=None, cache_size=CACHE_SIZE,
+             max_size=None):
+        """ Load the program from bytes, a path or a binary file.
+        See common.get_chunk_size for chunk_size """
+        program = cls(cache_size, max_size)
+        with open_source(source) as src_file:
+            reader = LineReader(src_file, chunk_size)
+            for strnum, body in reader:
+                program.append(strnum, body)
+            program.complete = reader.complete
+        return program
+
+    def append(self, strnum, body):
+        """ Add the line to the end of the program. Raises ValueError if
+        the program does not fit max_size """
+        if self.max_size is not None and \
+                len(self.data) + len(body) > self.max_size:
+            raise ValueError("Program is larger than %d bytes allowed by the "
+                             "memory budget" % self.max_size)
+        if self.strnums and strnum < self.strnums[-1]:
+            self.sorted = False
+        self.data += body
+        self.offsets.append(len(self.data))
+        self.strnums.append(strnum)
+
+    def __len__(self):
+        return len(self.strnums)
+
+    def __iter__(self):
+        """ Iterate over the line texts, like indexing does """
+        for index in range(len(self)):
+            yield self.text(index)
+
+    def items(self):
+        """ Iterate over the pairs of line number and line body """
+        for index in range(len(self)):
+            yield self.strnums[index], self.body(index)
+
+    def _position(self, index):
+        """ Non-negative index, IndexError if it's out of range """
+        position = index + len(self) if index < 0 else index
+        if not 0 <= position < len(self):
+            raise IndexError("Line index %d is out of range" % index)
+        return position
+
+    def body(self, index):
+        """ Tokenized body of the line by its index """
+        index = self._position(index)
+        return bytes(self.data[self.offsets[index]:self.offsets[index+1]])
+
+    def text(self, index):
+        """ Text of the line by its index """
+        index = self._position(index)
+        text = self._cache.get(index)
+        if text is not None:
+            self._cache.move_to_end(index)
+            return text
+        text = decode_line(self.body(index))
+        self._cache[index] = text
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return text
+
+    def __getitem__(self, index):
+        """ Text of the line by its index """
+        return self.text(index)
+
+    def index(self, strnum):
+        """ Index of the line with the line number, ValueError if there is
+        no such line """
+        if self.sorted:
+            index = bisect_left(self.strnums, strnum)
+            if index < len(self) and self.strnums[index] == strnum:
+                return index
+            raise ValueError("No line %05d" % strnum)
+        return self.strnums.index(strnum)
+
+    def line(self, strnum):
+        """ Text of the line by its line number """
+        return self.text(self.index(strnum))
+
+    def to_bytes(self):
+        """ Zeus Z80 assembler file of the program """
+        chunks = []
+        for strnum, body in self.items():
+            chunks.append(struct.pack('<H', strnum))
+            chunks.append(body)
+            chunks.append(b'\x00')
+        if self.complete:
+            chunks.append(END_MARKER)
+        return b''.join(chunks)
+
+    def memory_size(self):
+        """ Approximate number of bytes used by the buffers """
+        return (len(self.data) + self.offsets.itemsize * len(self.offsets) +
+                self.strnums.itemsize * len(self.strnums))
@@ -0,0 +1,135 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Search Zeus Z80 assembler files without converting them to text """
+
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from zxtools.common import default_main, read_limited
+from zxtools.common import add_max_memory_argument
+from zxtools.zeus2txt import ASM_FIRST_TOKEN, ASM_META
+from zxtools.zeus2txt import iter_lines, decode_line
+
+# Longest tokens go first so "LDIR" is not taken for "LD" followed by "IR"
+QUERY_TOKENS = sorted(
+    ((token.rstrip(" "), token.endswith(" "), ASM_FIRST_TOKEN + index)
+     for index, token in enumerate(ASM_META)),
+    key=lambda item: len(item[0]), reverse=True)
+
+
+def compile_query(query):
+    """ Compile the text query to the token bytes as Zeus stores them """
+    result = bytearray()
+    pos = 0
+    while pos < len(query):
+        code = None
+        if pos == 0 or not query[pos-1].isalnum():
+            for word, with_space, token_code in QUERY_TOKENS:
+                word_end = pos + len(word)
+                if query[pos:word_end].upper() != word:
+                    continue
+                if word[-1].isalnum() and word_end < len(query) and \
+                        query[word_end].isalnum():
+                    continue  # This is just a part of a label
+                code = token_code
+                if with_space and query[word_end:word_end+1] == " ":
+                    word_end += 1
+                break
+        if code is None:
+            result += query[pos].encode("ascii")
+            pos += 1
+        else:
+            result.append(code)
+            pos = word_end
+    return bytes(result)
+
+
+def search_data(data, pattern):
+    """ Find lines of Zeus Z80 assembler file data which contain the pattern.
+    Only the lines found are decoded """
+    found = []
+    pos = data.find(pattern)
+    if pos < 0 or not pattern:
+        return found
+    for strnum, start, end in iter_lines(data):
+        while 0 <= pos < end:
+            if pos >= start and pos + len(pattern) <= end:
+                found.append((strnum, decode_line(data[start:end])))
+                pos = data.find(pattern, end + 1)
+                break
+            pos = data.find(pattern, pos + 1)
+        if pos < 0:
+            break
+    return found
+
+
+def search_file(path, pattern):
+    """ Find lines of Zeus Z80 assembler file which contain the pattern """
+    with open(path, 'rb') as zeus_file:
+        return path, search_data(read_limited(zeus_file), pattern)
+
+
+def search_files(paths, pattern, jobs=1):
+    """ Search through the files in parallel if jobs > 1.
+    Yields file path and the lines found in the order of paths """
+    if jobs > 1:
+        with ProcessPoolExecutor(jobs) as executor:
+            for result in executor.map(search_file, paths,
+                                       [pattern]*len(paths)):
+                yield result
+    else:
+        for path in paths:
+            yield search_file(path, pattern)
+
+
+def search(parsed_args):
+    """ Print the lines which contain the query """
+    logger = logging.getLogger('search')
+
+    pattern = compile_query(parsed_args.query)
+    logger.debug(pattern)
+    matches = 0
+    for path, found in search_files(parsed_args.zeus_files, pattern,
+                                    parsed_args.jobs):
+        for strnum, line in found:
+            print("%s:%05d %s" % (path, strnum, line))
+        matches += len(found)
+    return matches
+
+
+def create_parser():
+    """ Parse command line arguments """
+    parser = argparse.ArgumentParser(
+        description="Search Zeus Z80 assembler files")
+    parser.add_argument(
+        '-v', '--verbose', help="Increase output verbosity",
+        action='store_true')
+    add_max_memory_argument(parser)
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help="Number of processes to search files in parallel")
+    parser.add_argument(
+        'query', help="Text to search, e.g. 'OUT (254)'")
+    parser.add_argument(
+        'zeus_files', metavar='zeus-file', nargs='+',
+        help="Input file with Zeus Z80 assembler (usually FILENAME.$C)")
+    parser.set_defaults(func=search)
+
+    return parser
+
+
+def main():
+    """Entry point"""
+    return default_main(create_parser())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Token tables of Zeus Z80 assembler variants """
+
+import os
+import json
+import logging
+
+from zxtools.detect import PeekedFile
+from zxtools.zeus2txt import ASM_FIRST_TOKEN, TOKEN_TABLE
+from zxtools.zeus2txt import iter_lines, make_token_table
+
+# Token table given in JSON file looks like this:
+#
+# {"first_token": 128, "tokens": ["A", "ADC ", ...]}
+#
+# or extends the built-in one:
+#
+# {"base": "zeus", "extra": {"0xE9": "SLI "}}
+#
+BUILTIN_TABLES = {
+    'zeus': TOKEN_TABLE,
+}
+DEFAULT_TABLE = 'zeus'
+AUTO = 'auto'
+SAMPLE_SIZE = 16 * 1024
+
+_LOADED = {}
+
+
+def parse_code(code):
+    """ Token code given as a number or a string like 0xE9 or 233 """
+    value = int(code, 0) if isinstance(code, str) else int(code)
+    if not 0 <= value <= 0xFF:
+        raise ValueError("Token code %s is out of range" % code)
+    return value
+
+
+def compile_table(spec):
+    """ Compile the table description loaded from JSON """
+    extra = {parse_code(code): text
+             for code, text in spec.get('extra', {}).items()}
+    if 'tokens' in spec:
+        return make_token_table(
+            spec['tokens'], parse_code(spec.get('first_token',
+                                                ASM_FIRST_TOKEN)), extra)
+    table = list(get_table(spec.get('base', DEFAULT_TABLE)))
+    for code, text in extra.items():
+        table[code] = text
+    return tuple(table)
+
+
+def load_table(path):
+    """ Load the table from JSON file. Compiled tables are kept until
+    the file is changed """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    table = _LOADED.get(key)
+    if table is None:
+        with open(path, 'r', encoding='utf-8') as table_file:
+            table = _LOADED[key] = compile_table(json.load(table_file))
+    return table
+
+
+def get_table(name):
+    """ Built-in table by its name or the table from JSON file """
+    if name in BUILTIN_TABLES:
+        return BUILTIN_TABLES[name]
+    if os.path.exists(name):
+        return load_table(name)
+    raise ValueError("Unknown token table %s, choose from %s or give a path "
+                     "to JSON file" % (name,
+                                       ", ".join(sorted(BUILTIN_TABLES))))
+
+
+def token_counts(data):
+    """ Number of occurrences of each byte value in the line bodies,
+    the tab widths are not counted """
+    counts = [0] * 256
+    for _, start, end in iter_lines(data):
+        tab = False
+        for value in data[start:end]:
+            if tab:
+                tab = False
+            elif value == 0x0A:
+                tab = True
+            else:
+                counts[value] += 1
+    return counts
+
+
+def undefined_tokens(table, counts):
+    """ Number of the tokens undefined in the table """
+    return sum(count for text, count in zip(table, counts)
+               if count and text is None)
+
+
+def detect_table(data, names):
+    """ Choose the table with the fewest undefined tokens in the data,
+    the first one wins a tie. Returns its name """
+    counts = token_counts(data)
+    scores = [(undefined_tokens(get_table(name), counts), index, name)
+              for index, name in enumerate(names)]
+    logging.getLogger('detect_table').debug(scores)
+    return min(scores)[2]
+
+
+def choose_table(src_file, name, extra_tables=(), sample_size=SAMPLE_SIZE):
+    """ Get the table by its name, or detect it by the first sample_size
+    bytes of the file if the name is 'auto'. The built-in tables and
+    extra_tables (paths to JSON files) are the candidates. Returns the name,
+    the table and the file to read the data from the beginning """
+    if name != AUTO:
+        return name, get_table(name), src_file
+    data = src_file.read(sample_size)
+    name = detect_table(data, [DEFAULT_TABLE] + sorted(
+        set(BUILTIN_TABLES) - {DEFAULT_TABLE}) + list(extra_tables))
+    return name, get_table(name), PeekedFile(data, src_file)
@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2016 Kirill V. Lyadvinsky
+# http://www.codeatcpp.com
+#
+# Licensed under the BSD 3-Clause license.
+# See LICENSE file in the project root for full license information.
+#
+""" Cross-reference table of Zeus Z80 assembler labels """
+
+import json
+
+from zxtools.zeus2txt import ASM_FIRST_TOKEN, ASM_META
+from zxtools.zeus2txt import decode_line, scan_symbols
+
+EQU_TOKEN = ASM_FIRST_TOKEN + ASM_META.index("EQU ")
+ORG_TOKEN = ASM_FIRST_TOKEN + ASM_META.index("ORG ")
+
+
+def find_token(body, token):
+    """ Find the token in the line body skipping the tab widths """
+    pos = body.find(bytes((token,)))
+    while pos > 0 and body[pos-1] == 0x0A and \
+            (pos < 2 or body[pos-2] != 0x0A):
+        pos = body.find(bytes((token,)), pos+1)
+    return pos
+
+
+def operand(body, token):
+    """ Get text of the operand of the instruction specified by token """
+    start = find_token(body, token)
+    if start < 0:
+        return None
+    end = body.find(b';', start)
+    if end < 0:
+        end = len(body)
+    return decode_line(body[start+1:end]).strip()
+
+
+class Symbol(object):
+    """ Label definition and references """
+    __slots__ = ('line', 'equ', 'org', 'refs')
+
+    def __init__(self):
+        self.line = None
+        self.equ = None
+        self.org = None
+        self.refs = []
+
+    def as_dict(self, name):
+        """ Convert to a dictionary to serialize to JSON """
+        return {'name': name, 'line': self.line, 'equ': self.equ,
+                'org': self.org, 'refs': self.refs}
+
+
+class XRef(object):
+    """ Collect labels from the tokenized lines one by one, so only
+    the symbols are kept in memory """
+
+    def __init__(self):
+        self.symbols = {}
+        self.org = None
+
+    def symbol(self, name):
+        """ Get the symbol by its name, create it if it does not exist """
+        symbol = self.symbols.get(name)
+        if symbol is None:
+            symbol = self.symbols[name] = Symbol()
+        return symbol
+
+    def add_line(self, strnum, body):
+        """ Process the tokenized line body """
+        label, refs = scan_symbols(body)
+        org = operand(body, ORG_TOKEN)
+        if org is not None:
+            self.org = org
+        if label is not None:
+            symbol = self.symbol(label)
+            if symbol.line is None:
+                symbol.line = strnum
+                symbol.equ = operand(body, EQU_TOKEN)
+                if symbol.equ is None:
+                    symbol.org = self.org
+        for name, _ in refs:
+            symbol = self.symbol(name)
+            if not symbol.refs or symbol.refs[-1] != strnum:
+                symbol.refs.append(strnum)
+
+    def write_text(self, output):
+        """ Print the table as a plain text """
+        for name in sorted(self.symbols):
+            symbol = self.symbols[name]
+            if symbol.equ is not None:
+                value = "EQU " + symbol.equ
+            elif symbol.org is not None:
+                value = "ORG " + symbol.org
+            else:
+                value = ""
+            print("%-16s %5s %-16s %s" % (
+                name,
+                "?????" if symbol.line is None else "%05d" % symbol.line,
+                value,
+                " ".join("%05d" % line for line in symbol.refs)),
+                  file=output)
+
+    def write_json(self, output):
+        """ Print the table as JSON """
+        json.dump({'symbols': [self.symbols[name].as_dict(name)
+                               for name in sorted(self.symbols)]},
+                  output, indent=1)
+        print(file=output)
+
+    def write(self, output, output_format='text'):
+        """ Print the table in the specified format """
+        if output_format == 'json':
+            self.write_json(output)
+        else:
+            self.write_text(output)